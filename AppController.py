@@ -1,25 +1,116 @@
-from RecipeManager import RecipeManager
+import threading
 from TerminalUI import TerminalUI
+import instrumentation
+
+# seconds between progress messages while waiting for the catalogue
+PROGRESS_INTERVAL = 1.0
+# menu options that do not need the catalogue
+CATALOGUE_FREE = ("s", "p", "0")
+# the manager calls the menu makes; a manager passed in needs all of them
+MANAGER_API = ("add_recipe", "get_recipe", "search", "cursor", "favourite_recipe", "rate_recipe", "recommend",
+               "close")
+
 
 # ---------- AppController Class ----------
+# The menu is shown straight away; the catalogue loads on a background thread
+# and an action only waits for it when it actually needs the recipes.
 class AppController:
-    def __init__(self):
-        self.manager = RecipeManager()
+    def __init__(self, manager=None, recipe_file: str = "sample_recipes.json"):
+        # any manager with the MANAGER_API calls, e.g. SQLiteRecipeManager
+        if manager is not None:
+            missing = [call for call in MANAGER_API if not callable(getattr(manager, call, None))]
+            if missing:
+                raise TypeError(f"{type(manager).__name__} lacks {', '.join(missing)}")
+        # RECIPE_METRICS=<file> turns on timing before anything is loaded
+        self.metrics_file = instrumentation.enable_from_env()
+        # "cpu" or "memory" while the next action is to be profiled
+        self.capture = None
         self.ui = TerminalUI()
-        self.recipe_file = "sample_recipes.json"
-        self.manager.load_from_json(self.recipe_file)
+        self.recipe_file = recipe_file
+        self._manager = manager
+        # the manager being loaded, for progress, and why loading failed
+        self.loading = None
+        self.load_error: Exception = None
+        self.loaded = threading.Event()
+        if manager is None:
+            threading.Thread(target=self.load, name="catalogue-loader", daemon=True).start()
+        else:
+            self.loaded.set()
+
+    def load(self):
+        try:
+            # imported here, off the path to the first menu
+            from RecipeManager import RecipeManager
+            self.loading = RecipeManager()
+            # loads the snapshot and replays changes made since it was written
+            self.loading.open_journal(self.recipe_file)
+            self._manager = self.loading
+            summary = self.loading.ingest_summary()
+            if summary:
+                self.ui.display_message(summary)
+        except Exception as e:
+            self.load_error = e
+        finally:
+            self.loaded.set()
+
+    @property
+    def manager(self):
+        # Waits, showing progress, until the catalogue has loaded. If it
+        # failed to, says so once and goes on with an empty catalogue that is
+        # never saved, leaving the file as it is for repair.
+        while not self.loaded.wait(PROGRESS_INTERVAL):
+            self.ui.display_message(self.load_status())
+        if self.load_error is not None:
+            from RecipeManager import RecipeManager
+            error, self.load_error = self.load_error, None
+            self._manager = RecipeManager()
+            self.ui.display_message(f"Could not load {self.recipe_file}: {error}\n"
+                                    "Continuing with an empty catalogue; changes will not be saved.")
+        return self._manager
+
+    def load_status(self) -> str:
+        # None once the catalogue has loaded
+        if self.loaded.is_set():
+            return None
+        loading = self.loading
+        count = loading.size() if loading is not None else 0
+        return f"Loading recipes from {self.recipe_file}... {count} so far"
 
     def run(self):
         while True:
-            self.ui.show_menu()
+            self.ui.show_menu(self.load_status())
             choice = self.ui.get_input("Choose an option: ")
-            self.handle_input(choice)
+            if self.capture and choice not in CATALOGUE_FREE:
+                self.handle_profiled(choice)
+            else:
+                self.handle_input(choice)
+
+    def handle_profiled(self, choice):
+        # runs one menu action under cProfile or tracemalloc
+        kind, self.capture = self.capture, None
+        if kind == "cpu":
+            path = "recipe_profile.prof"
+            with instrumentation.profile(path):
+                self.handle_input(choice)
+            self.ui.display_message(instrumentation.profile_report(path))
+        else:
+            path = "recipe_memory.txt"
+            with instrumentation.trace_memory(path):
+                self.handle_input(choice)
+        self.ui.display_message(f"Profile written to {path}")
 
     def handle_input(self, choice):
         if choice == '1':
-            recipe = self.ui.prompt_for_recipe()
-            self.manager.add_recipe(recipe)
-            self.ui.display_message("Recipe added successfully!")
+            try:
+                recipe = self.ui.prompt_for_recipe()
+                # a manager with dedup merging returns the recipe it merged into
+                merged_into = self.manager.add_recipe(recipe)
+                if merged_into:
+                    self.ui.display_message(f"Recipe merged into its near-duplicate '{merged_into}'.")
+                else:
+                    self.ui.display_message("Recipe added successfully!")
+            except ValueError as e:
+                self.ui.display_message(str(e))
         elif choice == '2':
             name = self.ui.get_input("Enter recipe name to view: ")
             try:
@@ -28,7 +119,7 @@ class AppController:
             except ValueError as e:
                 self.ui.display_message(str(e))
         elif choice == '3':
-            selected = self.ui.display_recipe_names(self.manager.list_all())
+            selected = self.ui.display_recipe_names(self.manager.cursor("all"))
             if selected:
                 self.ui.display_recipe(selected)
         elif choice == '4':
@@ -36,34 +127,66 @@ class AppController:
             results = self.manager.search(keyword)
             if not results:
                 self.ui.display_message("No matches found. Showing favourite recipes instead:")
-                results = self.manager.list_favourites()
+                results = self.manager.cursor("favourites")
             selected = self.ui.display_recipe_names(results)
             if selected:
                 self.ui.display_recipe(selected)
         elif choice == '5':
-            sorted_recipes = self.manager.sort_recipes().sort_name(self.manager.list_all())
-            selected = self.ui.display_recipe_names(sorted_recipes)
+            selected = self.ui.display_recipe_names(self.manager.cursor("name"))
             if selected:
                 self.ui.display_recipe(selected)
         elif choice == '6':
-            sorted_recipes = self.manager.sort_recipes().sort_rating(self.manager.list_all())
-            selected = self.ui.display_recipe_names(sorted_recipes)
+            selected = self.ui.display_recipe_names(self.manager.cursor("rating"))
             if selected:
                 self.ui.display_recipe(selected)        
         elif choice == '7':
             name = self.ui.get_input("Enter recipe name to favourite: ")
-            self.manager.favourite_recipe(name)
+            try:
+                self.manager.favourite_recipe(name)
+            except ValueError as e:
+                self.ui.display_message(str(e))
         elif choice == '8':
             name = self.ui.get_input("Enter recipe name to rate: ")
-            rating = float(self.ui.get_input("Enter new rating (0-5): "))
-            self.manager.rate_recipe(name, rating)
+            try:
+                rating = float(self.ui.get_input("Enter new rating (0-5): "))
+                self.manager.rate_recipe(name, rating)
+            except ValueError as e:
+                self.ui.display_message(str(e))
         elif choice == '9':
-            favourites = self.manager.list_favourites()
-            selected = self.ui.display_recipe_names(favourites)
+            selected = self.ui.display_recipe_names(self.manager.cursor("favourites"))
+            if selected:
+                self.ui.display_recipe(selected)
+        elif choice == 'r':
+            name = self.ui.get_input("Recommend recipes like (recipe name, or blank for your favourites): ").strip()
+            try:
+                matches = self.manager.recommend(name or None)
+            except ValueError as e:
+                self.ui.display_message(str(e))
+                return
+            selected = self.ui.display_recipe_names([recipe for recipe, _ in matches])
             if selected:
                 self.ui.display_recipe(selected)
+        elif choice == 's':
+            if not instrumentation.enabled():
+                self.ui.display_message("Timing is off; start with RECIPE_METRICS=<file> to record it.")
+            else:
+                self.ui.display_message(instrumentation.metrics.summary())
+                path = self.metrics_file or "recipe_metrics.prom"
+                instrumentation.metrics.dump(path)
+                self.ui.display_message(f"Metrics written to {path}")
+        elif choice == 'p':
+            kind = self.ui.get_input("Profile the next action for cpu or memory? ").strip().lower()
+            if kind in ("cpu", "memory"):
+                self.capture = kind
+            else:
+                self.ui.display_message("Please answer cpu or memory.")
         elif choice == '0':
-            self.manager.save_to_json(self.recipe_file)
+            # every change is already persisted; just make it durable. A load
+            # still in progress has changed nothing and is abandoned.
+            if self.loaded.is_set() and self._manager is not None:
+                self._manager.close()
+            if self.metrics_file:
+                instrumentation.metrics.dump(self.metrics_file)
             self.ui.display_message("Recipes saved. Goodbye!")
             exit()
         else:
@@ -0,0 +1,241 @@
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+import recipejson
+from Recipe import Recipe
+from IngredientFactory import IngredientFactory
+
+# File layout, all little-endian:
+#   header   magic, version, counts and the offset of every section below
+#   records  one fixed-width RECORD per recipe, in catalogue order
+#   order    u32 record numbers sorted by name, for binary search
+#   dict     one SPAN per distinct ingredient name
+#   ings     u32 ingredient ids; a record owns a contiguous run of them
+#   steps    one SPAN per step; a record owns a contiguous run of them
+#   heap     utf-8 bytes of every name, ingredient and step
+MAGIC = b"RCPS"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIIIQQQQQQQ")
+# name offset, name length, first ingredient, ingredient count, first step,
+# step count, rating, favourite flag
+RECORD = struct.Struct("<QIIIIIdB3x")
+SPAN = struct.Struct("<QI")
+U32 = struct.Struct("<I")
+
+
+# ---------- BinaryRecipeStore Class ----------
+# Read-only, memory-mapped recipe catalogue. Opening a store only reads the
+# header; a Recipe is built from the mapped bytes when it is asked for.
+class BinaryRecipeStore:
+    def __init__(self, path: str, factory: IngredientFactory = None):
+        self.path = path
+        self.factory = factory or IngredientFactory()
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size < HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a version {VERSION} recipe store")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, self.ingredient_count, self.step_count, _,
+         self.records_at, self.order_at, self.dict_at, self.ings_at, self.steps_at,
+         self.heap_at, self.heap_size) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} recipe store")
+        # the sections must follow each other exactly up to the end of the file
+        if (self.records_at != HEADER.size
+                or self.order_at != self.records_at + self.count * RECORD.size
+                or self.dict_at != self.order_at + self.count * 4
+                or self.ings_at != self.dict_at + self.ingredient_count * SPAN.size
+                or self.steps_at < self.ings_at or (self.steps_at - self.ings_at) % 4
+                or self.heap_at != self.steps_at + self.step_count * SPAN.size
+                or self.heap_at + self.heap_size != len(self.data)):
+            self.close()
+            raise ValueError(f"{path} is truncated or corrupt")
+        # ingredient id -> Ingredient, filled in as ingredients are first used
+        self.ingredients: list = [None] * self.ingredient_count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> Recipe:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        (name_at, name_len, ing_start, ing_count, step_start, step_count,
+         rating, favourite) = RECORD.unpack_from(self.data, self.records_at + index * RECORD.size)
+        ing_ids = array("I")
+        start = self.ings_at + ing_start * 4
+        ing_ids.frombytes(self.data[start:start + ing_count * 4])
+        if sys.byteorder == "big":
+            ing_ids.byteswap()
+        steps = [self.span(self.steps_at, step_start + i) for i in range(step_count)]
+        return Recipe(
+            name=self.text(name_at, name_len),
+            ingredients=[self.ingredient(i) for i in ing_ids],
+            steps=steps,
+            rating=rating,
+            is_favourite=bool(favourite)
+        )
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def text(self, offset: int, length: int) -> str:
+        start = self.heap_at + offset
+        return self.data[start:start + length].decode("utf-8")
+
+    def span(self, table_at: int, index: int) -> str:
+        return self.text(*SPAN.unpack_from(self.data, table_at + index * SPAN.size))
+
+    def ingredient(self, ingredient_id: int):
+        ingredient = self.ingredients[ingredient_id]
+        if ingredient is None:
+            name = self.span(self.dict_at, ingredient_id)
+            ingredient = self.ingredients[ingredient_id] = self.factory.get_ingredient(name)
+        return ingredient
+
+    def name_bytes(self, index: int) -> bytes:
+        name_at, name_len = struct.unpack_from("<QI", self.data, self.records_at + index * RECORD.size)
+        start = self.heap_at + name_at
+        return self.data[start:start + name_len]
+
+    def find(self, name: str) -> int:
+        # binary search of the name order table; utf-8 bytes sort in code
+        # point order, the same as str comparison
+        key = name.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            index = U32.unpack_from(self.data, self.order_at + mid * 4)[0]
+            if self.name_bytes(index) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            index = U32.unpack_from(self.data, self.order_at + lo * 4)[0]
+            if self.name_bytes(index) == key:
+                return index
+        return -1
+
+    def get_recipe(self, name: str) -> Recipe:
+        index = self.find(name)
+        if index < 0:
+            raise ValueError("Recipe not found")
+        return self[index]
+
+    def names_sorted(self):
+        for pos in range(self.count):
+            index = U32.unpack_from(self.data, self.order_at + pos * 4)[0]
+            yield self.name_bytes(index).decode("utf-8")
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    @staticmethod
+    def write(path: str, recipes):
+        # Writes recipes to a new store at path. The string heap is spooled
+        # to a temporary file, so only the fixed-width tables are held in
+        # memory; the finished file atomically replaces path.
+        records = bytearray()
+        ing_ids = array("I")
+        step_spans = bytearray()
+        dictionary: dict[str, int] = {}
+        dict_spans = bytearray()
+        names: list[bytes] = []
+        # names are unique ignoring case, as in RecipeManager
+        folded: set[str] = set()
+        heap_size = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.TemporaryFile(dir=directory) as heap:
+            def put(text: str) -> tuple[int, int]:
+                nonlocal heap_size
+                data = text.encode("utf-8")
+                heap.write(data)
+                offset = heap_size
+                heap_size += len(data)
+                return offset, len(data)
+
+            for recipe in recipes:
+                key = recipe.name.casefold()
+                if key in folded:
+                    raise ValueError(f"Duplicate recipe name: {recipe.name}")
+                folded.add(key)
+                name_at, name_len = put(recipe.name)
+                names.append(recipe.name.encode("utf-8"))
+                ing_start = len(ing_ids)
+                ing_names = recipe.ingredient_names()
+                for ing_name in ing_names:
+                    ing_id = dictionary.get(ing_name)
+                    if ing_id is None:
+                        ing_id = dictionary[ing_name] = len(dictionary)
+                        dict_spans += SPAN.pack(*put(ing_name))
+                    ing_ids.append(ing_id)
+                step_start = len(step_spans) // SPAN.size
+                for step in recipe.steps:
+                    step_spans += SPAN.pack(*put(step))
+                records += RECORD.pack(name_at, name_len, ing_start, len(ing_names),
+                                       step_start, len(recipe.steps), float(recipe.rating),
+                                       recipe.is_favourite)
+
+            order = array("I", sorted(range(len(names)), key=names.__getitem__))
+            del names, folded
+            if sys.byteorder == "big":
+                order.byteswap()
+                ing_ids.byteswap()
+
+            count = len(records) // RECORD.size
+            step_count = len(step_spans) // SPAN.size
+            records_at = HEADER.size
+            order_at = records_at + len(records)
+            dict_at = order_at + len(order) * 4
+            ings_at = dict_at + len(dict_spans)
+            steps_at = ings_at + len(ing_ids) * 4
+            heap_at = steps_at + len(step_spans)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, count, len(dictionary), step_count, 0,
+                                    records_at, order_at, dict_at, ings_at, steps_at,
+                                    heap_at, heap_size))
+                f.write(records)
+                f.write(order.tobytes())
+                f.write(dict_spans)
+                f.write(ing_ids.tobytes())
+                f.write(step_spans)
+                heap.seek(0)
+                shutil.copyfileobj(heap, f)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        recipejson.fsync_dir(path)
+
+
+def json_to_store(json_path: str, store_path: str) -> list:
+    # converts a recipe JSON file to a store, returning any skipped records
+    errors = []
+    BinaryRecipeStore.write(store_path, recipejson.iter_recipes(json_path, errors=errors))
+    return errors
+
+
+def store_to_json(store_path: str, json_path: str):
+    store = BinaryRecipeStore(store_path)
+    try:
+        recipejson.dump_recipes(json_path, store)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-store", "to-json"):
+        print("usage: python BinaryRecipeStore.py to-store|to-json <input> <output>")
+        sys.exit(2)
+    if sys.argv[1] == "to-store":
+        for error in json_to_store(sys.argv[2], sys.argv[3]):
+            print(f"Skipping malformed {error}")
+    else:
+        store_to_json(sys.argv[2], sys.argv[3])
@@ -0,0 +1,246 @@
+import struct
+import zipfile
+from array import array
+import numpy as np
+from IngredientFactory import IngredientFactory
+
+# recipes per slice in the group-by passes, which bounds their temporary
+# arrays however large the catalogue is
+CHUNK = 1 << 20
+# recipe x tag flags held at once when grouping by tag
+FLAG_CELLS = 1 << 22
+COLUMNS = ("rating", "favourite")
+GROUPS = ("ingredient", "tag")
+SORTS = ("count", "mean")
+FIELDS = ("ratings", "favourites", "indptr", "indices", "name_data", "name_offsets", "ingredient_data",
+          "ingredient_offsets", "tag_data", "tag_offsets", "tag_indptr", "tag_indices")
+
+
+def pack_strings(strings) -> tuple[np.ndarray, np.ndarray]:
+    # the UTF-8 bytes of strings back to back, and where each starts (plus
+    # the end)
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), np.uint8), offsets
+
+
+def string_at(data: np.ndarray, offsets: np.ndarray, i: int) -> str:
+    return bytes(data[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+
+def mapped(path: str, f, info: zipfile.ZipInfo) -> np.ndarray:
+    # Memory maps one member of an uncompressed .npz file, or returns None
+    # if it cannot be. A member's data follows its local header (30 bytes,
+    # the file name and an extra field) and the .npy header.
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    f.seek(info.header_offset + 26)
+    name_length, extra_length = struct.unpack("<HH", f.read(4))
+    f.seek(info.header_offset + 30 + name_length + extra_length)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+    elif version == (2, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+    else:
+        return None
+    if dtype.hasobject or 0 in shape:
+        return None
+    return np.memmap(path, dtype, "r", f.tell(), shape, "F" if fortran else "C")
+
+
+# ---------- CatalogueColumns Class ----------
+# A catalogue as NumPy arrays for reports: a rating (float64, so it reads
+# back exactly as rated) and a favourite flag per recipe, and the recipe -> ingredient incidence as a CSR matrix (indptr
+# delimits each recipe's distinct ingredient ids in indices). Recipe names,
+# ingredient names and tags are stored as UTF-8 bytes with offsets, and tags
+# as an ingredient -> tag CSR matrix, so a file saved from one process reads
+# the same in another whatever its ingredient registry holds.
+#
+# save writes an uncompressed .npz and load memory maps it, so a report over
+# millions of recipes only pages in the columns it reads. group_by computes
+# a count and a mean per ingredient or tag with bincount, CHUNK recipes at a
+# time.
+class CatalogueColumns:
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.ratings = arrays["ratings"]
+        self.favourites = arrays["favourites"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.name_data = arrays["name_data"]
+        self.name_offsets = arrays["name_offsets"]
+        self.ingredient_data = arrays["ingredient_data"]
+        self.ingredient_offsets = arrays["ingredient_offsets"]
+        self.tag_data = arrays["tag_data"]
+        self.tag_offsets = arrays["tag_offsets"]
+        self.tag_indptr = arrays["tag_indptr"]
+        self.tag_indices = arrays["tag_indices"]
+        # each ingredient's tags as bits, built on the first group by tag
+        self.tag_bits: np.ndarray = None
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    @classmethod
+    def from_recipes(cls, recipes) -> "CatalogueColumns":
+        # one pass over the recipes, then the ingredient registry's names and
+        # tags for every id they can use
+        ratings = array("d")
+        favourites = bytearray()
+        lengths = array("q")
+        ids = array("I")
+        names = []
+        for recipe in recipes:
+            row = recipe.ingredient_ids
+            if len(set(row)) != len(row):
+                row = array("I", sorted(set(row)))
+            ratings.append(recipe.rating)
+            favourites.append(recipe.is_favourite)
+            lengths.append(len(row))
+            ids.extend(row)
+            names.append(recipe.name)
+        indptr = np.zeros(len(lengths) + 1, np.int64)
+        np.cumsum(np.frombuffer(lengths, np.int64), out=indptr[1:])
+        vocabulary = [IngredientFactory.name_of(i) for i in range(IngredientFactory.count())]
+        tags = [sorted({t.lower() for t in IngredientFactory.tags_of(i)}) for i in range(len(vocabulary))]
+        tag_names = sorted({t for row in tags for t in row})
+        tag_number = {t: n for n, t in enumerate(tag_names)}
+        tag_indptr = np.zeros(len(tags) + 1, np.int64)
+        np.cumsum([len(row) for row in tags], out=tag_indptr[1:])
+        arrays = {
+            "ratings": np.frombuffer(ratings, np.float64),
+            "favourites": np.frombuffer(bytes(favourites), np.bool_),
+            "indptr": indptr,
+            "indices": np.frombuffer(ids, np.uint32),
+            "tag_indptr": tag_indptr,
+            "tag_indices": np.array([tag_number[t] for row in tags for t in row], np.int32),
+        }
+        arrays["name_data"], arrays["name_offsets"] = pack_strings(names)
+        arrays["ingredient_data"], arrays["ingredient_offsets"] = pack_strings(vocabulary)
+        arrays["tag_data"], arrays["tag_offsets"] = pack_strings(tag_names)
+        return cls(arrays)
+
+    def save(self, path: str):
+        # np.savez adds .npz to a path without it
+        np.savez(path, **{field: getattr(self, field) for field in FIELDS})
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CatalogueColumns":
+        # Memory maps every array it can (all of them in a file from save);
+        # the rest are read into memory.
+        if not zipfile.is_zipfile(path):
+            raise ValueError(f"Not a catalogue columns file: {path}")
+        arrays = {}
+        with np.load(path) as archive, zipfile.ZipFile(path) as package, open(path, "rb") as f:
+            for info in package.infolist():
+                field = info.filename.removesuffix(".npy")
+                member = mapped(path, f, info) if mmap else None
+                arrays[field] = member if member is not None else archive[field]
+        missing = [field for field in FIELDS if field not in arrays]
+        if missing:
+            raise ValueError(f"Not a catalogue columns file, missing: {', '.join(missing)}")
+        return cls(arrays)
+
+    # ---------- labels ----------
+
+    def name(self, row: int) -> str:
+        return string_at(self.name_data, self.name_offsets, row)
+
+    def ingredient_count(self) -> int:
+        return len(self.ingredient_offsets) - 1
+
+    def tag_count(self) -> int:
+        return len(self.tag_offsets) - 1
+
+    def label(self, by: str, key: int) -> str:
+        if by == "ingredient":
+            return string_at(self.ingredient_data, self.ingredient_offsets, key)
+        return string_at(self.tag_data, self.tag_offsets, key)
+
+    # ---------- statistics ----------
+
+    def column(self, column: str) -> np.ndarray:
+        if column == "rating":
+            return self.ratings
+        if column == "favourite":
+            return self.favourites
+        raise ValueError(f"Unknown column: {column}")
+
+    def entries(self):
+        # (recipe row, ingredient id) arrays for CHUNK recipes at a time
+        indptr = self.indptr
+        for start in range(0, len(self), CHUNK):
+            stop = min(start + CHUNK, len(self))
+            bounds = np.asarray(indptr[start:stop + 1])
+            rows = np.repeat(np.arange(start, stop), np.diff(bounds))
+            yield rows, np.asarray(self.indices[bounds[0]:bounds[-1]], np.intp)
+
+    def tag_flags(self, start: int, stop: int) -> np.ndarray:
+        # (recipe, tag) flags for recipes start to stop: whether some
+        # ingredient of the recipe carries the tag. Each ingredient's tags
+        # are a row of 64-bit words, OR-ed together per recipe.
+        words = (self.tag_count() + 63) // 64
+        if self.tag_bits is None:
+            tag_indptr = np.asarray(self.tag_indptr)
+            tags = np.asarray(self.tag_indices, np.int64)
+            owners = np.repeat(np.arange(self.ingredient_count()), np.diff(tag_indptr))
+            bits = np.zeros((self.ingredient_count(), words), "<u8")
+            np.bitwise_or.at(bits, (owners, tags // 64), np.left_shift(1, tags % 64).astype("<u8"))
+            self.tag_bits = bits
+        bounds = np.asarray(self.indptr[start:stop + 1])
+        ids = np.asarray(self.indices[bounds[0]:bounds[-1]], np.intp)
+        sets = np.zeros((stop - start, words), "<u8")
+        filled = np.diff(bounds) > 0
+        if len(ids):
+            sets[filled] = np.bitwise_or.reduceat(self.tag_bits[ids], bounds[:-1][filled] - bounds[0], axis=0)
+        return np.unpackbits(sets.view(np.uint8), axis=1, bitorder="little")[:, :self.tag_count()]
+
+    def group_by(self, by: str = "ingredient", column: str = "rating") -> tuple[np.ndarray, np.ndarray]:
+        # (recipes, mean of column among them) per ingredient id or tag
+        # number; the mean is nan for a group without recipes, and a
+        # favourite mean is the favourite ratio
+        if by not in GROUPS:
+            raise ValueError(f"Unknown grouping: {by}")
+        values = self.column(column)
+        groups = self.ingredient_count() if by == "ingredient" else self.tag_count()
+        counts = np.zeros(groups, np.int64)
+        sums = np.zeros(groups)
+        if groups and by == "ingredient":
+            for rows, ids in self.entries():
+                counts += np.bincount(ids, minlength=groups)
+                sums += np.bincount(ids, weights=np.asarray(values[rows], np.float64), minlength=groups)
+        elif groups:
+            step = max(1, min(CHUNK, FLAG_CELLS // groups))
+            for start in range(0, len(self), step):
+                stop = min(start + step, len(self))
+                flags = self.tag_flags(start, stop)
+                counts += flags.sum(axis=0, dtype=np.int64)
+                sums += np.asarray(values[start:stop], np.float64) @ flags
+        with np.errstate(invalid="ignore"):
+            return counts, sums / counts
+
+    def top(self, by: str = "ingredient", column: str = "rating", sort: str = "count", k: int = 10,
+            min_count: int = 1) -> list[tuple[str, int, float]]:
+        # (label, recipes, mean) for the k groups of at least min_count
+        # recipes with the most recipes or the highest mean
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        counts, means = self.group_by(by, column)
+        keep = np.flatnonzero(counts >= max(min_count, 1))
+        key = counts[keep] if sort == "count" else means[keep]
+        order = keep[np.argsort(-key, kind="stable")[:k]]
+        return [(self.label(by, i), int(counts[i]), float(means[i])) for i in order]
+
+    def summary(self) -> dict:
+        count = len(self)
+        used = np.zeros(self.ingredient_count(), bool)
+        for _, ids in self.entries():
+            used[ids] = True
+        return {
+            "recipes": count,
+            "favourites": int(np.count_nonzero(self.favourites)),
+            "average_rating": float(np.mean(self.ratings, dtype=np.float64)) if count else None,
+            "ingredients_per_recipe": (int(self.indptr[-1]) / count) if count else None,
+            "distinct_ingredients": int(np.count_nonzero(used)),
+        }
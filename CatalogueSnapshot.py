@@ -0,0 +1,124 @@
+from collections.abc import Mapping, ValuesView
+from Recipe import Recipe
+
+NAME_BUCKETS = 1024
+# recipe ids per chunk, as a power of two
+CHUNK_BITS = 10
+
+
+# ---------- CatalogueSnapshot Class ----------
+# Immutable, versioned view of a catalogue as a name -> Recipe mapping that
+# iterates in listing order. The tables are split into buckets: names by hash
+# and recipes by ranges of recipe ids. draft() starts the next version sharing
+# every bucket with this one; a draft copies a bucket the first time it
+# changes it, so a write costs a few small copies however large the catalogue
+# is, and a published snapshot is never changed again.
+class CatalogueSnapshot(Mapping):
+    def __init__(self, version: int = 0, names: list = None, chunks: list = None, size: int = 0):
+        self.version = version
+        # name -> recipe id, spread over hash buckets
+        self.names: list[dict[str, int]] = names if names is not None else [{}] * NAME_BUCKETS
+        # recipe id -> Recipe, one dict per range of ids; ids only grow, so
+        # chunk order and then dict order is listing order
+        self.chunks: list[dict[int, Recipe]] = chunks if chunks is not None else []
+        self.size = size
+        # buckets this draft has copied, or None once published
+        self.owned: set = None
+
+    def __getitem__(self, name: str) -> Recipe:
+        rid = self.names[hash(name) % NAME_BUCKETS][name]
+        return self.chunks[rid >> CHUNK_BITS][rid]
+
+    def __contains__(self, name) -> bool:
+        return name in self.names[hash(name) % NAME_BUCKETS]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        for recipe in self.recipes():
+            yield recipe.name
+
+    def values(self) -> "RecipeValues":
+        return RecipeValues(self)
+
+    def recipes(self):
+        for chunk in self.chunks:
+            yield from chunk.values()
+
+    def entries(self):
+        # (recipe id, Recipe) in listing order
+        for chunk in self.chunks:
+            yield from chunk.items()
+
+    def rid_of(self, name: str) -> int:
+        return self.names[hash(name) % NAME_BUCKETS].get(name, -1)
+
+    def recipe_at(self, rid: int) -> Recipe:
+        return self.chunks[rid >> CHUNK_BITS][rid]
+
+    def slice(self, start: int, count: int) -> list[Recipe]:
+        # recipes start to start + count in listing order, skipping whole
+        # chunks before start
+        result = []
+        for chunk in self.chunks:
+            if start >= len(chunk):
+                start -= len(chunk)
+                continue
+            result += list(chunk.values())[start:start + count - len(result)]
+            start = 0
+            if len(result) >= count:
+                break
+        return result
+
+    # ---------- drafts ----------
+
+    def draft(self) -> "CatalogueSnapshot":
+        draft = CatalogueSnapshot(self.version + 1, list(self.names), list(self.chunks), self.size)
+        draft.owned = set()
+        return draft
+
+    def publish(self) -> "CatalogueSnapshot":
+        self.owned = None
+        return self
+
+    def changed(self) -> bool:
+        return bool(self.owned)
+
+    def name_bucket(self, name: str) -> dict[str, int]:
+        i = hash(name) % NAME_BUCKETS
+        if ("name", i) not in self.owned:
+            self.names[i] = dict(self.names[i])
+            self.owned.add(("name", i))
+        return self.names[i]
+
+    def chunk(self, rid: int) -> dict[int, Recipe]:
+        i = rid >> CHUNK_BITS
+        while len(self.chunks) <= i:
+            self.chunks.append({})
+            self.owned.add(("chunk", len(self.chunks) - 1))
+        if ("chunk", i) not in self.owned:
+            self.chunks[i] = dict(self.chunks[i])
+            self.owned.add(("chunk", i))
+        return self.chunks[i]
+
+    def insert(self, rid: int, recipe: Recipe):
+        self.name_bucket(recipe.name)[recipe.name] = rid
+        self.chunk(rid)[rid] = recipe
+        self.size += 1
+
+    def replace(self, rid: int, recipe: Recipe):
+        # swaps in a changed copy of a recipe under the same name and id
+        self.chunk(rid)[rid] = recipe
+
+    def remove(self, name: str) -> tuple[int, Recipe]:
+        rid = self.name_bucket(name).pop(name)
+        recipe = self.chunk(rid).pop(rid)
+        self.size -= 1
+        return rid, recipe
+
+
+# ---------- RecipeValues Class ----------
+class RecipeValues(ValuesView):
+    def __iter__(self):
+        return self._mapping.recipes()
@@ -0,0 +1,152 @@
+import numpy as np
+from MinHash import MinHash, PRIME
+from Recipe import Recipe
+from SearchIndex import tokenize
+
+DEFAULT_THRESHOLD = 0.7
+# signature positions per field, and rows per LSH band
+FIELD_PERMS = 16
+ROWS = 2
+# ids taken from any one band key per lookup (see MinHash.hits)
+BUCKET_LIMIT = 64
+# recipes shingled per batch, and candidate pairs compared per batch
+BATCH = 4096
+PAIR_BATCH = 1 << 18
+
+
+def hashed(items) -> list[int]:
+    # hash() is salted per process, which is fine for signatures that never
+    # leave it
+    return [hash(item) % PRIME for item in items]
+
+
+def shingles(recipe: Recipe) -> tuple[list[int], list[int], list[int]]:
+    # name words and word pairs, distinct ingredient ids, and word triples of
+    # the steps with case and punctuation dropped
+    words = tokenize(recipe.name)
+    steps = tokenize(" ".join(recipe.steps))
+    triples = zip(steps, steps[1:], steps[2:]) if len(steps) >= 3 else [tuple(steps)] if steps else []
+    return (hashed(words + list(zip(words, words[1:]))), sorted(set(recipe.ingredient_ids)),
+            hashed(triples))
+
+
+# ---------- DuplicateDetector Class ----------
+# Finds near-duplicate recipes: the same dish under a slightly different
+# name, with reworded steps. A recipe's signature is three MinHash
+# signatures side by side, of its name, ingredient and step shingles, so the
+# share of positions two signatures agree on estimates the mean of the three
+# Jaccard similarities. Recipes at or above threshold are duplicates. LSH
+# bands over the signatures find candidates, so neither checking new recipes
+# nor clustering a whole catalogue compares every pair.
+class DuplicateDetector:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, field_perms: int = FIELD_PERMS, rows: int = ROWS):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be above 0 and at most 1")
+        if field_perms % rows:
+            raise ValueError("field_perms must be a multiple of rows")
+        self.threshold = threshold
+        self.field_perms = field_perms
+        self.minhash = MinHash(3 * field_perms, 3 * field_perms // rows)
+        # (recipe id, Recipe, signature or None) added since the last flush
+        self.queued: list[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.minhash) + len(self.queued)
+
+    def signatures(self, recipes: list[Recipe]) -> np.ndarray:
+        k = self.field_perms
+        result = np.zeros((len(recipes), 3 * k), np.uint32)
+        for first in range(0, len(recipes), BATCH):
+            fields = zip(*[shingles(r) for r in recipes[first:first + BATCH]])
+            for f, rows in enumerate(fields):
+                result[first:first + BATCH, f * k:(f + 1) * k] = \
+                    self.minhash.signatures_of(list(rows), slice(f * k, (f + 1) * k))
+        return result
+
+    def add(self, rid: int, recipe: Recipe, signature: np.ndarray = None):
+        # indexed at the next lookup, signing queued recipes together
+        self.queued.append((rid, recipe, signature))
+
+    def flush(self):
+        if not self.queued:
+            return
+        unsigned = [i for i, (_, _, signature) in enumerate(self.queued) if signature is None]
+        signatures = np.zeros((len(self.queued), self.minhash.num_perm), np.uint32)
+        if unsigned:
+            signatures[unsigned] = self.signatures([self.queued[i][1] for i in unsigned])
+        for i, (_, _, signature) in enumerate(self.queued):
+            if signature is not None:
+                signatures[i] = signature
+        self.minhash.add([rid for rid, _, _ in self.queued], signatures)
+        self.queued = []
+
+    def remove(self, rid: int):
+        self.flush()
+        self.minhash.remove(rid)
+
+    @staticmethod
+    def similar(first: np.ndarray, i: np.ndarray, second: np.ndarray, j: np.ndarray) -> np.ndarray:
+        # estimated similarity of rows first[i[n]] and second[j[n]] for each
+        # n, a slice of pairs at a time to bound the temporary arrays
+        result = np.zeros(len(i))
+        for start in range(0, len(i), PAIR_BATCH):
+            stop = start + PAIR_BATCH
+            result[start:stop] = (first[i[start:stop]] == second[j[start:stop]]).mean(axis=1)
+        return result
+
+    def matches(self, signatures: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # for each signature, the indexed recipe id most similar to it at or
+        # above threshold, or -1, and that similarity
+        self.flush()
+        best = np.full(len(signatures), -1, np.int64)
+        scores = np.zeros(len(signatures))
+        if not len(self.minhash) or not len(signatures):
+            return best, scores
+        probes, rids = self.minhash.neighbours(signatures, BUCKET_LIMIT)
+        similarity = self.similar(signatures, probes, self.minhash.signatures, rids)
+        keep = similarity >= self.threshold
+        probes, rids, similarity = probes[keep], rids[keep], similarity[keep]
+        if not len(probes):
+            return best, scores
+        # most similar first, then the earliest recipe
+        order = np.lexsort((rids, -similarity, probes))
+        probes, rids, similarity = probes[order], rids[order], similarity[order]
+        first = np.concatenate(([True], probes[1:] != probes[:-1]))
+        best[probes[first]] = rids[first]
+        scores[probes[first]] = similarity[first]
+        return best, scores
+
+    def pairs(self, signatures: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (i, j, similarity) for rows j < i of signatures at or above
+        # threshold, among the pairs sharing a band; checked band by band so
+        # only duplicates are ever held for the whole set
+        found = [np.zeros(0, np.int64)]
+        for later, earlier in self.minhash.within(signatures):
+            similarity = self.similar(signatures, later, signatures, earlier)
+            keep = similarity >= self.threshold
+            found.append(np.unique(later[keep] << 32 | earlier[keep]))
+        pairs = np.unique(np.concatenate(found))
+        later, earlier = pairs >> 32, pairs & 0xFFFFFFFF
+        return later, earlier, self.similar(signatures, later, signatures, earlier)
+
+    def clusters(self, signatures: np.ndarray) -> list[list[int]]:
+        # groups of two or more rows joined by duplicate pairs, each in row
+        # order, ordered by their first row
+        later, earlier, _ = self.pairs(signatures)
+        parent = {}
+
+        def root(i: int) -> int:
+            parent.setdefault(i, i)
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in zip(later.tolist(), earlier.tolist()):
+            a, b = root(i), root(j)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        groups: dict[int, list[int]] = {}
+        for i in sorted(parent):
+            groups.setdefault(root(i), []).append(i)
+        return list(groups.values())
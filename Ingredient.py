@@ -1,8 +1,22 @@
+# one shared tuple per distinct tag list, so ingredients with the same tags
+# (most often none) do not each carry their own list
+_tag_tuples: dict[tuple, tuple] = {}
+
+
+def intern_tags(tags) -> tuple:
+    key = tuple(tags)
+    return _tag_tuples.setdefault(key, key)
+
+
 # ---------- Ingredient Class ----------
 class Ingredient:
-    def __init__(self, name: str, tags: list[str]):
+    __slots__ = ("name", "tags", "id", "__weakref__")
+
+    def __init__(self, name: str, tags: list[str] = (), ingredient_id: int = -1):
         self.name = name
-        self.tags = tags
+        self.tags = intern_tags(tags)
+        # dense id assigned by IngredientFactory; -1 until registered
+        self.id = ingredient_id
 
     def get_name(self) -> str:
         return self.name
@@ -1,10 +1,155 @@
-from Ingredient import Ingredient
+import re
+import threading
+import weakref
+from Ingredient import Ingredient, intern_tags
+
+_SPACES = re.compile(r"\s+")
+# Last words the suffix rules in singular would get wrong. Words ending in
+# "ss", "us" or "is" ("swiss", "hummus", "couscous") are already left alone.
+UNCHANGED = frozenset(("molasses", "series", "species", "schnapps"))
+IRREGULAR = {"cookies": "cookie", "brownies": "brownie", "smoothies": "smoothie", "veggies": "veggie",
+             "leaves": "leaf", "halves": "half", "loaves": "loaf"}
+
+
+def normalize(name: str) -> str:
+    # Lookup key for an ingredient name: case and whitespace are ignored and
+    # a plural last word is reduced to its singular ("Cherry Tomatoes" and
+    # "cherry  tomato" are the same ingredient).
+    words = _SPACES.sub(" ", name.strip()).lower().split(" ")
+    words[-1] = singular(words[-1])
+    return " ".join(words)
+
+
+def singular(word: str) -> str:
+    if word in UNCHANGED:
+        return word
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
 # ---------- IngredientFactory Class ----------
+# Process-wide, thread-safe ingredient registry. Every factory instance shares
+# it, so a name always resolves to the same dense integer id and, while
+# anything still references it, the same Ingredient object. Ingredient
+# objects are held weakly and rebuilt on demand; the id, name and tags of an
+# ingredient are kept, so ids stay stable after an object is evicted.
 class IngredientFactory:
-    def __init__(self):
-        self.ingredients: dict[str, Ingredient] = {}
+    _lock = threading.Lock()
+    # normalized name -> id, plus every exact spelling seen -> id so repeats
+    # skip normalization
+    _ids: dict[str, int] = {}
+    _spellings: dict[str, int] = {}
+    # id -> display name (as first seen) and tags
+    _names: list[str] = []
+    _tags: list[tuple] = []
+    _live: "weakref.WeakValueDictionary[int, Ingredient]" = weakref.WeakValueDictionary()
+    # bumped whenever set_tags changes an ingredient's tags
+    tag_changes = 0
+
+    @classmethod
+    def get_ingredient(cls, name: str) -> Ingredient:
+        with cls._lock:
+            return cls._get(name, ())
+
+    @classmethod
+    def get_many(cls, names: list[str]) -> list[Ingredient]:
+        # one lock acquisition for a whole record or batch
+        with cls._lock:
+            return [cls._get(name, ()) for name in names]
+
+    @classmethod
+    def get_ids(cls, names: list[str]) -> list[int]:
+        # like get_many, but without building Ingredient objects
+        with cls._lock:
+            return [cls._get_id(name, ()) for name in names]
+
+    @classmethod
+    def register(cls, ingredient: Ingredient) -> Ingredient:
+        # gives an Ingredient built outside the factory its registry id
+        if ingredient.id >= 0:
+            return ingredient
+        with cls._lock:
+            ingredient.id = cls._get_id(ingredient.name, ingredient.tags)
+        return ingredient
+
+    @classmethod
+    def set_tags(cls, name: str, tags) -> Ingredient:
+        # Replaces the tags of ingredient name, registering it if new. Recipe
+        # JSON carries only ingredient names, so their tags come from here.
+        with cls._lock:
+            ingredient_id = cls._get_id(name, ())
+            tags = intern_tags(tags)
+            if cls._tags[ingredient_id] != tags:
+                cls._tags[ingredient_id] = tags
+                cls.tag_changes += 1
+            ingredient = cls._materialize(ingredient_id)
+            ingredient.tags = tags
+            return ingredient
+
+    @classmethod
+    def by_id(cls, ingredient_id: int) -> Ingredient:
+        ingredient = cls._live.get(ingredient_id)
+        if ingredient is None:
+            with cls._lock:
+                ingredient = cls._materialize(ingredient_id)
+        return ingredient
+
+    @classmethod
+    def lookup_id(cls, name: str) -> int:
+        # id of an already known ingredient, or -1; never registers name
+        ingredient_id = cls._spellings.get(name)
+        if ingredient_id is None:
+            ingredient_id = cls._ids.get(normalize(name), -1)
+        return ingredient_id
+
+    @classmethod
+    def name_of(cls, ingredient_id: int) -> str:
+        return cls._names[ingredient_id]
+
+    @classmethod
+    def tags_of(cls, ingredient_id: int) -> tuple:
+        return cls._tags[ingredient_id]
+
+    @classmethod
+    def tagged(cls, tag: str) -> set[int]:
+        # ids of the ingredients carrying tag, ignoring case
+        tag = tag.lower()
+        with cls._lock:
+            return {i for i, tags in enumerate(cls._tags) if tags and tag in (t.lower() for t in tags)}
+
+    @classmethod
+    def count(cls) -> int:
+        return len(cls._names)
+
+    @classmethod
+    def _get(cls, name: str, tags) -> Ingredient:
+        return cls._materialize(cls._get_id(name, tags))
+
+    @classmethod
+    def _get_id(cls, name: str, tags) -> int:
+        ingredient_id = cls._spellings.get(name)
+        if ingredient_id is None:
+            key = normalize(name)
+            ingredient_id = cls._ids.get(key)
+            if ingredient_id is None:
+                ingredient_id = cls._ids[key] = len(cls._names)
+                cls._names.append(_SPACES.sub(" ", name.strip()))
+                cls._tags.append(intern_tags(tags))
+            cls._spellings[name] = ingredient_id
+        return ingredient_id
 
-    def get_ingredient(self, name: str) -> Ingredient:
-        if name not in self.ingredients:
-            self.ingredients[name] = Ingredient(name, [])
-        return self.ingredients[name]
+    @classmethod
+    def _materialize(cls, ingredient_id: int) -> Ingredient:
+        # caller holds _lock
+        ingredient = cls._live.get(ingredient_id)
+        if ingredient is None:
+            ingredient = Ingredient(cls._names[ingredient_id], cls._tags[ingredient_id], ingredient_id)
+            cls._live[ingredient_id] = ingredient
+        return ingredient
@@ -0,0 +1,87 @@
+from collections import Counter
+from Recipe import Recipe
+from IngredientFactory import IngredientFactory
+
+# ---------- IngredientIndex Class ----------
+# Inverted index from ingredient id to the integer IDs of the recipes using
+# it. Queries name ingredients, which are resolved through the registry, so
+# "Eggs" finds recipes made with "egg". Queries only touch the postings of
+# the ingredients they name, so their cost follows the size of those postings
+# rather than the catalogue.
+class IngredientIndex:
+    def __init__(self):
+        self.postings: dict[int, set[int]] = {}
+        # recipe id -> number of distinct ingredients, and the reverse, so
+        # pantry queries can find recipes with no pantry ingredient at all
+        self.sizes: dict[int, int] = {}
+        self.by_size: dict[int, set[int]] = {}
+
+    def add(self, recipe_id: int, recipe: Recipe):
+        ids = set(recipe.ingredient_ids)
+        for ingredient_id in ids:
+            self.postings.setdefault(ingredient_id, set()).add(recipe_id)
+        self.sizes[recipe_id] = len(ids)
+        self.by_size.setdefault(len(ids), set()).add(recipe_id)
+
+    def remove(self, recipe_id: int, recipe: Recipe):
+        for ingredient_id in set(recipe.ingredient_ids):
+            ids = self.postings.get(ingredient_id)
+            if ids is not None:
+                ids.discard(recipe_id)
+                if not ids:
+                    del self.postings[ingredient_id]
+        size = self.sizes.pop(recipe_id, None)
+        if size is not None:
+            self.by_size[size].discard(recipe_id)
+            if not self.by_size[size]:
+                del self.by_size[size]
+
+    def posting(self, name: str) -> set[int]:
+        return self.postings.get(IngredientFactory.lookup_id(name), set())
+
+    def count(self, name: str) -> int:
+        return len(self.posting(name))
+
+    def contains_all(self, names: list[str]) -> set[int]:
+        if not names:
+            return set(self.sizes)
+        # intersect from the rarest ingredient up so every step is as small
+        # as possible
+        sets = sorted((self.posting(n) for n in set(names)), key=len)
+        result = set(sets[0])
+        for ids in sets[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+
+    def contains_any(self, names: list[str]) -> set[int]:
+        result: set[int] = set()
+        for name in set(names):
+            result |= self.posting(name)
+        return result
+
+    def excludes(self, names: list[str], candidates: set[int] = None) -> set[int]:
+        banned = self.contains_any(names)
+        if candidates is None:
+            candidates = self.sizes.keys()
+        return {rid for rid in candidates if rid not in banned}
+
+    def can_make(self, pantry: list[str], missing: int = 0) -> dict[int, int]:
+        # recipe id -> number of ingredients missing from the pantry
+        hits = Counter()
+        # by id, so two spellings of one ingredient count once
+        for ingredient_id in {IngredientFactory.lookup_id(name) for name in pantry}:
+            hits.update(self.postings.get(ingredient_id, ()))
+        result = {}
+        for rid, have in hits.items():
+            lacking = self.sizes[rid] - have
+            if lacking <= missing:
+                result[rid] = lacking
+        # recipes sharing nothing with the pantry still qualify when they are
+        # small enough
+        for size in range(missing + 1):
+            for rid in self.by_size.get(size, ()):
+                if rid not in hits:
+                    result[rid] = size
+        return result
@@ -0,0 +1,199 @@
+import numpy as np
+
+# Mersenne prime; every hash value is below it, so it fits a uint32 and also
+# marks an empty set
+PRIME = (1 << 31) - 1
+# recipes hashed per batch, to bound the (ingredients x permutations) matrix
+BATCH = 8192
+# 64-bit FNV prime, for folding a band's rows into one key
+FOLD = np.uint64(0x100000001B3)
+
+
+def spans(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    # every index in the half-open ranges lo[i]:hi[i], concatenated
+    lengths = hi - lo
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, np.int64)
+    starts = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return starts + np.arange(total)
+
+
+# ---------- MinHash Class ----------
+# MinHash signatures of integer sets, by recipe id, with a banded LSH index
+# over them. Two sets agree on each signature position with probability
+# equal to their Jaccard similarity, and share a band key (all rows of one
+# band) far more often when they are similar, so candidates come from a few
+# sorted-array lookups instead of a pass over every recipe. New signatures
+# wait in a pending batch, held in one dict per band, and are merged into
+# the sorted bands in bulk; removed ids are dropped at the next merge.
+class MinHash:
+    def __init__(self, num_perm: int = 64, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rnd = np.random.default_rng(seed)
+        self.a = rnd.integers(1, PRIME, num_perm, dtype=np.uint64)
+        self.b = rnd.integers(0, PRIME, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # recipe id -> signature, and whether the id is still live
+        self.signatures = np.zeros((0, num_perm), np.uint32)
+        self.alive = np.zeros(0, bool)
+        self.live = 0
+        # per band: sorted keys and the recipe ids they belong to
+        self.keys = [np.zeros(0, np.uint64)] * bands
+        self.ids = [np.zeros(0, np.int64)] * bands
+        self.pending: list[int] = []
+        # per band: key -> pending ids
+        self.pending_index: list[dict[int, list[int]]] = [{} for _ in range(bands)]
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return self.live
+
+    def signature(self, ids) -> np.ndarray:
+        return self.signatures_of([ids])[0]
+
+    def signatures_of(self, rows: list, perms: slice = slice(None)) -> np.ndarray:
+        # One signature per row of integer ids below PRIME, over the
+        # permutations in perms, so parts of a signature can cover different
+        # sets.
+        a, b = self.a[perms], self.b[perms]
+        result = np.full((len(rows), len(a)), PRIME, np.uint32)
+        for first in range(0, len(rows), BATCH):
+            batch = [np.asarray(r, np.uint64) for r in rows[first:first + BATCH]]
+            lengths = np.array([len(r) for r in batch])
+            filled = np.flatnonzero(lengths)
+            if not len(filled):
+                continue
+            flat = np.concatenate(batch)
+            hashed = (flat[:, None] * a + b) % PRIME
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[filled]
+            result[first + filled] = np.minimum.reduceat(hashed, starts, axis=0)
+        return result
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        # (n, bands) keys, each folding one band's rows together
+        banded = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        keys = np.zeros(banded.shape[:2], np.uint64)
+        for row in range(self.rows):
+            keys = (keys * FOLD) ^ banded[:, :, row]
+        return keys
+
+    def reserve(self, size: int):
+        if size > len(self.alive):
+            capacity = max(size, 2 * len(self.alive), 1024)
+            signatures = np.zeros((capacity, self.num_perm), np.uint32)
+            signatures[:len(self.signatures)] = self.signatures
+            alive = np.zeros(capacity, bool)
+            alive[:len(self.alive)] = self.alive
+            self.signatures, self.alive = signatures, alive
+
+    def add(self, rids, signatures: np.ndarray):
+        rids = np.asarray(rids, np.int64)
+        if not len(rids):
+            return
+        self.reserve(int(rids.max()) + 1)
+        self.signatures[rids] = signatures
+        self.alive[rids] = True
+        self.live += len(rids)
+        ids = rids.tolist()
+        self.pending += ids
+        for band, keys in zip(self.pending_index, self.band_keys(np.atleast_2d(signatures)).T.tolist()):
+            for key, rid in zip(keys, ids):
+                found = band.get(key)
+                if found is None:
+                    band[key] = [rid]
+                else:
+                    found.append(rid)
+        if len(self.pending) > max(1024, self.live // 8):
+            self.merge()
+
+    def remove(self, rid: int):
+        if rid < len(self.alive) and self.alive[rid]:
+            self.alive[rid] = False
+            self.live -= 1
+            self.dead += 1
+            if self.dead > max(1024, self.live):
+                self.merge()
+
+    def merge(self):
+        # folds the pending ids into the sorted bands and drops removed ones
+        pending = np.array(self.pending, np.int64)
+        pending = pending[self.alive[pending]]
+        pending_keys = self.band_keys(self.signatures[pending])
+        keys, ids = [], []
+        for band in range(self.bands):
+            band_ids = np.concatenate((self.ids[band], pending))
+            band_keys = np.concatenate((self.keys[band], pending_keys[:, band]))
+            keep = self.alive[band_ids]
+            band_ids, band_keys = band_ids[keep], band_keys[keep]
+            order = np.argsort(band_keys, kind="stable")
+            keys.append(band_keys[order])
+            ids.append(band_ids[order])
+        self.keys, self.ids = keys, ids
+        self.pending = []
+        self.pending_index = [{} for _ in range(self.bands)]
+        self.dead = 0
+
+    def hits(self, signatures: np.ndarray, bucket_limit: int = None) -> tuple[np.ndarray, np.ndarray]:
+        # (probe index, id) for every band key an indexed id shares with one
+        # of the signatures, once per shared band. bucket_limit caps the ids
+        # taken from any one key, so a key most signatures share (such as
+        # that of an empty set) costs no more than a rare one.
+        probes = self.band_keys(np.atleast_2d(signatures))
+        found_probes, found_ids = [], []
+        for band in range(self.bands):
+            keys = self.keys[band]
+            lo = np.searchsorted(keys, probes[:, band], "left")
+            hi = np.searchsorted(keys, probes[:, band], "right")
+            if bucket_limit is not None:
+                hi = np.minimum(hi, lo + bucket_limit)
+            found_probes.append(np.repeat(np.arange(len(probes)), hi - lo))
+            found_ids.append(self.ids[band][spans(lo, hi)])
+            if self.pending:
+                index = self.pending_index[band]
+                for i, key in enumerate(probes[:, band].tolist()):
+                    ids = index.get(key)
+                    if ids:
+                        ids = ids[:bucket_limit]
+                        found_probes.append(np.full(len(ids), i))
+                        found_ids.append(np.array(ids, np.int64))
+        probe_index, ids = np.concatenate(found_probes), np.concatenate(found_ids)
+        live = self.alive[ids]
+        return probe_index[live], ids[live]
+
+    def candidates(self, signatures: np.ndarray, limit: int = None) -> np.ndarray:
+        # Live ids sharing at least one band key with any of the signatures.
+        # Beyond limit, the ids sharing the most band keys are kept.
+        result, hits = np.unique(self.hits(signatures)[1], return_counts=True)
+        if limit is not None and len(result) > limit:
+            result = np.sort(result[np.argpartition(-hits, limit - 1)[:limit]])
+        return result
+
+    def neighbours(self, signatures: np.ndarray, bucket_limit: int = None) -> tuple[np.ndarray, np.ndarray]:
+        # distinct (probe index, id) pairs sharing at least one band key
+        probe_index, ids = self.hits(signatures, bucket_limit)
+        pairs = np.unique(probe_index << 32 | ids)
+        return pairs >> 32, pairs & 0xFFFFFFFF
+
+    def within(self, signatures: np.ndarray):
+        # Yields, band by band, (i, j) arrays of rows of signatures with
+        # j < i that share that band's key, found without comparing every
+        # pair: rows sharing a key are linked to the first row with it and
+        # to the one before, so a band yields at most two pairs per row and
+        # similar rows still end up connected. A pair sharing several bands
+        # is yielded for each.
+        keys = self.band_keys(signatures)
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind="stable")
+            sorted_keys = keys[order, band]
+            same = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1]) + 1
+            starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+            first = order[starts[np.searchsorted(starts, same, "right") - 1]]
+            yield np.concatenate((order[same], order[same])), np.concatenate((order[same - 1], first))
+
+    def estimate(self, signature: np.ndarray, rids: np.ndarray) -> np.ndarray:
+        # estimated Jaccard similarity of each id's set to signature's
+        return (self.signatures[rids] == signature).mean(axis=1)
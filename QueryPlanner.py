@@ -0,0 +1,290 @@
+import math
+import time
+from CatalogueSnapshot import CatalogueSnapshot
+from IngredientFactory import IngredientFactory
+from RecipeQuery import RecipeQuery
+from SearchIndex import tokenize
+
+# another candidate set is intersected with the driving one when it is at most
+# this many times larger; otherwise its predicate is checked recipe by recipe
+INTERSECT_RATIO = 8
+# cost of checking one recipe against the remaining predicates, next to
+# taking one id from an index
+CHECK_COST = 4
+
+
+# ---------- AccessPath Class ----------
+# One way to produce candidate recipe ids: an index lookup or a scan. ids()
+# yields them in order (listing, name or rating order, or None for no
+# particular order); members() returns them as a set for intersecting.
+# predicate is the query predicate the path comes from, and exact tells
+# whether every id it yields satisfies it, so it need not be checked again.
+class AccessPath:
+    def __init__(self, label: str, estimate: int, predicate: str = None, ids=None, members=None,
+                 order: str = None, exact: bool = True, built: bool = True):
+        self.label = label
+        self.estimate = estimate
+        self.predicate = predicate
+        self.ids = ids or (lambda: members())
+        self.members = members or (lambda: set(self.ids()))
+        self.order = order
+        self.exact = exact
+        # whether members() has to build its set rather than return an index's
+        self.built = built
+
+
+# ---------- QueryPlan Class ----------
+# The chosen way to run a RecipeQuery, with what it expects and, once
+# executed, what it actually did.
+class QueryPlan:
+    def __init__(self, query: RecipeQuery, total: int, estimate: float, mode: str, driver: AccessPath,
+                 intersect: list[AccessPath], checks: list[tuple], cost: float, considered: list[tuple]):
+        self.query = query
+        self.total = total
+        self.estimate = estimate
+        # "scan": walk the driver in the wanted order and stop at the limit;
+        # "candidates": collect and intersect id sets, then check and sort
+        self.mode = mode
+        self.driver = driver
+        self.intersect = intersect
+        # (predicate, recipe -> bool) still to be checked per recipe
+        self.checks = checks
+        self.cost = cost
+        # (description, estimated cost) of every plan weighed
+        self.considered = considered
+        self.stats: dict = None
+
+    def execute(self, snapshot: CatalogueSnapshot) -> list[int]:
+        start = time.perf_counter()
+        order, count = self.query.order, self.query.count
+        checks = [check for _, check in self.checks]
+        stats = {"candidates": 0, "intersected": 0, "examined": 0, "returned": 0}
+        result = []
+        if count == 0:
+            pass
+        elif self.mode == "scan":
+            for rid in self.driver.ids():
+                stats["examined"] += 1
+                recipe = snapshot.recipe_at(rid)
+                if all(check(recipe) for check in checks):
+                    result.append(rid)
+                    if len(result) == count:
+                        break
+        else:
+            candidates = self.driver.members()
+            stats["candidates"] = len(candidates)
+            for path in self.intersect:
+                if not candidates:
+                    break
+                candidates = candidates & path.members()
+            stats["intersected"] = len(candidates)
+            if order == "listing":
+                # listing order is id order, so matches can stop at the limit
+                for rid in sorted(candidates):
+                    stats["examined"] += 1
+                    if all(check(snapshot.recipe_at(rid)) for check in checks):
+                        result.append(rid)
+                        if len(result) == count:
+                            break
+            else:
+                stats["examined"] = len(candidates)
+                matches = [(snapshot.recipe_at(rid), rid) for rid in candidates]
+                matches = [m for m in matches if all(check(m[0]) for check in checks)]
+                if order == "name":
+                    matches.sort(key=lambda m: (m[0].name, m[1]))
+                else:
+                    matches.sort(key=lambda m: (-m[0].rating, m[1]))
+                result = [rid for _, rid in matches[:count]]
+        stats["returned"] = len(result)
+        stats["seconds"] = time.perf_counter() - start
+        self.stats = stats
+        return result
+
+    def explain(self) -> str:
+        lines = [f"query: {str(self.query) or '(everything)'}",
+                 f"catalogue: {self.total} recipes, about {self.estimate:.0f} expected to match"]
+        if self.mode == "scan":
+            lines.append(f"plan: scan {self.driver.label} (est {self.driver.estimate}) in {self.query.order} order"
+                         + (", stopping at the limit" if self.query.count is not None else ""))
+        else:
+            lines.append(f"plan: candidates from {self.driver.label} (est {self.driver.estimate})")
+            for path in self.intersect:
+                lines.append(f"  intersect {path.label} (est {path.estimate})")
+            if self.query.order != "listing":
+                lines.append(f"  sort by {self.query.order}")
+        for predicate, _ in self.checks:
+            lines.append(f"  check {predicate}")
+        if self.query.count is not None:
+            lines.append(f"  limit {self.query.count}")
+        lines.append(f"estimated cost: {self.cost:.0f}")
+        lines.append("considered:")
+        for description, cost in sorted(self.considered, key=lambda c: c[1]):
+            lines.append(f"  {cost:>12.0f}  {description}")
+        s = self.stats
+        if s is not None and self.mode == "scan":
+            lines.append(f"actual: {s['examined']} examined, {s['returned']} returned in {s['seconds'] * 1e3:.2f} ms")
+        elif s is not None:
+            lines.append(f"actual: {s['candidates']} candidates, {s['intersected']} after intersecting,"
+                         f" {s['examined']} examined, {s['returned']} returned in {s['seconds'] * 1e3:.2f} ms")
+        return "\n".join(lines)
+
+
+# ---------- QueryPlanner Class ----------
+# Plans RecipeQuery runs against a RecipeManager's indexes. Each predicate
+# gets a selectivity from index statistics (posting lengths, rank
+# differences in the rating order, the favourite count), assumed
+# independent. Two kinds of plan are costed: scanning an index that already
+# yields the wanted order, checking each recipe and stopping at the limit,
+# and collecting the most selective index's ids, intersecting them with any
+# other id set not much larger, then checking and sorting what is left. The
+# cheaper one runs. Must be called where the indexes match the snapshot, as
+# RecipeManager.read does.
+class QueryPlanner:
+    def __init__(self, manager):
+        self.manager = manager
+
+    def plan(self, query: RecipeQuery, snapshot: CatalogueSnapshot) -> QueryPlan:
+        manager = self.manager
+        total = len(snapshot)
+        paths: list[AccessPath] = []
+        checks: dict[str, object] = {}
+        selectivity: dict[str, float] = {}
+
+        def share(count: int) -> float:
+            return min(count / total, 1.0) if total else 0.0
+
+        if query.text:
+            label = "name " + " ".join(f'"{t}"' for t in query.text)
+            checks[label] = self.text_check(query.text)
+            selectivity[label] = 1.0
+            for token in query.text:
+                postings = manager.search_index.prefix_postings(token)
+                if postings is None:
+                    continue
+                estimate = sum(len(p) for p in postings)
+                selectivity[label] = min(selectivity[label], share(estimate))
+                paths.append(AccessPath(f'text "{token}*"', estimate, label, exact=False,
+                                        members=lambda postings=postings: set().union(*postings)))
+
+        if query.min_rating is not None or query.max_rating is not None:
+            low = -math.inf if query.min_rating is None else query.min_rating
+            high = math.inf if query.max_rating is None else query.max_rating
+            label = f"rating {low:g}..{high:g}"
+            checks[label] = lambda r, low=low, high=high: low <= r.rating <= high
+            paths.append(self.rating_path(label, low, high))
+            selectivity[label] = share(paths[-1].estimate)
+        elif query.order == "rating":
+            paths.append(self.rating_path("rating order", -math.inf, math.inf))
+
+        if query.favourite is not None:
+            label = "favourite" if query.favourite else "not favourite"
+            favourites = manager.favourite_ids
+            checks[label] = lambda r, flag=query.favourite: r.is_favourite == flag
+            selectivity[label] = share(len(favourites))
+            if query.favourite:
+                paths.append(AccessPath("favourites index", len(favourites), label, order="listing",
+                                        ids=lambda: iter(favourites)))
+            else:
+                selectivity[label] = 1 - selectivity[label]
+
+        for name in query.includes:
+            label = f"with:{name}"
+            ingredient_id = IngredientFactory.lookup_id(name)
+            posting = manager.ingredient_index.postings.get(ingredient_id, set()) if ingredient_id >= 0 else set()
+            checks[label] = lambda r, i=ingredient_id: i in r.ingredient_ids
+            selectivity[label] = share(len(posting))
+            paths.append(AccessPath(f"ingredient index {name}", len(posting), label, built=False,
+                                    members=lambda posting=posting: posting))
+
+        if query.excludes:
+            label = "without:" + ",".join(query.excludes)
+            banned = {IngredientFactory.lookup_id(n) for n in query.excludes} - {-1}
+            checks[label] = lambda r, banned=banned: not any(i in banned for i in r.ingredient_ids)
+            selectivity[label] = 1.0
+            for ingredient_id in banned:
+                selectivity[label] *= 1 - share(len(manager.ingredient_index.postings.get(ingredient_id, ())))
+
+        for tag in query.tags:
+            label = f"tag:{tag}"
+            tagged = IngredientFactory.tagged(tag)
+            postings = [manager.ingredient_index.postings.get(i, ()) for i in tagged]
+            estimate = sum(len(p) for p in postings)
+            checks[label] = lambda r, tagged=tagged: any(i in tagged for i in r.ingredient_ids)
+            selectivity[label] = share(estimate)
+            paths.append(AccessPath(f"tag {tag} ({len(tagged)} ingredients)", estimate, label,
+                                    members=lambda postings=postings: set().union(*postings)))
+
+        if query.order == "name":
+            by_name = manager.sorter.by_name
+            paths.append(AccessPath("name order", total, order="name",
+                                    ids=lambda: (rid for _, rid in by_name.scan())))
+        paths.append(AccessPath("listing order", total, order="listing",
+                                ids=lambda: (rid for rid, _ in snapshot.entries())))
+
+        estimate = total * math.prod(selectivity.values())
+        considered = []
+        best = None
+
+        def weigh(description: str, cost: float, plan: tuple):
+            nonlocal best
+            considered.append((description, cost))
+            if best is None or cost < best[0]:
+                best = (cost,) + plan
+
+        def remaining(path: AccessPath) -> list:
+            return [(label, check) for label, check in checks.items()
+                    if label != path.predicate or not path.exact]
+
+        # scans yielding the wanted order, stopping once the limit is reached
+        for path in paths:
+            if path.order != query.order:
+                continue
+            matches = path.estimate * math.prod(s for label, s in selectivity.items() if label != path.predicate)
+            examined = path.estimate
+            if query.count is not None and matches > 0:
+                examined = min(path.estimate, query.count * path.estimate / matches)
+            weigh(f"scan {path.label}", CHECK_COST * examined, ("scan", path, [], remaining(path)))
+
+        # the most selective index, intersected with the sets not much larger
+        indexed = [p for p in paths if p.predicate is not None]
+        if indexed:
+            driver = min(indexed, key=lambda p: p.estimate)
+            cost = driver.estimate if driver.built else 0
+            size = driver.estimate
+            intersect = []
+            for path in sorted(indexed, key=lambda p: p.estimate):
+                if path is driver or path.estimate > INTERSECT_RATIO * max(driver.estimate, 1):
+                    continue
+                cost += (path.estimate if path.built else 0) + size
+                size *= selectivity.get(path.predicate, 1.0)
+                intersect.append(path)
+            covered = {p.predicate for p in [driver] + intersect if p.exact}
+            left = [(label, check) for label, check in checks.items() if label not in covered]
+            examined = size
+            if query.order == "listing" and query.count is not None and estimate > 0:
+                examined = min(size, query.count * size / estimate)
+            cost += size + CHECK_COST * examined
+            description = " & ".join(p.label for p in [driver] + intersect)
+            weigh(f"candidates {description}", cost, ("candidates", driver, intersect, left))
+
+        cost, mode, driver, intersect, left = best
+        return QueryPlan(query, total, estimate, mode, driver, intersect, left, cost, considered)
+
+    def rating_path(self, label: str, low: float, high: float) -> AccessPath:
+        # recipes rated low..high, best first, located by rank in the rating
+        # order, which is keyed by (-rating, recipe id)
+        by_rating = self.manager.sorter.by_rating
+        start = by_rating.rank((-high, -1)) if high != math.inf else 0
+        stop = by_rating.rank((-low, math.inf)) if low != -math.inf else len(by_rating)
+        stop = max(start, stop)
+        return AccessPath(f"rating index [{start}:{stop}]", stop - start,
+                          label if low != -math.inf or high != math.inf else None, order="rating",
+                          ids=lambda: (rid for _, rid in by_rating.scan(start, stop)))
+
+    @staticmethod
+    def text_check(tokens: list[str]):
+        # every token starts some word of the name
+        def check(recipe) -> bool:
+            words = tokenize(recipe.name)
+            return all(any(w.startswith(t) for w in words) for t in tokens)
+        return check
@@ -0,0 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+# ---------- ReadWriteLock Class ----------
+# asyncio lock that lets any number of readers in at once but gives a writer
+# the catalogue to itself. Waiting writers hold back new readers, so a steady
+# stream of reads cannot starve a write.
+class ReadWriteLock:
+    def __init__(self):
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+        self.changed = asyncio.Condition()
+
+    @asynccontextmanager
+    async def read(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: not self.writing and not self.waiting_writers)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            async with self.changed:
+                self.readers -= 1
+                if not self.readers:
+                    self.changed.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self.changed:
+            self.waiting_writers += 1
+            try:
+                await self.changed.wait_for(lambda: not self.writing and not self.readers)
+            finally:
+                # a cancelled writer must release the readers it held back
+                self.waiting_writers -= 1
+                self.changed.notify_all()
+            self.writing = True
+        try:
+            yield
+        finally:
+            async with self.changed:
+                self.writing = False
+                self.changed.notify_all()
@@ -1,29 +1,136 @@
-import Ingredient
+from array import array
+from itertools import count
+from Ingredient import Ingredient
+from IngredientFactory import IngredientFactory
+from StringArena import StringArena
+from LRUCache import LRUCache
+
+# step text of every recipe in the process
+step_arena = StringArena()
+# display() text by recipe revision
+display_cache = LRUCache(4096)
+revisions = count(1)
+# ratings run from 0 to MAX_RATING
+MAX_RATING = 5.0
+
+
+def valid_rating(rating) -> bool:
+    # a number from 0 to MAX_RATING; NaN in particular would break every
+    # order by rating, since it compares false with everything
+    return not isinstance(rating, bool) and isinstance(rating, (int, float)) and 0 <= rating <= MAX_RATING
+
+
+def check_rating(rating):
+    if not valid_rating(rating):
+        raise ValueError(f"'rating' must be a number from 0 to {MAX_RATING:g}")
+
+
 # ---------- Recipe Class ----------
 class Recipe:
+    # no per-instance __dict__; ingredients are held as registry ids and
+    # steps as a reference into step_arena. rev keys the cached display text;
+    # it is given out on first display and reset to 0 by every change.
+    # version counts changes to the recipe, for syncing catalogues; modified
+    # is the change sequence number of the last one in its RecipeManager.
+    __slots__ = ("name", "ingredient_ids", "steps_chunk", "steps_ref", "rating", "is_favourite", "rev",
+                 "version", "modified")
+
     def __init__(self, name: str, ingredients: list[Ingredient], steps: list[str], rating: float, is_favourite: bool):
+        self.rev = 0
+        self.version = 1
+        self.modified = 0
         self.name = name
         self.ingredients = ingredients
         self.steps = steps
         self.rating = rating
         self.is_favourite = is_favourite
 
+    @classmethod
+    def from_ids(cls, name: str, ingredient_ids, steps: list[str], rating: float, is_favourite: bool) -> "Recipe":
+        # builds a recipe straight from registry ids, for loaders
+        recipe = cls.__new__(cls)
+        recipe.rev = 0
+        recipe.version = 1
+        recipe.modified = 0
+        recipe.name = name
+        recipe.ingredient_ids = array("I", ingredient_ids)
+        recipe.steps = steps
+        recipe.rating = rating
+        recipe.is_favourite = is_favourite
+        return recipe
+
+    def copy(self) -> "Recipe":
+        # shares the ingredient ids and step text, which are never changed in
+        # place
+        recipe = Recipe.__new__(Recipe)
+        recipe.rev = 0
+        recipe.version = self.version
+        recipe.modified = self.modified
+        recipe.name = self.name
+        recipe.ingredient_ids = self.ingredient_ids
+        recipe.steps_chunk = self.steps_chunk
+        recipe.steps_ref = self.steps_ref
+        recipe.rating = self.rating
+        recipe.is_favourite = self.is_favourite
+        return recipe
+
+    def ingredient_names(self) -> list[str]:
+        return [IngredientFactory.name_of(i) for i in self.ingredient_ids]
+
+    @property
+    def ingredients(self) -> list[Ingredient]:
+        return [IngredientFactory.by_id(i) for i in self.ingredient_ids]
+
+    @ingredients.setter
+    def ingredients(self, ingredients: list[Ingredient]):
+        self.ingredient_ids = array("I", [IngredientFactory.register(i).id for i in ingredients])
+        self.invalidate()
+
+    @property
+    def steps(self) -> list[str]:
+        return StringArena.get(self.steps_chunk, self.steps_ref)
+
+    @steps.setter
+    def steps(self, steps: list[str]):
+        if any("\0" in s for s in steps):
+            raise ValueError("steps may not contain NUL characters")
+        self.steps_chunk, self.steps_ref = step_arena.add(steps)
+        self.invalidate()
+
     def display(self) -> str:
-        ingredients_str = ', '.join([i.get_name() for i in self.ingredients])
+        # rev 0 is never cached, so an unrendered recipe counts as a miss
+        text = display_cache.get(self.rev)
+        if text is not None:
+            return text
+        text = self.render()
+        self.rev = next(revisions)
+        display_cache.put(self.rev, text)
+        return text
+
+    def render(self) -> str:
+        ingredients_str = ', '.join(self.ingredient_names())
         steps_str = '\n'.join([f"{i+1}. {s}" for i, s in enumerate(self.steps)])
         fav = "(Favourite)" if self.is_favourite else ""
         return f"Recipe: {self.name} {fav}\nIngredients: {ingredients_str}\nSteps:\n{steps_str}\nRating: {self.rating}/5"
 
     def update_rating(self, rating: float):
         self.rating = rating
+        self.invalidate()
 
     def toggle_favourite(self):
         self.is_favourite = not self.is_favourite
+        self.invalidate()
+
+    def invalidate(self):
+        # drops the cached display text after a change
+        if self.rev:
+            display_cache.discard(self.rev)
+            self.rev = 0
 
     def to_dict(self):
         return {
             "name": self.name,
-            "ingredients": [i.get_name() for i in self.ingredients],
+            "ingredients": self.ingredient_names(),
             "steps": self.steps,
             "rating": self.rating,
             "is_favourite": self.is_favourite
@@ -0,0 +1,21 @@
+from itertools import islice
+from Recipe import Recipe
+
+# ---------- RecipeCursor Class ----------
+# Positional, page-at-a-time access to a listing. fetch(start, count) returns
+# at most count recipes starting at position start; total is the listing
+# length, or None when the source cannot tell without reading it all.
+class RecipeCursor:
+    def __init__(self, fetch, total: int = None):
+        self.fetch = fetch
+        self.total = total
+
+    @staticmethod
+    def from_list(recipes: list[Recipe]) -> "RecipeCursor":
+        return RecipeCursor(lambda start, count: recipes[start:start + count], len(recipes))
+
+    @staticmethod
+    def from_iterable(make_iter, total: int = None) -> "RecipeCursor":
+        # make_iter() starts a fresh iteration; a page skips to its start
+        # rather than buffering everything before it
+        return RecipeCursor(lambda start, count: list(islice(make_iter(), start, start + count)), total)
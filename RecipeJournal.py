@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+import recipejson
+
+# ---------- RecipeJournal Class ----------
+# Append-only log of catalogue changes, one JSON object per line. Every
+# record states the resulting value rather than a delta (a rating is set, a
+# favourite flag is set to true or false), so replaying a record that is
+# already reflected in the snapshot is harmless.
+class RecipeJournal:
+    def __init__(self, path: str, sync_every: int = 64, sync_interval: float = 1.0,
+                 compact_after: int = 10000, records: int = 0):
+        self.path = path
+        # changes in the journal since the last compaction started, those
+        # already in it when opened included
+        self.records = records
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.lock = threading.Lock()
+        self.compaction: threading.Thread = None
+        self.truncate_torn_tail()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def truncate_torn_tail(self):
+        # drop a partial last line so new records do not get glued onto it
+        try:
+            f = open(self.path, "rb+")
+        except FileNotFoundError:
+            return
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                step = min(4096, end)
+                f.seek(end - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    end = end - step + newline + 1
+                    break
+                end -= step
+            if end != size:
+                f.truncate(end)
+
+    @property
+    def rotated_path(self) -> str:
+        return f"{self.path}.compacting"
+
+    def append(self, record: dict, count: int = 1):
+        # count is the number of changes in record, for compaction
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+            # flushed to the OS every time so a process crash loses nothing;
+            # fsync, which guards against power loss, is batched
+            self.file.flush()
+            self.records += count
+            self.unsynced += 1
+            if (self.unsynced >= self.sync_every
+                    or time.monotonic() - self.last_sync >= self.sync_interval):
+                self.sync_locked()
+
+    def sync(self):
+        with self.lock:
+            self.sync_locked()
+
+    def sync_locked(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def needs_compaction(self, catalogue_size: int = 0) -> bool:
+        # A compaction rewrites the whole catalogue, so it waits for at least
+        # as many changes as there are recipes; its cost per change stays
+        # constant however large the catalogue grows.
+        return self.records >= max(self.compact_after, catalogue_size) and not self.compacting()
+
+    def compacting(self) -> bool:
+        return self.compaction is not None and self.compaction.is_alive()
+
+    def compact(self, snapshot_path: str, recipes: list, background: bool = True, then=None):
+        # Moves the current journal aside and starts a fresh one, then writes
+        # recipes as the new snapshot, calls then() if given (to write what
+        # else goes with the snapshot) and drops the old journal. Until both
+        # are done, startup replays both journals, so a crash at any point
+        # loses nothing.
+        self.wait()
+        with self.lock:
+            self.sync_locked()
+            self.file.close()
+            os.replace(self.path, self.rotated_path)
+            recipejson.fsync_dir(self.path)
+            self.file = open(self.path, "a", encoding="utf-8")
+            self.records = 0
+
+        def write_snapshot():
+            recipejson.dump_recipes(snapshot_path, recipes)
+            if then is not None:
+                then()
+            os.remove(self.rotated_path)
+            recipejson.fsync_dir(self.path)
+
+        if background:
+            self.compaction = threading.Thread(target=write_snapshot, daemon=True)
+            self.compaction.start()
+        else:
+            write_snapshot()
+
+    def wait(self):
+        if self.compaction is not None:
+            self.compaction.join()
+            self.compaction = None
+
+    def close(self):
+        self.wait()
+        with self.lock:
+            self.sync_locked()
+            self.file.close()
+
+    @staticmethod
+    def read(path: str):
+        # Yields the records of a journal file. A torn final line, left by a
+        # crash in the middle of a write, is ignored: it is the only line
+        # without a newline. Any other line that is not a record means the
+        # journal is corrupt, and raises ValueError rather than dropping the
+        # changes after it.
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            # bytes, so a torn line that ends inside a UTF-8 character is
+            # still just a torn line
+            for number, line in enumerate(f, 1):
+                if not line.endswith(b"\n"):
+                    return
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Corrupt journal {path}, line {number}: {e}") from None
+                yield record
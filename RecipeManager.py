@@ -1,68 +1,1129 @@
-from Recipe import Recipe
+from Recipe import Recipe, MAX_RATING, check_rating, display_cache, valid_rating
 from Sorter import Sorter
 from IngredientFactory import IngredientFactory
+from IngredientIndex import IngredientIndex
+from SearchIndex import SearchIndex
+from RecipeJournal import RecipeJournal
+from RecipeCursor import RecipeCursor
+from SortedIndex import SortedIndex
+from CatalogueSnapshot import CatalogueSnapshot
+from LRUCache import LRUCache
+from RecipeQuery import RecipeQuery
+from QueryPlanner import QueryPlanner
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+import gc
 import json
+import os
+import threading
+import time
+import recipejson
+
+# optimistic attempts at an index query before it waits for the writer
+READ_RETRIES = 8
+QUERY_CACHE_SIZE = 1024
+# catalogue size from which recommendations use the MinHash index by default
+LSH_THRESHOLD = 1000000
+# incoming recipes checked for near-duplicates together
+DEDUP_BATCH = 1024
+DEDUP_MODES = ("flag", "merge")
+# incoming changes applied per published snapshot when syncing
+SYNC_BATCH = 1024
+
+
+@contextmanager
+def gc_paused():
+    # A batch allocates many objects that all survive it. Collections
+    # triggered meanwhile would scan the whole catalogue, again and again,
+    # without finding garbage.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 # ---------- RecipeManager Class ----------
+# Safe to share between threads. The catalogue itself is an immutable
+# CatalogueSnapshot: reads take the current one without locking, and a change
+# is built in a draft that replaces it in one step, so no reader ever sees
+# half of an edit. Writers are serialized by write_lock. The secondary
+# indexes are changed in place while seq is odd; queries on them run without
+# a lock and are retried if seq moved meanwhile.
 class RecipeManager:
     def __init__(self):
-        self.recipes: list[Recipe] = []
+        # name -> Recipe in listing (insertion) order
+        self.snapshot = CatalogueSnapshot()
+        # the next snapshot while a write is in progress
+        self.draft: CatalogueSnapshot = None
+        self.write_lock = threading.RLock()
+        self.seq = 0
+        # ids of recipes copied into the draft by the current write; readers
+        # cannot see those copies yet, so later changes reuse them in place
+        self.copied: set[int] = set()
+        # dense integer ids used by the secondary indexes
+        self.next_id = 0
+        # casefolded name -> recipes named so in any case; names are unique
+        # ignoring case, except for variants added concurrently by synced
+        # instances
+        self.folded: Counter = Counter()
+        self.ingredient_index = IngredientIndex()
+        self.search_index = SearchIndex()
+        self.sorter = Sorter()
+        self.favourite_ids = SortedIndex()
+        self.planner = QueryPlanner(self)
+        # index query results, and a change counter for each kind of change
+        # they can depend on
+        self.query_cache = LRUCache(QUERY_CACHE_SIZE)
+        self.generations = {"content": 0, "rating": 0, "favourite": 0}
+        # ingredient similarity, built on the first recommendation
+        self.recommender = None
+        # near-duplicate checks on ingest, off until enable_dedup; flagged
+        # near-duplicate name -> name of the recipe it duplicates, and merged
+        # near-duplicate name -> name of the recipe it was merged into
+        self.detector = None
+        self.dedup_mode = "flag"
+        self.duplicates: dict[str, str] = {}
+        self.merged: dict[str, str] = {}
+        # what became of the recipes of the last load_from_json or
+        # import_recipes (see _admit), for ingest_summary
+        self.ingested = Counter()
+        # Change feed for syncing instances (see changes): every name added,
+        # changed or deleted -> sequence number of its last change, and the
+        # same as (seq, name) keys in seq order. clock is the last number
+        # given out.
+        self.clock = 0
+        self.feed: dict[str, int] = {}
+        self.feed_order = SortedIndex()
+        # (content, rating, favourite) versions of recipes whose fields last
+        # changed at different versions; absent means all at recipe.version
+        self.stamps: dict[str, tuple] = {}
+        # deleted name -> version of the deletion
+        self.tombstones: dict[str, int] = {}
+        # (snapshot version, CatalogueColumns of it), built on first use
+        self.columnar: tuple = None
+        # facade over the process-wide ingredient registry
+        self.factory = IngredientFactory()
+        self.journal: RecipeJournal = None
+        self.snapshot_path: str = None
+
+    @property
+    def recipes(self) -> CatalogueSnapshot:
+        return self.snapshot
+
+    def size(self) -> int:
+        # recipes so far, counting a change still in progress, such as a load
+        draft = self.draft
+        return len(draft if draft is not None else self.snapshot)
+
+    @contextmanager
+    def writing(self):
+        # Runs one change, or several as a unit, and publishes the result as
+        # a single new snapshot. Nested calls join the outer change.
+        with self.write_lock:
+            if self.draft is not None:
+                yield
+                return
+            self.draft = self.snapshot.draft()
+            self.seq += 1
+            try:
+                yield
+            finally:
+                # published even after an error: the indexes already match it
+                self.publish()
+                self.draft = None
+                self.seq += 1
+
+    def publish(self):
+        if self.draft.changed():
+            self.snapshot = self.draft.publish()
+            self.draft = self.snapshot.draft()
+        self.copied.clear()
+
+    def read(self, query):
+        # Runs query(snapshot) against the secondary indexes without a lock.
+        # A writer changing them meanwhile shows up as a moved seq (or as an
+        # error from a half-changed index), and the query is run again.
+        for _ in range(READ_RETRIES):
+            seq = self.seq
+            if seq % 2 == 0:
+                snapshot = self.snapshot
+                try:
+                    result = query(snapshot)
+                except Exception:
+                    if self.seq == seq:
+                        raise
+                    continue
+                if self.seq == seq:
+                    return result
+            time.sleep(0)
+        # a steady stream of writes: wait for the writer instead
+        with self.write_lock:
+            return query(self.snapshot)
 
-    def add_recipe(self, recipe: Recipe):
-        self.recipes.append(recipe)
+    def add_recipe(self, recipe: Recipe) -> str:
+        # returns the name of the recipe it was merged into, if dedup merged
+        # it, or None once it is added
+        with self.writing():
+            if self.name_taken(recipe.name):
+                raise ValueError(f"Recipe '{recipe.name}' already exists")
+            check_rating(recipe.rating)
+            if self._admit([recipe], log=True)["merged"]:
+                return self.merged[recipe.name]
+        return None
 
     def delete_recipe(self, name: str):
-        self.recipes = [r for r in self.recipes if r.name != name]
+        with self.writing():
+            if self._remove(name) is not None:
+                self.log({"op": "delete", "name": name})
 
     def edit_recipe(self, name: str, updated_recipe: Recipe):
-        self.delete_recipe(name)
-        self.recipes.append(updated_recipe)
+        with self.writing():
+            if name not in self.draft:
+                raise ValueError("Recipe not found")
+            if self.name_taken(updated_recipe.name, name):
+                raise ValueError(f"Recipe '{updated_recipe.name}' already exists")
+            check_rating(updated_recipe.rating)
+            # the edited recipe moves to the end of the listing, as before
+            self._remove(name)
+            self._insert(updated_recipe)
+            self.log({"op": "edit", "name": name, "recipe": updated_recipe.to_dict()})
+
+    def name_taken(self, name: str, ignore: str = None) -> bool:
+        # whether a recipe other than ignore has name, ignoring case
+        key = name.casefold()
+        count = self.folded[key]
+        catalogue = self.draft if self.draft is not None else self.snapshot
+        if ignore is not None and ignore.casefold() == key and ignore in catalogue:
+            count -= 1
+        return count > 0
+
+    def _admit(self, recipes: list[Recipe], log: bool) -> Counter:
+        # Inserts incoming recipes, skipping names already taken, and counts
+        # what became of them: "added" (flagged ones included), "skipped",
+        # "flagged" and "merged". With dedup on, each is checked against the
+        # catalogue and the recipes before it, all in one lookup.
+        detector = self.detector
+        if detector is not None:
+            signatures = detector.signatures(recipes)
+            found, scores = detector.matches(signatures)
+            # earlier recipes of the batch each one duplicates
+            earlier: dict[int, list] = {}
+            for i, j, score in zip(*(a.tolist() for a in detector.pairs(signatures))):
+                earlier.setdefault(i, []).append((j, score))
+        # position -> recipe id it was inserted as or merged into
+        placed: dict[int, int] = {}
+        outcomes = Counter()
+        for i, recipe in enumerate(recipes):
+            if self.name_taken(recipe.name):
+                outcomes["skipped"] += 1
+                continue
+            if detector is None:
+                self._insert(recipe)
+            else:
+                target, score = int(found[i]), scores[i]
+                for j, similarity in earlier.get(i, ()):
+                    if j in placed and similarity > score:
+                        target, score = placed[j], similarity
+                if target >= 0 and self.dedup_mode == "merge":
+                    self._merge(target, recipe, log)
+                    placed[i] = target
+                    outcomes["merged"] += 1
+                    continue
+                if target >= 0:
+                    self.duplicates[recipe.name] = self.draft.recipe_at(target).name
+                    outcomes["flagged"] += 1
+                placed[i] = self._insert(recipe, signatures[i])
+            outcomes["added"] += 1
+            if log:
+                self.log({"op": "add", "recipe": recipe.to_dict()})
+        return outcomes
+
+    def _merge(self, rid: int, duplicate: Recipe, log: bool):
+        # folds a near-duplicate into the recipe it duplicates instead of
+        # adding it: the better rating and a favourite flag carry over
+        kept = self.draft.recipe_at(rid)
+        self.merged[duplicate.name] = kept.name
+        if duplicate.rating > kept.rating:
+            self._rerate(kept.name, duplicate.rating)
+            if log:
+                self.log({"op": "rate", "name": kept.name, "rating": duplicate.rating})
+        if duplicate.is_favourite and not kept.is_favourite:
+            self._toggle(kept.name)
+            if log:
+                self.log({"op": "favourite", "name": kept.name, "is_favourite": True})
+
+    def _insert(self, recipe: Recipe, signature=None) -> int:
+        # signature: the recipe's DuplicateDetector signature, if known
+        rid = self.next_id
+        self.next_id += 1
+        # a name added again after a delete outranks the deletion
+        deleted = self.tombstones.pop(recipe.name, 0)
+        if recipe.version <= deleted:
+            recipe.version = deleted + 1
+        self.stamps.pop(recipe.name, None)
+        self._touch(recipe.name, recipe)
+        self.folded[recipe.name.casefold()] += 1
+        self.draft.insert(rid, recipe)
+        self.generations["content"] += 1
+        self.ingredient_index.add(rid, recipe)
+        self.search_index.add(rid, recipe)
+        self.sorter.add(rid, recipe)
+        if recipe.is_favourite:
+            self.favourite_ids.add(rid)
+        if self.recommender is not None:
+            self.recommender.add(rid, recipe)
+        if self.detector is not None:
+            self.detector.add(rid, recipe, signature)
+        return rid
+
+    def _private(self, rid: int) -> Recipe:
+        # recipes in a snapshot are shared with readers, so a change is made
+        # to a copy, once per write
+        recipe = self.draft.recipe_at(rid)
+        if rid not in self.copied:
+            recipe = recipe.copy()
+            self.draft.replace(rid, recipe)
+            self.copied.add(rid)
+        return recipe
+
+    def _touch(self, name: str, recipe: Recipe = None):
+        # moves name to the end of the change feed
+        self.clock += 1
+        self._place(name, self.clock)
+        if recipe is not None:
+            recipe.modified = self.clock
+
+    def _place(self, name: str, seq: int):
+        old = self.feed.get(name)
+        if old is not None:
+            self.feed_order.remove((old, name))
+        self.feed[name] = seq
+        self.feed_order.add((seq, name))
+
+    def _versions(self, recipe: Recipe) -> tuple:
+        return self.stamps.get(recipe.name) or (recipe.version,) * 3
+
+    def _stamp(self, recipe: Recipe, field: int):
+        # a local change to field 1 (rating) or 2 (favourite) of a private
+        # copy
+        versions = list(self._versions(recipe))
+        recipe.version += 1
+        versions[field] = recipe.version
+        self.stamps[recipe.name] = tuple(versions)
+        self._touch(recipe.name, recipe)
+
+    def _rerate(self, name: str, rating: float) -> Recipe:
+        rid = self.draft.rid_of(name)
+        recipe = self._private(rid)
+        self._stamp(recipe, 1)
+        self.sorter.rerate(rid, recipe.rating, rating)
+        if self.recommender is not None:
+            self.recommender.rerate(rid, rating)
+        recipe.update_rating(rating)
+        self.generations["rating"] += 1
+        return recipe
+
+    def _rerate_later(self, rid: int, rating: float, rerated: dict[int, list]):
+        # like _rerate, but the rating order is left to _rerate_now;
+        # rerated maps recipe id -> [rating in the order, new rating]
+        recipe = self._private(rid)
+        self._stamp(recipe, 1)
+        change = rerated.get(rid)
+        if change is None:
+            rerated[rid] = [recipe.rating, rating]
+        else:
+            change[1] = rating
+        recipe.update_rating(rating)
+        self.generations["rating"] += 1
+
+    def _rerate_now(self, rerated: dict[int, list]):
+        if rerated:
+            self.sorter.rerate_many([(rid, old, new) for rid, (old, new) in rerated.items()])
+            if self.recommender is not None:
+                for rid, (_, new) in rerated.items():
+                    self.recommender.rerate(rid, new)
+            rerated.clear()
+
+    def _toggle(self, name: str) -> Recipe:
+        rid = self.draft.rid_of(name)
+        recipe = self._private(rid)
+        self._stamp(recipe, 2)
+        if recipe.is_favourite:
+            self.favourite_ids.remove(rid)
+        else:
+            self.favourite_ids.add(rid)
+        recipe.toggle_favourite()
+        self.generations["favourite"] += 1
+        return recipe
+
+    def _remove(self, name: str) -> Recipe:
+        if name not in self.draft:
+            return None
+        rid, recipe = self.draft.remove(name)
+        self.copied.discard(rid)
+        key = name.casefold()
+        self.folded[key] -= 1
+        if not self.folded[key]:
+            del self.folded[key]
+        self.tombstones[name] = recipe.version + 1
+        self.stamps.pop(name, None)
+        self._touch(name)
+        self.generations["content"] += 1
+        recipe.invalidate()
+        self.ingredient_index.remove(rid, recipe)
+        self.search_index.remove(rid)
+        self.sorter.remove(rid, recipe)
+        if recipe.is_favourite:
+            self.favourite_ids.remove(rid)
+        if self.recommender is not None:
+            self.recommender.remove(rid)
+        if self.detector is not None:
+            self.detector.remove(rid)
+        return recipe
 
     def get_recipe(self, name: str) -> Recipe:
-        for r in self.recipes:
-            if r.name == name:
-                return r
-        raise ValueError("Recipe not found")
+        recipe = self.snapshot.get(name)
+        if recipe is None:
+            raise ValueError("Recipe not found")
+        return recipe
 
     def sort_recipes(self) -> Sorter:
-        return Sorter()
+        return self.sorter
+
+    def sort_name(self, start: int = 0, count: int = None) -> list[Recipe]:
+        return self.cached(("name", start, count), ("content",), lambda s: self.sorter.name_order(start, count))
+
+    def sort_rating(self, start: int = 0, count: int = None) -> list[Recipe]:
+        return self.cached(("rating", start, count), ("content", "rating"),
+                           lambda s: self.sorter.rating_order(start, count))
+
+    def top_rated(self, k: int = 20) -> list[Recipe]:
+        return self.sort_rating(0, k)
 
     def favourite_recipe(self, name: str):
-        r = self.get_recipe(name)
-        r.toggle_favourite()
+        with self.writing():
+            if name not in self.draft:
+                raise ValueError("Recipe not found")
+            recipe = self._toggle(name)
+            self.log({"op": "favourite", "name": name, "is_favourite": recipe.is_favourite})
 
     def rate_recipe(self, name: str, rating: float):
-        r = self.get_recipe(name)
-        r.update_rating(rating)
+        with self.writing():
+            if name not in self.draft:
+                raise ValueError("Recipe not found")
+            check_rating(rating)
+            self._rerate(name, rating)
+            self.log({"op": "rate", "name": name, "rating": rating})
+
+    def apply_batch(self, operations: list[dict]) -> int:
+        # Applies a list of changes as one unit and returns how many were
+        # applied. Each is a dict shaped like a journal record:
+        #   {"op": "add", "recipe": Recipe or dict}
+        #   {"op": "edit", "name": ..., "recipe": Recipe or dict}
+        #   {"op": "delete", "name": ...}
+        #   {"op": "rate", "name": ..., "rating": number}
+        #   {"op": "favourite", "name": ..., "is_favourite": bool (omit to toggle)}
+        # Every change is checked against the catalogue as the ones before it
+        # leave it before anything is applied, so a bad one raises ValueError
+        # and nothing changes. The batch is published as one snapshot and
+        # journalled as one record.
+        with self.writing(), gc_paused():
+            records = self.validate_batch(operations)
+            # rating changes reach the rating order together, before anything
+            # else reads it
+            rerated: dict[int, list] = {}
+            for record in records:
+                op = record["op"]
+                if op == "rate":
+                    self._rerate_later(self.draft.rid_of(record["name"]), record["rating"], rerated)
+                    continue
+                self._rerate_now(rerated)
+                if op == "add":
+                    self._insert(record["recipe"])
+                elif op == "edit":
+                    self._remove(record["name"])
+                    self._insert(record["recipe"])
+                elif op == "delete":
+                    self._remove(record["name"])
+                elif self.draft[record["name"]].is_favourite != record["is_favourite"]:
+                    self._toggle(record["name"])
+            self._rerate_now(rerated)
+            if records:
+                self.log({"op": "batch", "ops": [dict(r, recipe=r["recipe"].to_dict()) if "recipe" in r else r
+                                                 for r in records]}, len(records))
+        return len(records)
+
+    def validate_batch(self, operations: list[dict]) -> list[dict]:
+        # the operations as journal records holding Recipe objects, with
+        # toggles resolved; raises ValueError naming the first bad one
+        records = []
+        # names the batch has added (recipe) or deleted (None) so far, and
+        # favourite flags it has set
+        changed: dict[str, Recipe] = {}
+        flags: dict[str, bool] = {}
+        # casefolded name -> recipes the batch has added less those it has
+        # deleted
+        folded = Counter()
+
+        def exists(name) -> bool:
+            return changed[name] is not None if name in changed else name in self.draft
+
+        def taken(name, ignore) -> bool:
+            key = name.casefold()
+            count = self.folded[key] + folded[key]
+            if ignore is not None and ignore.casefold() == key:
+                count -= 1
+            return count > 0
+
+        for i, operation in enumerate(operations):
+            try:
+                if not isinstance(operation, dict):
+                    raise ValueError("must be an object")
+                op = operation.get("op")
+                name = operation.get("name") if op != "add" else None
+                if op in ("edit", "delete", "rate", "favourite") and not exists(name):
+                    raise ValueError(f"Recipe not found: {name}")
+                if op in ("add", "edit"):
+                    recipe = operation.get("recipe")
+                    if not isinstance(recipe, Recipe):
+                        recipe = recipejson.recipe_from_dict(recipe, self.factory)
+                    if taken(recipe.name, name):
+                        raise ValueError(f"Recipe '{recipe.name}' already exists")
+                    check_rating(recipe.rating)
+                    if name is not None:
+                        changed[name] = None
+                        folded[name.casefold()] -= 1
+                    changed[recipe.name] = recipe
+                    folded[recipe.name.casefold()] += 1
+                    flags[recipe.name] = recipe.is_favourite
+                    record = {"op": op, "recipe": recipe}
+                    if op == "edit":
+                        record["name"] = name
+                elif op == "delete":
+                    changed[name] = None
+                    folded[name.casefold()] -= 1
+                    record = {"op": op, "name": name}
+                elif op == "rate":
+                    rating = operation.get("rating")
+                    check_rating(rating)
+                    record = {"op": op, "name": name, "rating": rating}
+                elif op == "favourite":
+                    current = flags[name] if name in flags else self.draft[name].is_favourite
+                    wanted = operation.get("is_favourite", not current)
+                    if not isinstance(wanted, bool):
+                        raise ValueError("'is_favourite' must be true or false")
+                    flags[name] = wanted
+                    record = {"op": op, "name": name, "is_favourite": wanted}
+                else:
+                    raise ValueError(f"Unknown operation: {op}")
+            except ValueError as e:
+                raise ValueError(f"Operation {i}: {e}") from None
+            records.append(record)
+        return records
+
+    def add_many(self, recipes: list[Recipe]) -> int:
+        # all or nothing, unlike import_recipes, which skips duplicates
+        return self.apply_batch([{"op": "add", "recipe": r} for r in recipes])
+
+    def rate_many(self, ratings) -> int:
+        # Like apply_batch with only "rate" operations, but without building
+        # an operation per rating. ratings: name -> rating, or (name, rating)
+        # pairs.
+        pairs = list(ratings.items() if isinstance(ratings, dict) else ratings)
+        with self.writing(), gc_paused():
+            rids = [self.draft.rid_of(name) for name, _ in pairs]
+            for i, ((name, rating), rid) in enumerate(zip(pairs, rids)):
+                if rid < 0:
+                    raise ValueError(f"Operation {i}: Recipe not found: {name}")
+                if not valid_rating(rating):
+                    raise ValueError(f"Operation {i}: 'rating' must be a number from 0 to {MAX_RATING:g}")
+            rerated: dict[int, list] = {}
+            for (_, rating), rid in zip(pairs, rids):
+                self._rerate_later(rid, rating, rerated)
+            self._rerate_now(rerated)
+            if pairs and self.journal is not None:
+                self.log({"op": "batch", "ops": [{"op": "rate", "name": n, "rating": r} for n, r in pairs]},
+                         len(pairs))
+        return len(pairs)
+
+    def delete_many(self, names: list[str]) -> int:
+        return self.apply_batch([{"op": "delete", "name": n} for n in names])
 
     def list_favourites(self) -> list[Recipe]:
-        return [r for r in self.recipes if r.is_favourite]
+        return self.cached(("favourites",), ("content", "favourite"), lambda s: list(self.favourite_ids))
+
+    def search(self, keyword: str, limit: int = 50) -> list[Recipe]:
+        # ranked full-text search over names, ingredients and steps
+        return self.cached(("search", keyword, limit), ("content",),
+                           lambda s: [rid for rid, _ in self.search_index.search(keyword, limit)])
+
+    def find_by_ingredients(self, include_all: list[str] = (), include_any: list[str] = (),
+                            exclude: list[str] = ()) -> list[Recipe]:
+        if not (include_all or include_any or exclude):
+            return self.list_all()
+        index = self.ingredient_index
+
+        def query(snapshot: CatalogueSnapshot) -> list[int]:
+            candidates = None
+            if include_all:
+                candidates = index.contains_all(include_all)
+            if include_any:
+                any_ids = index.contains_any(include_any)
+                candidates = any_ids if candidates is None else candidates & any_ids
+            if exclude:
+                candidates = index.excludes(exclude, candidates)
+            return sorted(candidates)
+        key = ("ingredients", frozenset(include_all), frozenset(include_any), frozenset(exclude))
+        return self.cached(key, ("content",), query)
+
+    def query(self, query: RecipeQuery) -> list[Recipe]:
+        # recipes matching every predicate of query, in its order, planned
+        # over the indexes (see QueryPlanner). A cached result goes stale on
+        # rating and favourite changes only if query looks at that field,
+        # and on tag changes (IngredientFactory.set_tags) only if it has tags.
+        depends = ("content",)
+        if query.min_rating is not None or query.max_rating is not None or query.order == "rating":
+            depends += ("rating",)
+        if query.favourite is not None:
+            depends += ("favourite",)
+        tags = IngredientFactory.tag_changes if query.tags else 0
+        return self.cached(("query", query.key(), tags), depends,
+                           lambda s: self.planner.plan(query, s).execute(s))
+
+    def explain(self, query: RecipeQuery) -> str:
+        # the plan chosen for query and the others weighed, with what running
+        # it actually took; bypasses the query cache
+        def run(snapshot: CatalogueSnapshot) -> str:
+            plan = self.planner.plan(query, snapshot)
+            plan.execute(snapshot)
+            return plan.explain()
+        return self.read(run)
 
-    def search(self, keyword: str) -> list[Recipe]:
-        return [r for r in self.recipes if keyword.lower() in r.name.lower()]
+    def cook_with(self, pantry: list[str], missing: int = 0) -> list[tuple[Recipe, int]]:
+        # (recipe, missing ingredient count), closest matches first
+        def query(snapshot: CatalogueSnapshot) -> list[tuple[int, int]]:
+            matches = self.ingredient_index.can_make(pantry, missing)
+            return sorted(matches.items(), key=lambda m: (m[1], m[0]))
+
+        def resolve(snapshot: CatalogueSnapshot, match: tuple[int, int]) -> tuple[Recipe, int]:
+            return snapshot.recipe_at(match[0]), match[1]
+        return self.cached(("cook", frozenset(pantry), missing), ("content",), query, resolve)
+
+    def recommend(self, name: str = None, pantry: list[str] = None, k: int = 10, metric: str = "jaccard",
+                  rating_weight: float = 0.5, approximate: bool = None) -> list[tuple[Recipe, float]]:
+        # (recipe, score) for the k recipes whose ingredients are most like
+        # those of the named recipe, of a pantry or, given neither, of the
+        # favourites; best first. Scores are Jaccard or cosine similarity
+        # weighted by rating (see Recommender.recommend). approximate uses
+        # the MinHash index, by default from LSH_THRESHOLD recipes on.
+        if name is not None and pantry is not None:
+            raise ValueError("Recommend for a recipe or a pantry, not both")
+        if approximate is None:
+            approximate = len(self.snapshot) >= LSH_THRESHOLD
+        recommender = self.recommender_index(approximate)
+
+        def query(snapshot: CatalogueSnapshot) -> list[tuple[int, float]]:
+            exclude = probes = ()
+            if name is not None:
+                rid = snapshot.rid_of(name)
+                if rid < 0:
+                    raise ValueError("Recipe not found")
+                weights = dict.fromkeys(snapshot.recipe_at(rid).ingredient_ids, 1.0)
+                exclude = (rid,)
+            elif pantry is not None:
+                weights = dict.fromkeys({IngredientFactory.lookup_id(n) for n in pantry} - {-1}, 1.0)
+            else:
+                # each ingredient weighs the share of favourites using it
+                exclude = probes = list(self.favourite_ids)
+                counts = Counter(i for rid in exclude for i in set(snapshot.recipe_at(rid).ingredient_ids))
+                weights = {i: n / len(exclude) for i, n in counts.items()}
+            return recommender.recommend(weights, k, metric, rating_weight, exclude, approximate, probes,
+                                         lambda rid: snapshot.recipe_at(rid).ingredient_ids)
+
+        def resolve(snapshot: CatalogueSnapshot, match: tuple[int, float]) -> tuple[Recipe, float]:
+            return snapshot.recipe_at(match[0]), match[1]
+        depends = ("content", "rating") if name is not None or pantry is not None else \
+            ("content", "rating", "favourite")
+        key = ("recommend", name, None if pantry is None else frozenset(pantry), k, metric, rating_weight,
+               approximate)
+        return self.cached(key, depends, query, resolve)
+
+    def recommender_index(self, minhash: bool = False):
+        # The Recommender, built from the catalogue on first use and kept up
+        # to date from then on, with its MinHash index if asked for. NumPy is
+        # only imported here, so nothing else depends on it.
+        if self.recommender is None or (minhash and self.recommender.minhash is None):
+            from Recommender import Recommender
+            with self.write_lock:
+                catalogue = self.draft if self.draft is not None else self.snapshot
+                recommender = self.recommender
+                if recommender is None:
+                    recommender = Recommender()
+                    recommender.add_many(catalogue.entries())
+                if minhash and recommender.minhash is None:
+                    recommender.build_minhash(catalogue.entries())
+                self.recommender = recommender
+        return self.recommender
+
+    def enable_dedup(self, threshold: float = None, mode: str = "flag"):
+        # Checks recipes coming in through add_recipe, load_from_json and
+        # import_recipes for near-duplicates of the catalogue (see
+        # DuplicateDetector). "flag" keeps them, listed in self.duplicates;
+        # "merge" drops them, carrying a better rating or a favourite flag
+        # over to the recipe they duplicate. NumPy is only imported here.
+        from DuplicateDetector import DuplicateDetector, DEFAULT_THRESHOLD
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        with self.write_lock:
+            detector = DuplicateDetector(DEFAULT_THRESHOLD if threshold is None else threshold)
+            catalogue = self.draft if self.draft is not None else self.snapshot
+            for rid, recipe in catalogue.entries():
+                detector.add(rid, recipe)
+            detector.flush()
+            self.detector = detector
+            self.dedup_mode = mode
+
+    def disable_dedup(self):
+        with self.write_lock:
+            self.detector = None
+
+    def find_duplicates(self, threshold: float = None) -> list[list[Recipe]]:
+        # clusters of near-duplicate recipes in the catalogue, each in
+        # listing order
+        from DuplicateDetector import DuplicateDetector, DEFAULT_THRESHOLD
+        detector = DuplicateDetector(DEFAULT_THRESHOLD if threshold is None else threshold)
+        recipes = self.list_all()
+        clusters = detector.clusters(detector.signatures(recipes))
+        return [[recipes[i] for i in cluster] for cluster in clusters]
+
+    def columns(self):
+        # The published catalogue as NumPy columns for reports (see
+        # CatalogueColumns), built once per snapshot. NumPy is only imported
+        # here.
+        from CatalogueColumns import CatalogueColumns
+        snapshot = self.snapshot
+        columnar = self.columnar
+        if columnar is None or columnar[0] != snapshot.version:
+            columnar = self.columnar = (snapshot.version, CatalogueColumns.from_recipes(snapshot.values()))
+        return columnar[1]
+
+    def cached(self, key: tuple, depends: tuple, query, resolve=None) -> list:
+        # Runs an index query through the query cache. query(snapshot) returns
+        # recipe ids, which are cached and resolved against the snapshot on
+        # every call, so a result only goes stale when something it depends
+        # on changes: "content" (adds, edits, deletes), "rating" or
+        # "favourite". The generation of each is part of the key.
+        resolve = resolve or CatalogueSnapshot.recipe_at
+
+        def run(snapshot: CatalogueSnapshot) -> tuple:
+            full_key = key + tuple(self.generations[d] for d in depends)
+            ids = self.query_cache.get(full_key)
+            found = ids is not None
+            if not found:
+                ids = tuple(query(snapshot))
+            return full_key, ids, found, [resolve(snapshot, i) for i in ids]
+        full_key, ids, found, result = self.read(run)
+        # only results read() has checked against concurrent writes are kept
+        if not found:
+            self.query_cache.put(full_key, ids)
+        return result
+
+    def cache_stats(self) -> dict:
+        return {"display": display_cache.stats(), "queries": self.query_cache.stats()}
 
     def list_all(self) -> list[Recipe]:
-        return self.recipes
+        return list(self.snapshot.values())
 
-    def load_from_json(self, path: str):
-        try:
-            with open(path, 'r') as f:
-                data = json.load(f)
-            factory = IngredientFactory()
-            for entry in data:
-                ingredients = [factory.get_ingredient(i) for i in entry["ingredients"]]
-                recipe = Recipe(
-                    name=entry["name"],
-                    ingredients=ingredients,
-                    steps=entry["steps"],
-                    rating=entry["rating"],
-                    is_favourite=entry["is_favourite"]
-                )
-        except Exception as e:
-            print(f"Error loading recipes from JSON: {e}")
+    def cursor(self, order: str = "all") -> RecipeCursor:
+        # paged access to a listing: "all" (insertion order), "name",
+        # "rating" or "favourites". "all" pages through the snapshot current
+        # when the cursor was made; the others read the live orderings.
+        if order == "all":
+            snapshot = self.snapshot
+            return RecipeCursor(snapshot.slice, len(snapshot))
+        if order == "name":
+            return RecipeCursor(self.sort_name, len(self.snapshot))
+        if order == "rating":
+            return RecipeCursor(self.sort_rating, len(self.snapshot))
+        if order == "favourites":
+            def fetch(start: int, count: int) -> list[Recipe]:
+                return self.cached(("favourites", start, count), ("content", "favourite"),
+                                   lambda s: self.favourite_ids.slice(start, start + count))
+            return RecipeCursor(fetch, len(self.favourite_ids))
+        raise ValueError(f"Unknown order: {order}")
+
+    def load_from_json(self, path: str) -> list:
+        # Streams recipes from path one record at a time. Bad records are
+        # reported and skipped; the rest of the file still loads. The whole
+        # file is published as one snapshot.
+        errors = []
+        with self.writing():
+            self.ingested = Counter()
+            try:
+                # first occurrence of a name wins, matching get_recipe's old
+                # first-match behaviour
+                recipes = recipejson.iter_recipes(path, self.factory, errors)
+                while batch := list(islice(recipes, DEDUP_BATCH)):
+                    self.ingested += self._admit(batch, log=True)
+            except OSError as e:
+                print(f"Error loading recipes from JSON: {e}")
+        for error in errors:
+            print(f"Skipping malformed {error}")
+        return errors
+
+    def import_recipes(self, recipes) -> int:
+        # Bulk insert for batch imports. Names already in the catalogue are
+        # skipped. Nothing is journalled per recipe; an open journal is
+        # compacted instead, so the snapshot holds the imported recipes.
+        with self.writing():
+            self.ingested = Counter()
+            recipes = iter(recipes)
+            while batch := list(islice(recipes, DEDUP_BATCH)):
+                self.ingested += self._admit(batch, log=False)
+            # merges change recipes already there
+            if (self.ingested["added"] or self.ingested["merged"]) and self.journal is not None:
+                self.compact(background=False)
+        return self.ingested["added"]
+
+    def ingest_summary(self) -> str:
+        # one line on the last load_from_json or import_recipes, or None if
+        # every recipe went in as it was
+        return recipejson.ingest_summary(self.ingested)
 
     def save_to_json(self, path: str):
         try:
-            with open(path, 'w') as f:
-                json.dump([r.to_dict() for r in self.recipes], f, indent=4)
+            recipejson.dump_recipes(path, self.snapshot.values())
         except Exception as e:
             print(f"Failed to save recipes: {e}")
+
+    def open_journal(self, snapshot_path: str, journal_path: str = None):
+        # Loads the snapshot, replays any journal left by earlier runs on top
+        # of it and then records every change to the journal as it happens.
+        journal_path = journal_path or f"{snapshot_path}.journal"
+        self.snapshot_path = snapshot_path
+        with self.writing():
+            if os.path.exists(snapshot_path):
+                self.load_from_json(snapshot_path)
+            # versions and change numbers as of the snapshot, then as of each
+            # record (see log), so peers' since still holds
+            clock = self._restore_sync(f"{snapshot_path}.sync")
+            rotated = f"{journal_path}.compacting"
+            # changes replayed from the journal, which count towards its
+            # next compaction as if written in this session
+            replayed = 0
+            for path in (rotated, journal_path):
+                for record in RecipeJournal.read(path):
+                    self.apply_record(record)
+                    clock = max(clock, record.get("seq", 0))
+                    if path == journal_path:
+                        replayed += len(record["ops"]) if record.get("op") == "batch" else 1
+            if clock:
+                self.clock = max(clock, max(self.feed.values(), default=0))
+        if os.path.exists(rotated):
+            # a compaction was interrupted; finish it before the rotated
+            # journal can be overwritten by the next one
+            recipejson.dump_recipes(snapshot_path, self.snapshot.values())
+            self._sync_saver()()
+            os.remove(rotated)
+            open(journal_path, "w").close()
+            replayed = 0
+        self.journal = RecipeJournal(journal_path, records=replayed)
+        if self.journal.needs_compaction(self.size()):
+            self.compact()
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def close(self):
+        self.close_journal()
+
+    def compact(self, background: bool = True):
+        # Folds the journal into a fresh snapshot. A change in progress is
+        # published first, so the snapshot written holds every journalled
+        # record; published snapshots never change, so it can be written in
+        # the background.
+        with self.write_lock:
+            if self.draft is not None:
+                self.publish()
+            self.journal.compact(self.snapshot_path, self.snapshot.values(), background, self._sync_saver())
+
+    def _sync_saver(self):
+        # A function writing the sync state beside the snapshot, for after
+        # the snapshot is written: the clock, and every name in the change
+        # feed -> [seq, content, rating, favourite versions], or [seq,
+        # deletion version] if deleted. Only the dicts are copied here, under
+        # the write lock.
+        snapshot, clock, path = self.snapshot, self.clock, f"{self.snapshot_path}.sync"
+        feed, stamps, tombstones = dict(self.feed), dict(self.stamps), dict(self.tombstones)
+
+        def save():
+            entries = {}
+            for name, seq in feed.items():
+                recipe = snapshot.get(name)
+                if recipe is None:
+                    entries[name] = [seq, tombstones[name]]
+                else:
+                    entries[name] = [seq, *(stamps.get(name) or (recipe.version,) * 3)]
+            recipejson.dump_json(path, {"clock": clock, "feed": entries})
+        return save
+
+    def _restore_sync(self, path: str) -> int:
+        # applies what _sync_saver wrote, if anything, and returns its clock
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        for name, entry in state["feed"].items():
+            if self._resync(name, entry):
+                self.feed[name] = entry[0]
+        self.feed_order = SortedIndex()
+        self.feed_order.update([], sorted((seq, name) for name, seq in self.feed.items()))
+        return state["clock"]
+
+    def _sync_entry(self, name: str, catalogue: CatalogueSnapshot) -> list:
+        recipe = catalogue.get(name)
+        if recipe is None:
+            return [self.feed.get(name, 0), self.tombstones.get(name, 0)]
+        versions = self.stamps.get(name)
+        if versions is None:
+            return [self.feed[name], recipe.version, recipe.version, recipe.version]
+        return [self.feed[name], *versions]
+
+    def _resync(self, name: str, entry: list) -> bool:
+        # Gives name the versions, or the deletion version, of a _sync_entry.
+        # False if name is not in that state here, which happens when a later
+        # change of the same batch changed it again.
+        seq, *versions = entry
+        recipe = self.draft.get(name)
+        if (recipe is None) != (len(versions) == 1):
+            return False
+        if recipe is None:
+            self.tombstones[name] = versions[0]
+        elif tuple(versions) != self._versions(recipe):
+            self._set_versions(self._private(self.draft.rid_of(name)), tuple(versions))
+        return True
+
+    def log(self, record: dict, count: int = 1):
+        # count is the number of changes the record holds. Each change is
+        # stamped with what it left its recipes at (see _sync_entry) and the
+        # record with the clock, for open_journal to restore.
+        if self.journal is None:
+            return
+        catalogue = self.draft if self.draft is not None else self.snapshot
+        for op in record["ops"] if record["op"] == "batch" else (record,):
+            name = op.get("name")
+            stamps = op["sync"] = {} if name is None else {name: self._sync_entry(name, catalogue)}
+            if "recipe" in op and op["recipe"]["name"] != name:
+                stamps[op["recipe"]["name"]] = self._sync_entry(op["recipe"]["name"], catalogue)
+        record["seq"] = self.clock
+        self.journal.append(record, count)
+        if self.journal.needs_compaction(self.size()):
+            self.compact()
+
+    def apply_record(self, record: dict):
+        # Applies one journal record. Records carry absolute values, so
+        # applying one that is already reflected in the catalogue is a no-op.
+        op = record.get("op")
+        with self.writing():
+            if op in ("add", "edit"):
+                recipe = recipejson.recipe_from_dict(record["recipe"], self.factory)
+                if op == "edit":
+                    self._remove(record["name"])
+                self._remove(recipe.name)
+                self._insert(recipe)
+            elif op == "delete":
+                self._remove(record["name"])
+            elif op == "rate":
+                if record["name"] in self.draft:
+                    self._rerate(record["name"], record["rating"])
+            elif op == "favourite":
+                recipe = self.draft.get(record["name"])
+                if recipe is not None and recipe.is_favourite != record["is_favourite"]:
+                    self._toggle(record["name"])
+            elif op == "batch":
+                for change in record["ops"]:
+                    self.apply_record(change)
+            else:
+                raise ValueError(f"Unknown journal record: {op}")
+            for name, entry in record.get("sync", {}).items():
+                if self._resync(name, entry):
+                    self._place(name, entry[0])
+
+    # ---------- sync ----------
+
+    def changes(self, since: int = 0, limit: int = None) -> list[dict]:
+        # Everything added, changed or deleted after change number since,
+        # oldest first and at most limit of them, as records for another
+        # instance's apply_changes: each recipe's current state and field
+        # versions, or its deletion. The feed is bisected for since and read
+        # forward, so a page costs the records it returns, however long the
+        # feed behind it is. Resume from the last record's seq. A catalogue
+        # reopened with open_journal keeps its versions and seqs.
+        with self.write_lock:
+            catalogue = self.draft if self.draft is not None else self.snapshot
+            start = self.feed_order.rank((since + 1,))
+            records = []
+            for seq, name in self.feed_order.scan(start, None if limit is None else start + limit):
+                recipe = catalogue.get(name)
+                if recipe is None:
+                    records.append({"seq": seq, "name": name, "version": self.tombstones[name], "deleted": True})
+                else:
+                    records.append({"seq": seq, "name": name, "version": recipe.version,
+                                    "versions": list(self._versions(recipe)), "recipe": recipe.to_dict()})
+        return records
+
+    def apply_changes(self, records) -> int:
+        # Merges records from another instance's changes() and returns how
+        # many changed this catalogue. Each field keeps the side with the
+        # higher version; concurrent changes at equal versions keep the
+        # higher rating, the favourite flag over none, and the content that
+        # compares greater. A deletion beats a recipe of its version or
+        # lower. The outcome does not depend on the order records arrive in,
+        # so instances exchanging changes in any order end up the same.
+        # SYNC_BATCH records are checked, applied and journalled as one
+        # batch; a bad record raises ValueError and its batch is not
+        # applied. Applied changes join this instance's own feed.
+        records = iter(records)
+        count = 0
+        done = 0
+        while batch := list(islice(records, SYNC_BATCH)):
+            changes = []
+            for i, record in enumerate(batch):
+                try:
+                    changes.append(self._parse_change(record))
+                except ValueError as e:
+                    raise ValueError(f"Change {done + i}: {e}") from None
+            done += len(batch)
+            with self.writing(), gc_paused():
+                ops = []
+                rerated: dict[int, list] = {}
+                for change in changes:
+                    applied = self._apply_change(*change, rerated)
+                    ops += applied
+                    count += bool(applied)
+                self._rerate_now(rerated)
+                if ops:
+                    self.log({"op": "batch", "ops": ops}, len(ops))
+        return count
+
+    def _parse_change(self, record) -> tuple:
+        # (name, version, field versions, Recipe), the last two None for a
+        # deletion
+        if not isinstance(record, dict):
+            raise ValueError("must be an object")
+        name, version = record.get("name"), record.get("version")
+        if not isinstance(name, str) or not name:
+            raise ValueError("missing or invalid 'name'")
+        if isinstance(version, bool) or not isinstance(version, int) or version < 1:
+            raise ValueError("'version' must be a positive integer")
+        if record.get("deleted"):
+            return name, version, None, None
+        recipe = recipejson.recipe_from_dict(record.get("recipe"), self.factory)
+        if recipe.name != name:
+            raise ValueError(f"'recipe' is not named {name}")
+        versions = record.get("versions", [version] * 3)
+        if (not isinstance(versions, list) or len(versions) != 3
+                or any(isinstance(v, bool) or not isinstance(v, int) for v in versions) or max(versions) != version):
+            raise ValueError("'versions' must be three integers, the largest equal to 'version'")
+        return name, version, tuple(versions), recipe
+
+    def _apply_change(self, name: str, version: int, versions: tuple, recipe: Recipe, rerated: dict) -> list:
+        # merges one incoming change and returns it as journal records, or []
+        # if this catalogue already has it or something newer
+        local = self.draft.get(name)
+        deleted = self.tombstones.get(name, 0)
+        if recipe is None:
+            if local is None:
+                if version <= deleted:
+                    return []
+                self.tombstones[name] = version
+                self._touch(name)
+                return [{"op": "delete", "name": name}]
+            if version < local.version:
+                return []
+            self._rerate_now(rerated)
+            self._remove(name)
+            self.tombstones[name] = version
+            return [{"op": "delete", "name": name}]
+        if local is None:
+            if version <= deleted:
+                return []
+            self._rerate_now(rerated)
+            recipe.version = version
+            self._insert(recipe)
+            self._set_versions(recipe, versions)
+            return [{"op": "add", "recipe": recipe.to_dict()}]
+
+        ours = self._versions(local)
+        merged = tuple(max(a, b) for a, b in zip(ours, versions))
+        content = (versions[0], self._content(recipe)) > (ours[0], self._content(local))
+        rating = recipe.rating if (versions[1], recipe.rating) > (ours[1], local.rating) else local.rating
+        favourite = (versions[2], recipe.is_favourite) > (ours[2], local.is_favourite)
+        favourite = recipe.is_favourite if favourite else local.is_favourite
+        ops = []
+        if content:
+            # replaced like an edit, so it moves to the end of the listing
+            self._rerate_now(rerated)
+            recipe.rating, recipe.is_favourite = rating, favourite
+            self._remove(name)
+            self._insert(recipe)
+            ops.append({"op": "edit", "name": name, "recipe": recipe.to_dict()})
+        else:
+            rid = self.draft.rid_of(name)
+            if rating != local.rating:
+                self._rerate_later(rid, rating, rerated)
+                ops.append({"op": "rate", "name": name, "rating": rating})
+            if favourite != local.is_favourite:
+                self._rerate_now(rerated)
+                self._toggle(name)
+                ops.append({"op": "favourite", "name": name, "is_favourite": favourite})
+            if merged == ours and not ops:
+                return []
+            recipe = self._private(rid)
+        self._set_versions(recipe, merged)
+        self._touch(name, recipe)
+        return ops
+
+    def _set_versions(self, recipe: Recipe, versions: tuple):
+        recipe.version = max(versions)
+        if min(versions) == recipe.version:
+            self.stamps.pop(recipe.name, None)
+        else:
+            self.stamps[recipe.name] = versions
+
+    @staticmethod
+    def _content(recipe: Recipe) -> tuple:
+        return recipe.ingredient_names(), recipe.steps
+
+    def export_changes(self, path: str, since: int = 0) -> int:
+        # Writes changes(since) to path as JSON Lines, replacing it in one
+        # step, and returns the seq to export from next time.
+        records = self.changes(since)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")))
+                f.write("\n")
+        os.replace(tmp_path, path)
+        return records[-1]["seq"] if records else since
+
+    def import_changes(self, path: str) -> int:
+        # applies a file written by export_changes; malformed lines are
+        # reported and skipped
+        errors = []
+        count = 0
+        try:
+            with open(path, "rb") as f:
+                count = self.apply_changes(value for _, _, value in recipejson.iter_json_records(f, errors))
+        except OSError as e:
+            print(f"Error reading changes: {e}")
+        for error in errors:
+            print(f"Skipping malformed {error}")
+        return count
@@ -0,0 +1,142 @@
+import shlex
+from SearchIndex import tokenize
+
+ORDERS = ("listing", "name", "rating")
+
+
+# ---------- RecipeQuery Class ----------
+# A combined filter over the catalogue: name text, a rating range, the
+# favourite flag, ingredients a recipe must use or must not use and ingredient
+# tags, plus an ordering and a limit. Built by chaining, e.g.
+#
+#   RecipeQuery().named("pasta").rating(low=4).using("garlic").order_by("rating").limit(10)
+#
+# or parsed from the same thing written as text (see parse). Every predicate
+# must hold; RecipeManager.query runs it through the QueryPlanner.
+class RecipeQuery:
+    def __init__(self):
+        # lower-case words, each the start of some word of the name
+        self.text: list[str] = []
+        self.min_rating: float = None
+        self.max_rating: float = None
+        # True or False to require that flag, None for either
+        self.favourite: bool = None
+        self.includes: list[str] = []
+        self.excludes: list[str] = []
+        # each tag must be on at least one of the recipe's ingredients; tags
+        # are set with IngredientFactory.set_tags, loaded recipes have none
+        self.tags: list[str] = []
+        self.order = "listing"
+        self.count: int = None
+
+    def named(self, text: str) -> "RecipeQuery":
+        self.text += [t for t in tokenize(text) if t not in self.text]
+        return self
+
+    def rating(self, low: float = None, high: float = None) -> "RecipeQuery":
+        # narrows the inclusive rating range
+        if low is not None:
+            self.min_rating = float(low) if self.min_rating is None else max(self.min_rating, float(low))
+        if high is not None:
+            self.max_rating = float(high) if self.max_rating is None else min(self.max_rating, float(high))
+        return self
+
+    def favourites(self, flag: bool = True) -> "RecipeQuery":
+        self.favourite = flag
+        return self
+
+    def using(self, *names: str) -> "RecipeQuery":
+        self.includes += [n for n in names if n not in self.includes]
+        return self
+
+    def without(self, *names: str) -> "RecipeQuery":
+        self.excludes += [n for n in names if n not in self.excludes]
+        return self
+
+    def tagged(self, *tags: str) -> "RecipeQuery":
+        self.tags += [t.lower() for t in tags if t.lower() not in self.tags]
+        return self
+
+    def order_by(self, order: str) -> "RecipeQuery":
+        if order not in ORDERS:
+            raise ValueError(f"Unknown order: {order}")
+        self.order = order
+        return self
+
+    def limit(self, count: int) -> "RecipeQuery":
+        if count is not None and count < 0:
+            raise ValueError("limit must not be negative")
+        self.count = count
+        return self
+
+    def key(self) -> tuple:
+        # query cache key; predicates are order-insensitive
+        return (frozenset(self.text), self.min_rating, self.max_rating, self.favourite, frozenset(self.includes),
+                frozenset(self.excludes), frozenset(self.tags), self.order, self.count)
+
+    @staticmethod
+    def parse(text: str) -> "RecipeQuery":
+        # Space separated terms; quote values holding spaces:
+        #
+        #   pasta rating>=4 rating<=4.5 fav with:garlic without:"olive oil"
+        #   tag:vegan order:rating limit:10
+        #
+        # Bare words match the name; -fav asks for non-favourites.
+        query = RecipeQuery()
+        try:
+            terms = shlex.split(text)
+        except ValueError as e:
+            raise ValueError(f"Bad query: {e}")
+        for term in terms:
+            if term.startswith("rating>=") or term.startswith("rating<="):
+                try:
+                    value = float(term[len("rating>="):])
+                except ValueError:
+                    raise ValueError(f"Bad rating in query: {term}")
+                if term[6] == ">":
+                    query.rating(low=value)
+                else:
+                    query.rating(high=value)
+            elif term in ("fav", "favourite"):
+                query.favourites(True)
+            elif term in ("-fav", "-favourite"):
+                query.favourites(False)
+            elif ":" in term:
+                field, value = term.split(":", 1)
+                if not value:
+                    raise ValueError(f"Missing value in query: {term}")
+                if field == "with":
+                    query.using(value)
+                elif field == "without":
+                    query.without(value)
+                elif field == "tag":
+                    query.tagged(value)
+                elif field == "order":
+                    query.order_by(value)
+                elif field == "limit":
+                    if not value.isdigit():
+                        raise ValueError(f"Bad limit in query: {term}")
+                    query.limit(int(value))
+                else:
+                    raise ValueError(f"Unknown query field: {field}")
+            else:
+                query.named(term)
+        return query
+
+    def __str__(self) -> str:
+        # the query in parse's syntax
+        terms = list(self.text)
+        if self.min_rating is not None:
+            terms.append(f"rating>={self.min_rating:g}")
+        if self.max_rating is not None:
+            terms.append(f"rating<={self.max_rating:g}")
+        if self.favourite is not None:
+            terms.append("fav" if self.favourite else "-fav")
+        terms += [f"with:{shlex.quote(n)}" for n in self.includes]
+        terms += [f"without:{shlex.quote(n)}" for n in self.excludes]
+        terms += [f"tag:{shlex.quote(t)}" for t in self.tags]
+        if self.order != "listing":
+            terms.append(f"order:{self.order}")
+        if self.count is not None:
+            terms.append(f"limit:{self.count}")
+        return " ".join(terms)
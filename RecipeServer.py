@@ -0,0 +1,467 @@
+import argparse
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import recipejson
+from RecipeManager import RecipeManager
+from RecipeQuery import RecipeQuery
+from ReadWriteLock import ReadWriteLock
+from Recipe import MAX_RATING, valid_rating
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+MAX_BODY = 1 << 20
+MAX_HEADERS = 100
+# seconds an idle keep-alive connection is held open
+KEEP_ALIVE_TIMEOUT = 30
+# recipes encoded per chunk of a streamed listing
+STREAM_BATCH = 100
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+# (method, path pattern, handler); path groups are passed to the handler
+ROUTES = [
+    ("GET", r"/recipes", "list_recipes"),
+    ("POST", r"/recipes", "add_recipe"),
+    ("GET", r"/recipes/([^/]+)", "get_recipe"),
+    ("PUT", r"/recipes/([^/]+)", "edit_recipe"),
+    ("DELETE", r"/recipes/([^/]+)", "delete_recipe"),
+    ("POST", r"/recipes/([^/]+)/rating", "rate_recipe"),
+    ("POST", r"/recipes/([^/]+)/favourite", "favourite_recipe"),
+    ("GET", r"/search", "search"),
+    ("GET", r"/ingredients", "find_by_ingredients"),
+    ("GET", r"/cook", "cook_with"),
+    ("GET", r"/recommend", "recommend"),
+    ("GET", r"/query", "query"),
+    ("POST", r"/batch", "apply_batch"),
+    ("GET", r"/changes", "changes"),
+    ("POST", r"/changes", "apply_changes"),
+]
+
+
+# ---------- HttpError Class ----------
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------- Page Class ----------
+# One page of a listing, streamed to the client in chunks. total is None when
+# the listing length is not known.
+class Page:
+    def __init__(self, items: list[dict], start: int, total: int = None, next_start: int = None):
+        self.items = items
+        self.start = start
+        self.total = total
+        self.next_start = next_start
+
+
+def error_status(e: ValueError) -> int:
+    message = str(e)
+    if "not found" in message:
+        return 404
+    if "already exists" in message:
+        return 409
+    return 400
+
+
+def int_param(params: dict, name: str, default: int, low: int = 0, high: int = None) -> int:
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise HttpError(400, f"'{name}' must be an integer")
+    if value < low:
+        raise HttpError(400, f"'{name}' must be at least {low}")
+    if high is not None and value > high:
+        raise HttpError(400, f"'{name}' must be at most {high}")
+    return value
+
+
+def list_param(params: dict, name: str) -> list[str]:
+    return [item.strip() for item in params.get(name, "").split(",") if item.strip()]
+
+
+def page_of(recipes: list, start: int, count: int, total: int = None) -> Page:
+    # recipes holds the page plus, if there is one, the first item after it
+    items = [r.to_dict() for r in recipes[:count]]
+    next_start = start + count if len(recipes) > count or (total is not None and start + count < total) else None
+    return Page(items, start, total, next_start)
+
+
+# ---------- RecipeServer Class ----------
+# HTTP/1.1 JSON API over a RecipeManager. Connections are kept alive between
+# requests. Manager calls run on a thread pool so searches and large queries do
+# not stall the event loop, under a reader/writer lock: reads run side by
+# side, a change waits for them and runs alone.
+class RecipeServer:
+    def __init__(self, manager: RecipeManager, threads: int = 4):
+        self.manager = manager
+        self.lock = ReadWriteLock()
+        self.executor = ThreadPoolExecutor(threads)
+        self.routes = [(method, re.compile(pattern + "$"), getattr(self, handler))
+                       for method, pattern, handler in ROUTES]
+        self.server: asyncio.AbstractServer = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> int:
+        # returns the bound port, so port 0 picks a free one
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown()
+
+    async def read(self, fn, *args):
+        async with self.lock.read():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def write(self, fn, *args):
+        async with self.lock.write():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # ---------- connection handling ----------
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                await self.respond(writer, method, target, body, version, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader):
+        # (method, target, version, headers, body), or None once the client
+        # has closed the connection
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(400, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", ""):
+            raise HttpError(400, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return parts[0], parts[1], parts[2], headers, body
+
+    async def respond(self, writer, method: str, target: str, body: bytes, version: str, keep_alive: bool):
+        try:
+            result = await self.dispatch(method, target, body)
+        except HttpError as e:
+            result = (e.status, {"error": str(e)})
+        except Exception as e:
+            result = (500, {"error": f"{type(e).__name__}: {e}"})
+        if isinstance(result, Page):
+            await self.send_page(writer, result, version, keep_alive)
+        else:
+            status, payload = result if isinstance(result, tuple) else (200, result)
+            await self.send_json(writer, status, payload, keep_alive)
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            path_matched = True
+            if route_method == method:
+                data = None
+                if body:
+                    try:
+                        data = json.loads(body)
+                    except ValueError:
+                        raise HttpError(400, "Request body is not valid JSON")
+                return await handler(params, data, *map(unquote, match.groups()))
+        if path_matched:
+            raise HttpError(405, f"{method} not allowed on {url.path}")
+        raise HttpError(404, f"No such endpoint: {url.path}")
+
+    def head(self, status: int, headers: dict, keep_alive: bool) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 "Content-Type: application/json",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status: int, payload, keep_alive: bool):
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(self.head(status, {"Content-Length": len(data)}, keep_alive) + data)
+        await writer.drain()
+
+    async def send_page(self, writer, page: Page, version: str, keep_alive: bool):
+        meta = {"total": page.total, "start": page.start, "next": page.next_start}
+        if version != "HTTP/1.1":
+            # HTTP/1.0 clients cannot read chunked responses
+            await self.send_json(writer, 200, {**meta, "recipes": page.items}, keep_alive)
+            return
+        # the listing is encoded and sent a batch at a time, so a large page
+        # neither builds one big buffer nor holds up other connections
+        writer.write(self.head(200, {"Transfer-Encoding": "chunked"}, keep_alive))
+        pieces = [json.dumps(meta)[:-1] + ', "recipes": [']
+        for i in range(0, len(page.items), STREAM_BATCH):
+            batch = ", ".join(json.dumps(item) for item in page.items[i:i + STREAM_BATCH])
+            pieces.append(batch if i == 0 else ", " + batch)
+            self.write_chunk(writer, "".join(pieces))
+            pieces = []
+            await writer.drain()
+        pieces.append("]}")
+        self.write_chunk(writer, "".join(pieces))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def write_chunk(writer, text: str):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    # ---------- endpoints ----------
+
+    async def list_recipes(self, params: dict, data) -> Page:
+        order = params.get("order", "all")
+        start = int_param(params, "start", 0)
+        count = int_param(params, "count", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+        def fetch() -> Page:
+            try:
+                cursor = self.manager.cursor(order)
+            except ValueError as e:
+                raise HttpError(400, str(e))
+            return page_of(cursor.fetch(start, count), start, count, cursor.total)
+        return await self.read(fetch)
+
+    async def get_recipe(self, params: dict, data, name: str) -> dict:
+        def fetch() -> dict:
+            return self.manager.get_recipe(name).to_dict()
+        return await self.read(self.guard(fetch))
+
+    async def search(self, params: dict, data) -> Page:
+        query = params.get("q", "")
+        start = int_param(params, "start", 0)
+        count = int_param(params, "count", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+        def fetch() -> Page:
+            # one extra result tells whether there is a next page
+            return page_of(self.manager.search(query, start + count + 1)[start:], start, count)
+        return await self.read(fetch)
+
+    async def find_by_ingredients(self, params: dict, data) -> Page:
+        start = int_param(params, "start", 0)
+        count = int_param(params, "count", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+        def fetch() -> Page:
+            found = self.manager.find_by_ingredients(list_param(params, "all"), list_param(params, "any"),
+                                                     list_param(params, "exclude"))
+            return page_of(found[start:start + count], start, count, len(found))
+        return await self.read(fetch)
+
+    async def cook_with(self, params: dict, data) -> Page:
+        pantry = list_param(params, "pantry")
+        missing = int_param(params, "missing", 0)
+        start = int_param(params, "start", 0)
+        count = int_param(params, "count", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+        def fetch() -> Page:
+            matches = self.manager.cook_with(pantry, missing)
+            page = page_of([r for r, _ in matches[start:start + count]], start, count, len(matches))
+            for item, (_, lacking) in zip(page.items, matches[start:]):
+                item["missing"] = lacking
+            return page
+        return await self.read(fetch)
+
+    async def recommend(self, params: dict, data) -> dict:
+        # like ?recipe=<name>, like ?pantry=a,b,c, or like the favourites
+        name = params.get("recipe")
+        pantry = list_param(params, "pantry") if "pantry" in params else None
+        k = int_param(params, "k", 10, 1, MAX_PAGE_SIZE)
+        metric = params.get("metric", "jaccard")
+
+        def fetch() -> dict:
+            matches = self.manager.recommend(name, pantry, k, metric)
+            return {"items": [dict(recipe.to_dict(), score=round(score, 6)) for recipe, score in matches]}
+        return await self.read(self.guard(fetch))
+
+    async def query(self, params: dict, data):
+        # ?q=<query, see RecipeQuery.parse>; &explain=1 returns the plan
+        try:
+            query = RecipeQuery.parse(params.get("q", ""))
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        start = int_param(params, "start", 0)
+        count = int_param(params, "count", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+        def fetch():
+            if params.get("explain") == "1":
+                return {"plan": self.manager.explain(query)}
+            found = self.manager.query(query)
+            return page_of(found[start:start + count], start, count, len(found))
+        return await self.read(fetch)
+
+    async def add_recipe(self, params: dict, data) -> tuple:
+        recipe = self.parse_recipe(data)
+
+        def add() -> tuple:
+            self.manager.add_recipe(recipe)
+            return 201, recipe.to_dict()
+        return await self.write(self.guard(add))
+
+    async def edit_recipe(self, params: dict, data, name: str) -> dict:
+        recipe = self.parse_recipe(data)
+
+        def edit() -> dict:
+            self.manager.edit_recipe(name, recipe)
+            return recipe.to_dict()
+        return await self.write(self.guard(edit))
+
+    async def delete_recipe(self, params: dict, data, name: str) -> dict:
+        def delete() -> dict:
+            self.manager.get_recipe(name)
+            self.manager.delete_recipe(name)
+            return {"deleted": name}
+        return await self.write(self.guard(delete))
+
+    async def rate_recipe(self, params: dict, data, name: str) -> dict:
+        rating = data.get("rating") if isinstance(data, dict) else None
+        if not valid_rating(rating):
+            raise HttpError(400, f"Body must be {{\"rating\": <number from 0 to {MAX_RATING:g}>}}")
+
+        def rate() -> dict:
+            self.manager.rate_recipe(name, rating)
+            return self.manager.get_recipe(name).to_dict()
+        return await self.write(self.guard(rate))
+
+    async def favourite_recipe(self, params: dict, data, name: str) -> dict:
+        # sets the flag given as {"is_favourite": bool}, or toggles it
+        wanted = data.get("is_favourite") if isinstance(data, dict) else None
+        if wanted is not None and not isinstance(wanted, bool):
+            raise HttpError(400, "'is_favourite' must be true or false")
+
+        def favourite() -> dict:
+            recipe = self.manager.get_recipe(name)
+            if wanted is None or recipe.is_favourite != wanted:
+                self.manager.favourite_recipe(name)
+            return self.manager.get_recipe(name).to_dict()
+        return await self.write(self.guard(favourite))
+
+    async def apply_batch(self, params: dict, data) -> dict:
+        # {"ops": [...]} as for RecipeManager.apply_batch; all or nothing
+        operations = data.get("ops") if isinstance(data, dict) else None
+        if not isinstance(operations, list):
+            raise HttpError(400, "Body must be {\"ops\": [...]}")
+
+        def apply() -> dict:
+            try:
+                return {"applied": self.manager.apply_batch(operations)}
+            except ValueError as e:
+                raise HttpError(400, str(e))
+        return await self.write(apply)
+
+    async def changes(self, params: dict, data) -> dict:
+        # ?since=<seq>&count=<n>: the change feed, oldest first; pass the
+        # returned seq as since to continue
+        since = int_param(params, "since", 0)
+        count = int_param(params, "count", MAX_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+        def fetch() -> dict:
+            found = self.manager.changes(since, count)
+            return {"changes": found, "seq": found[-1]["seq"] if found else since}
+        return await self.read(fetch)
+
+    async def apply_changes(self, params: dict, data) -> dict:
+        # {"changes": [...]} from another instance's feed
+        changes = data.get("changes") if isinstance(data, dict) else None
+        if not isinstance(changes, list):
+            raise HttpError(400, "Body must be {\"changes\": [...]}")
+
+        def apply() -> dict:
+            try:
+                return {"applied": self.manager.apply_changes(changes)}
+            except ValueError as e:
+                raise HttpError(400, str(e))
+        return await self.write(apply)
+
+    def parse_recipe(self, data):
+        try:
+            return recipejson.recipe_from_dict(data, self.manager.factory)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+    @staticmethod
+    def guard(fn):
+        # maps the manager's ValueErrors to HTTP errors
+        def call():
+            try:
+                return fn()
+            except ValueError as e:
+                raise HttpError(error_status(e), str(e))
+        return call
+
+
+async def serve(manager: RecipeManager, host: str, port: int, threads: int):
+    server = RecipeServer(manager, threads)
+    port = await server.start(host, port)
+    print(f"Serving {manager.cursor('all').total} recipes on http://{host}:{port}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON API for a recipe catalogue")
+    parser.add_argument("catalogue", nargs="?", default="sample_recipes.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="0 picks a free port")
+    parser.add_argument("--threads", type=int, default=4, help="worker threads for manager calls")
+    args = parser.parse_args()
+    manager = RecipeManager()
+    manager.open_journal(args.catalogue)
+    try:
+        asyncio.run(serve(manager, args.host, args.port, args.threads))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
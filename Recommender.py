@@ -0,0 +1,188 @@
+from array import array
+import numpy as np
+from MinHash import MinHash
+from Recipe import Recipe, MAX_RATING
+
+METRICS = ("jaccard", "cosine")
+# approximate queries score at most this many LSH candidates exactly, and a
+# favourites profile is probed with at most this many favourites
+MAX_CANDIDATES = 2000
+MAX_PROBES = 256
+
+
+# ---------- Recommender Class ----------
+# Ingredient-set similarity between recipes, scored in bulk with NumPy. The
+# recipe x ingredient incidence matrix is kept column-wise: one posting array
+# of recipe ids per ingredient id, plus each recipe's distinct ingredient
+# count and rating in dense arrays indexed by recipe id. A query is a weight
+# per ingredient (1 for a recipe or a pantry, the share of favourites using
+# it for a favourites profile), and one weighted bincount over the postings
+# of those ingredients gives its overlap with every recipe at once.
+#
+# Once build_minhash has run, approximate queries only score the recipes
+# sharing an LSH band with the query, so their cost follows the number of
+# similar recipes rather than the length of the postings they touch.
+class Recommender:
+    def __init__(self):
+        self.postings: dict[int, array] = {}
+        self.sizes = np.zeros(0, np.int32)
+        self.ratings = np.zeros(0, np.float32)
+        self.alive = np.zeros(0, bool)
+        self.live = 0
+        # posting entries in total, and those of removed recipes, which are
+        # dropped once they are the majority
+        self.entries = 0
+        self.stale = 0
+        self.minhash: MinHash = None
+
+    def __len__(self) -> int:
+        return self.live
+
+    def reserve(self, size: int):
+        # grows the per-recipe arrays by replacing them, so a reader holding
+        # the old ones still sees a consistent, older state
+        if size > len(self.alive):
+            capacity = max(size, 2 * len(self.alive), 1024)
+            sizes = np.zeros(capacity, np.int32)
+            sizes[:len(self.sizes)] = self.sizes
+            ratings = np.zeros(capacity, np.float32)
+            ratings[:len(self.ratings)] = self.ratings
+            alive = np.zeros(capacity, bool)
+            alive[:len(self.alive)] = self.alive
+            self.sizes, self.ratings, self.alive = sizes, ratings, alive
+
+    def add(self, rid: int, recipe: Recipe):
+        self.add_many([(rid, recipe)])
+
+    def add_many(self, entries):
+        # (recipe id, Recipe) pairs, e.g. a whole catalogue
+        rids, rows, ratings = [], [], []
+        for rid, recipe in entries:
+            row = sorted(set(recipe.ingredient_ids))
+            for ingredient_id in row:
+                posting = self.postings.get(ingredient_id)
+                if posting is None:
+                    posting = self.postings[ingredient_id] = array("i")
+                posting.append(rid)
+            self.entries += len(row)
+            rids.append(rid)
+            rows.append(row)
+            ratings.append(recipe.rating)
+        if not rids:
+            return
+        self.reserve(max(rids) + 1)
+        index = np.array(rids, np.int64)
+        self.sizes[index] = [len(row) for row in rows]
+        self.ratings[index] = ratings
+        self.alive[index] = True
+        self.live += len(rids)
+        if self.minhash is not None:
+            self.minhash.add(index, self.minhash.signatures_of(rows))
+
+    def remove(self, rid: int):
+        if rid >= len(self.alive) or not self.alive[rid]:
+            return
+        self.alive[rid] = False
+        self.live -= 1
+        self.stale += int(self.sizes[rid])
+        if self.minhash is not None:
+            self.minhash.remove(rid)
+        if self.stale > max(1 << 16, self.entries - self.stale):
+            self.compact()
+
+    def rerate(self, rid: int, rating: float):
+        self.ratings[rid] = rating
+
+    def compact(self):
+        # rebuilds the postings without removed recipes
+        postings = {}
+        for ingredient_id, posting in self.postings.items():
+            ids = np.array(posting, np.int32)
+            ids = ids[self.alive[ids]]
+            if len(ids):
+                postings[ingredient_id] = array("i", ids.tobytes())
+        self.entries -= self.stale
+        self.stale = 0
+        self.postings = postings
+
+    def build_minhash(self, entries, num_perm: int = 64, bands: int = 32):
+        # signs every live recipe; entries are (recipe id, Recipe) pairs for
+        # the whole catalogue
+        minhash = MinHash(num_perm, bands)
+        rids, rows = [], []
+        for rid, recipe in entries:
+            rids.append(rid)
+            rows.append(sorted(set(recipe.ingredient_ids)))
+        minhash.add(rids, minhash.signatures_of(rows))
+        minhash.merge()
+        self.minhash = minhash
+
+    def recommend(self, weights: dict[int, float], k: int = 10, metric: str = "jaccard",
+                  rating_weight: float = 0.5, exclude=(), approximate: bool = False,
+                  probe_rids=(), rows=None) -> list[tuple[int, float]]:
+        # Top k (recipe id, score) pairs for a query given as ingredient id ->
+        # weight in (0, 1]. Similarity is weighted Jaccard, dot / (size +
+        # total weight - dot), or cosine, dot / (sqrt(size) * |weights|);
+        # rating_weight blends in the rating, 0 ignoring it and 1 scaling
+        # the similarity by rating / 5. Recipes sharing no ingredient with
+        # the query are never returned.
+        #
+        # An approximate query probes the MinHash index with probe_rids'
+        # signatures, or the signature of the query's ingredients, and reads
+        # candidates' ingredients through rows(recipe id).
+        if metric not in METRICS:
+            raise ValueError(f"Unknown similarity metric: {metric}")
+        if not weights or k <= 0:
+            return []
+        sizes, ratings, alive = self.sizes, self.ratings, self.alive
+        ids = np.fromiter(weights.keys(), np.int64, len(weights))
+        w = np.fromiter(weights.values(), np.float64, len(weights))
+        if approximate:
+            if len(probe_rids):
+                probes = self.minhash.signatures[np.asarray(probe_rids[:MAX_PROBES], np.int64)]
+            else:
+                probes = self.minhash.signature(ids)
+            rids = self.minhash.candidates(probes, MAX_CANDIDATES)
+            rids, dot = self.overlap(rids, ids, w, rows)
+        else:
+            postings = [np.array(self.postings.get(i, ()), np.int32) for i in ids.tolist()]
+            lengths = [len(p) for p in postings]
+            dot = np.bincount(np.concatenate(postings), np.repeat(w, lengths), len(alive))[:len(alive)]
+            rids = np.flatnonzero(dot)
+            dot = dot[rids]
+        keep = alive[rids]
+        if len(exclude):
+            keep &= ~np.isin(rids, np.asarray(exclude, np.int64))
+        rids, dot = rids[keep], dot[keep]
+        if metric == "jaccard":
+            similarity = dot / (sizes[rids] + w.sum() - dot)
+        else:
+            similarity = dot / (np.sqrt(sizes[rids]) * np.sqrt((w * w).sum()))
+        quality = np.clip(ratings[rids], 0, MAX_RATING) / MAX_RATING
+        scores = similarity * (1 - rating_weight + rating_weight * quality)
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rids, scores = rids[best], scores[best]
+        # best first; ties in listing order
+        order = np.lexsort((rids, -scores))
+        return [(int(rid), float(score)) for rid, score in zip(rids[order], scores[order])]
+
+    @staticmethod
+    def overlap(rids: np.ndarray, ids: np.ndarray, w: np.ndarray, rows) -> tuple[np.ndarray, np.ndarray]:
+        # weighted overlap of each candidate's ingredients with the query,
+        # read row by row; (candidates sharing something, their overlap)
+        dense = np.zeros(int(ids.max()) + 1)
+        dense[ids] = w
+        members = [np.asarray(rows(rid), np.int64) for rid in rids.tolist()]
+        lengths = np.array([len(m) for m in members], np.int64)
+        if not lengths.sum():
+            return rids[:0], np.zeros(0)
+        flat = np.concatenate(members)
+        owner = np.repeat(np.arange(len(rids)), lengths)
+        # an ingredient listed twice in a recipe counts once
+        pairs = np.unique(owner << 32 | flat)
+        owner, flat = pairs >> 32, pairs & 0xFFFFFFFF
+        hit = flat < len(dense)
+        dot = np.bincount(owner[hit], dense[flat[hit]], len(rids))
+        shared = np.flatnonzero(dot)
+        return rids[shared], dot[shared]
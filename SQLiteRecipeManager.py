@@ -0,0 +1,398 @@
+import heapq
+import math
+import sqlite3
+from collections import Counter
+import recipejson
+from Recipe import Recipe, MAX_RATING, check_rating
+from Sorter import Sorter
+from RecipeCursor import RecipeCursor
+from IngredientFactory import IngredientFactory, normalize
+from SearchIndex import tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    rating REAL NOT NULL,
+    is_favourite INTEGER NOT NULL,
+    ingredient_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recipes_name_nocase ON recipes (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS recipes_rating ON recipes (rating DESC, id);
+CREATE INDEX IF NOT EXISTS recipes_favourite ON recipes (is_favourite, id);
+CREATE INDEX IF NOT EXISTS recipes_ingredient_count ON recipes (ingredient_count);
+CREATE TABLE IF NOT EXISTS ingredients (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recipe_ingredients (
+    recipe_id INTEGER NOT NULL REFERENCES recipes (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    ingredient_id INTEGER NOT NULL REFERENCES ingredients (id),
+    PRIMARY KEY (recipe_id, position)
+);
+CREATE INDEX IF NOT EXISTS recipe_ingredients_ingredient ON recipe_ingredients (ingredient_id, recipe_id);
+CREATE TABLE IF NOT EXISTS steps (
+    recipe_id INTEGER NOT NULL REFERENCES recipes (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (recipe_id, position)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS recipe_text USING fts5 (name, ingredients, steps);
+"""
+
+BATCH_SIZE = 1000
+# SQLite's default limit on host parameters in one statement is 999
+PARAM_CHUNK = 500
+
+
+# ---------- SQLiteRecipeManager Class ----------
+# RecipeManager's single-recipe calls, queries, sorted listings, cursors,
+# recommendations and JSON load/save, backed by normalized SQLite tables;
+# enough for AppController (see its MANAGER_API). Batches, RecipeQuery, sync,
+# journalling and the columnar export are RecipeManager's only. Recipes stay
+# on disk; each call runs an indexed query and materializes only the recipes
+# it returns.
+class SQLiteRecipeManager:
+    def __init__(self, path: str = ":memory:"):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+        self.factory = IngredientFactory()
+        # recipes added and skipped by the last load_from_json
+        self.ingested = Counter()
+
+    def close(self):
+        self.db.close()
+
+    def add_recipe(self, recipe: Recipe):
+        with self.db:
+            if self.name_taken(recipe.name):
+                raise ValueError(f"Recipe '{recipe.name}' already exists")
+            check_rating(recipe.rating)
+            self.insert_many([recipe])
+
+    def delete_recipe(self, name: str):
+        with self.db:
+            self.delete_id(self.find_id(name))
+
+    def edit_recipe(self, name: str, updated_recipe: Recipe):
+        with self.db:
+            rid = self.find_id(name)
+            if rid is None:
+                raise ValueError("Recipe not found")
+            if self.name_taken(updated_recipe.name, name):
+                raise ValueError(f"Recipe '{updated_recipe.name}' already exists")
+            check_rating(updated_recipe.rating)
+            # re-inserted with a new id, so it moves to the end of the listing
+            self.delete_id(rid)
+            self.insert_many([updated_recipe])
+
+    def get_recipe(self, name: str) -> Recipe:
+        rid = self.find_id(name)
+        if rid is None:
+            raise ValueError("Recipe not found")
+        return self.materialize([rid])[0]
+
+    def sort_recipes(self) -> Sorter:
+        return Sorter()
+
+    def sort_name(self, start: int = 0, count: int = None) -> list[Recipe]:
+        return self.query_recipes("SELECT id FROM recipes ORDER BY name LIMIT ? OFFSET ?",
+                                  (-1 if count is None else count, start))
+
+    def sort_rating(self, start: int = 0, count: int = None) -> list[Recipe]:
+        return self.query_recipes("SELECT id FROM recipes ORDER BY rating DESC, id LIMIT ? OFFSET ?",
+                                  (-1 if count is None else count, start))
+
+    def top_rated(self, k: int = 20) -> list[Recipe]:
+        return self.sort_rating(0, k)
+
+    def favourite_recipe(self, name: str):
+        with self.db:
+            cursor = self.db.execute(
+                "UPDATE recipes SET is_favourite = 1 - is_favourite WHERE name = ?", (name,))
+        if cursor.rowcount == 0:
+            raise ValueError("Recipe not found")
+
+    def rate_recipe(self, name: str, rating: float):
+        check_rating(rating)
+        with self.db:
+            cursor = self.db.execute("UPDATE recipes SET rating = ? WHERE name = ?", (rating, name))
+        if cursor.rowcount == 0:
+            raise ValueError("Recipe not found")
+
+    def list_favourites(self) -> list[Recipe]:
+        return self.query_recipes("SELECT id FROM recipes WHERE is_favourite = 1 ORDER BY id")
+
+    def search(self, keyword: str, limit: int = 50) -> list[Recipe]:
+        tokens = tokenize(keyword)
+        if not tokens:
+            return []
+        # every token as a prefix match, any of them may match; bm25 weights
+        # mirror SearchIndex's field weights
+        match = " OR ".join(f'"{token}"*' for token in tokens)
+        return self.query_recipes(
+            "SELECT rowid FROM recipe_text WHERE recipe_text MATCH ? "
+            "ORDER BY bm25(recipe_text, 3.0, 2.0, 1.0), rowid LIMIT ?", (match, limit))
+
+    def find_by_ingredients(self, include_all: list[str] = (), include_any: list[str] = (),
+                            exclude: list[str] = ()) -> list[Recipe]:
+        parts = []
+        params: list = []
+        if include_all:
+            names = keys(include_all)
+            parts.append(
+                f"SELECT ri.recipe_id FROM recipe_ingredients ri JOIN ingredients i ON i.id = ri.ingredient_id "
+                f"WHERE i.key IN ({placeholders(names)}) GROUP BY ri.recipe_id "
+                f"HAVING COUNT(DISTINCT ri.ingredient_id) = ?")
+            params += names + [len(names)]
+        if include_any:
+            names = keys(include_any)
+            parts.append(
+                f"SELECT ri.recipe_id FROM recipe_ingredients ri JOIN ingredients i ON i.id = ri.ingredient_id "
+                f"WHERE i.key IN ({placeholders(names)})")
+            params += names
+        sql = " INTERSECT ".join(parts) or "SELECT id FROM recipes"
+        if exclude:
+            names = keys(exclude)
+            sql += (f" EXCEPT SELECT ri.recipe_id FROM recipe_ingredients ri JOIN ingredients i "
+                    f"ON i.id = ri.ingredient_id WHERE i.key IN ({placeholders(names)})")
+            params += names
+        return self.query_recipes(f"SELECT * FROM ({sql}) ORDER BY 1", params)
+
+    def cook_with(self, pantry: list[str], missing: int = 0) -> list[tuple[Recipe, int]]:
+        names = keys(pantry)
+        rows = self.db.execute(
+            f"""WITH hits AS (
+                    SELECT ri.recipe_id, COUNT(DISTINCT ri.ingredient_id) AS n
+                    FROM recipe_ingredients ri JOIN ingredients i ON i.id = ri.ingredient_id
+                    WHERE i.key IN ({placeholders(names)}) GROUP BY ri.recipe_id)
+                SELECT r.id, r.ingredient_count - hits.n FROM hits JOIN recipes r ON r.id = hits.recipe_id
+                WHERE r.ingredient_count - hits.n <= ?
+                UNION ALL
+                SELECT r.id, r.ingredient_count FROM recipes r
+                WHERE r.ingredient_count <= ? AND r.id NOT IN (SELECT recipe_id FROM hits)
+                ORDER BY 2, 1""",
+            names + [missing, missing]).fetchall()
+        recipes = self.materialize([rid for rid, _ in rows])
+        return [(recipe, lacking) for recipe, (_, lacking) in zip(recipes, rows)]
+
+    def recommend(self, name: str = None, pantry: list[str] = None, k: int = 10, metric: str = "jaccard",
+                  rating_weight: float = 0.5, approximate: bool = None) -> list[tuple[Recipe, float]]:
+        # Scored as RecipeManager.recommend (see Recommender.recommend), from
+        # the postings of the query's ingredients; always exact, so
+        # approximate is ignored.
+        if name is not None and pantry is not None:
+            raise ValueError("Recommend for a recipe or a pantry, not both")
+        if metric not in ("jaccard", "cosine"):
+            raise ValueError(f"Unknown similarity metric: {metric}")
+        exclude = set()
+        if name is not None:
+            rid = self.find_id(name)
+            if rid is None:
+                raise ValueError("Recipe not found")
+            weights = dict.fromkeys((row[0] for row in self.db.execute(
+                "SELECT ingredient_id FROM recipe_ingredients WHERE recipe_id = ?", (rid,))), 1.0)
+            exclude.add(rid)
+        elif pantry is not None:
+            names = keys(pantry)
+            weights = dict.fromkeys((row[0] for row in self.db.execute(
+                f"SELECT id FROM ingredients WHERE key IN ({placeholders(names)})", names)), 1.0)
+        else:
+            # each ingredient weighs the share of favourites using it
+            exclude = {row[0] for row in self.db.execute("SELECT id FROM recipes WHERE is_favourite = 1")}
+            rows = self.db.execute(
+                "SELECT ingredient_id, COUNT(DISTINCT recipe_id) FROM recipe_ingredients WHERE recipe_id IN "
+                "(SELECT id FROM recipes WHERE is_favourite = 1) GROUP BY ingredient_id").fetchall()
+            weights = {i: n / len(exclude) for i, n in rows}
+        if not weights or k <= 0:
+            return []
+        dot: dict[int, float] = {}
+        for chunk in chunks(list(weights)):
+            for rid, ingredient_id in self.db.execute(
+                    f"SELECT DISTINCT recipe_id, ingredient_id FROM recipe_ingredients "
+                    f"WHERE ingredient_id IN ({placeholders(chunk)})", chunk):
+                if rid not in exclude:
+                    dot[rid] = dot.get(rid, 0.0) + weights[ingredient_id]
+        total = sum(weights.values())
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        scored = []
+        for chunk in chunks(list(dot)):
+            for rid, size, rating in self.db.execute(
+                    f"SELECT id, ingredient_count, rating FROM recipes WHERE id IN ({placeholders(chunk)})", chunk):
+                d = dot[rid]
+                similarity = d / (size + total - d) if metric == "jaccard" else d / (math.sqrt(size) * norm)
+                quality = min(max(rating, 0.0), MAX_RATING) / MAX_RATING
+                scored.append((-similarity * (1 - rating_weight + rating_weight * quality), rid))
+        # best first; ties in listing order
+        best = heapq.nsmallest(k, scored)
+        recipes = self.materialize([rid for _, rid in best])
+        return [(recipe, -score) for recipe, (score, _) in zip(recipes, best)]
+
+    def list_all(self) -> list[Recipe]:
+        return self.query_recipes("SELECT id FROM recipes ORDER BY id")
+
+    def cursor(self, order: str = "all") -> RecipeCursor:
+        orderings = {
+            "all": ("", "id"),
+            "name": ("", "name"),
+            "rating": ("", "rating DESC, id"),
+            "favourites": ("WHERE is_favourite = 1", "id"),
+        }
+        if order not in orderings:
+            raise ValueError(f"Unknown order: {order}")
+        where, order_by = orderings[order]
+        total = self.db.execute(f"SELECT COUNT(*) FROM recipes {where}").fetchone()[0]
+        sql = f"SELECT id FROM recipes {where} ORDER BY {order_by} LIMIT ? OFFSET ?"
+        return RecipeCursor(lambda start, count: self.query_recipes(sql, (count, start)), total)
+
+    def load_from_json(self, path: str) -> list:
+        # Bulk import: recipes are streamed from path and inserted in batches
+        # with executemany, all inside one transaction.
+        errors = []
+        batch = []
+        self.ingested = Counter()
+        try:
+            with self.db:
+                for recipe in recipejson.iter_recipes(path, self.factory, errors):
+                    batch.append(recipe)
+                    if len(batch) >= BATCH_SIZE:
+                        self.ingested += self.insert_new(batch)
+                        batch = []
+                self.ingested += self.insert_new(batch)
+        except OSError as e:
+            print(f"Error loading recipes from JSON: {e}")
+        for error in errors:
+            print(f"Skipping malformed {error}")
+        return errors
+
+    def ingest_summary(self) -> str:
+        return recipejson.ingest_summary(self.ingested)
+
+    def save_to_json(self, path: str):
+        try:
+            recipejson.dump_recipes(path, self.iter_all())
+        except Exception as e:
+            print(f"Failed to save recipes: {e}")
+
+    def iter_all(self):
+        last = 0
+        while True:
+            ids = [row[0] for row in self.db.execute(
+                "SELECT id FROM recipes WHERE id > ? ORDER BY id LIMIT ?", (last, BATCH_SIZE))]
+            if not ids:
+                return
+            yield from self.materialize(ids)
+            last = ids[-1]
+
+    def find_id(self, name: str):
+        row = self.db.execute("SELECT id FROM recipes WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def name_taken(self, name: str, ignore: str = None) -> bool:
+        # whether a recipe other than ignore has name, ignoring case; SQLite's
+        # NOCASE folds ASCII letters only
+        return self.db.execute("SELECT 1 FROM recipes WHERE name = ? COLLATE NOCASE AND name IS NOT ? LIMIT 1",
+                               (name, ignore)).fetchone() is not None
+
+    def delete_id(self, rid):
+        if rid is None:
+            return
+        self.db.execute("DELETE FROM recipes WHERE id = ?", (rid,))
+        self.db.execute("DELETE FROM recipe_text WHERE rowid = ?", (rid,))
+
+    def insert_new(self, recipes: list[Recipe]) -> Counter:
+        # skips recipes whose name, ignoring case, is already stored or
+        # repeated in the batch; the first occurrence wins, as with
+        # RecipeManager.load_from_json. Returns how many were "added" and
+        # "skipped".
+        names = [r.name for r in recipes]
+        existing = set()
+        for chunk in chunks(names):
+            existing.update(row[0].casefold() for row in self.db.execute(
+                f"SELECT name FROM recipes WHERE name COLLATE NOCASE IN ({placeholders(chunk)})", chunk))
+        fresh = []
+        for recipe in recipes:
+            if recipe.name.casefold() in existing:
+                continue
+            existing.add(recipe.name.casefold())
+            fresh.append(recipe)
+        self.insert_many(fresh)
+        return Counter(added=len(fresh), skipped=len(recipes) - len(fresh))
+
+    def insert_many(self, recipes: list[Recipe]):
+        if not recipes:
+            return
+        next_id = self.db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM recipes").fetchone()[0]
+        ing_ids = self.ingredient_ids({normalize(n): n for r in recipes for n in r.ingredient_names()})
+        recipe_rows, ingredient_rows, step_rows, text_rows = [], [], [], []
+        for rid, recipe in enumerate(recipes, next_id):
+            names = recipe.ingredient_names()
+            ids = [ing_ids[normalize(n)] for n in names]
+            recipe_rows.append((rid, recipe.name, recipe.rating, int(recipe.is_favourite), len(set(ids))))
+            ingredient_rows += [(rid, pos, ing_id) for pos, ing_id in enumerate(ids)]
+            step_rows += [(rid, pos, step) for pos, step in enumerate(recipe.steps)]
+            text_rows.append((rid, recipe.name, " ".join(names), " ".join(recipe.steps)))
+        self.db.executemany("INSERT INTO recipes VALUES (?, ?, ?, ?, ?)", recipe_rows)
+        self.db.executemany("INSERT INTO recipe_ingredients VALUES (?, ?, ?)", ingredient_rows)
+        self.db.executemany("INSERT INTO steps VALUES (?, ?, ?)", step_rows)
+        self.db.executemany(
+            "INSERT INTO recipe_text (rowid, name, ingredients, steps) VALUES (?, ?, ?, ?)", text_rows)
+
+    def ingredient_ids(self, names: dict[str, str]) -> dict[str, int]:
+        # normalized key -> ingredient id, adding rows for unseen keys;
+        # names maps each key to the display name to store with it
+        ids: dict[str, int] = {}
+        for chunk in chunks(sorted(names)):
+            ids.update(self.db.execute(
+                f"SELECT key, id FROM ingredients WHERE key IN ({placeholders(chunk)})", chunk))
+        missing = [(k, names[k]) for k in names if k not in ids]
+        if missing:
+            self.db.executemany("INSERT INTO ingredients (key, name) VALUES (?, ?)", missing)
+            for chunk in chunks([k for k, _ in missing]):
+                ids.update(self.db.execute(
+                    f"SELECT key, id FROM ingredients WHERE key IN ({placeholders(chunk)})", chunk))
+        return ids
+
+    def query_recipes(self, sql: str, params=()) -> list[Recipe]:
+        return self.materialize([row[0] for row in self.db.execute(sql, params)])
+
+    def materialize(self, ids: list[int]) -> list[Recipe]:
+        # builds Recipe objects for ids, in the given order, with one query
+        # per table for each chunk of ids
+        rows: dict[int, tuple] = {}
+        ingredients: dict[int, list] = {}
+        steps: dict[int, list] = {}
+        for chunk in chunks(ids):
+            marks = placeholders(chunk)
+            for rid, name, rating, fav in self.db.execute(
+                    f"SELECT id, name, rating, is_favourite FROM recipes WHERE id IN ({marks})", chunk):
+                rows[rid] = (name, rating, bool(fav))
+            for rid, name in self.db.execute(
+                    f"SELECT ri.recipe_id, i.name FROM recipe_ingredients ri "
+                    f"JOIN ingredients i ON i.id = ri.ingredient_id "
+                    f"WHERE ri.recipe_id IN ({marks}) ORDER BY ri.recipe_id, ri.position", chunk):
+                ingredients.setdefault(rid, []).append(self.factory.get_ingredient(name))
+            for rid, text in self.db.execute(
+                    f"SELECT recipe_id, text FROM steps WHERE recipe_id IN ({marks}) "
+                    f"ORDER BY recipe_id, position", chunk):
+                steps.setdefault(rid, []).append(text)
+        return [Recipe(name=rows[rid][0], ingredients=ingredients.get(rid, []),
+                       steps=steps.get(rid, []), rating=rows[rid][1], is_favourite=rows[rid][2])
+                for rid in ids if rid in rows]
+
+
+def keys(names: list[str]) -> list[str]:
+    return sorted({normalize(n) for n in names})
+
+
+def placeholders(values) -> str:
+    return ", ".join("?" * len(values))
+
+
+def chunks(values: list, size: int = PARAM_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
@@ -0,0 +1,263 @@
+import bisect
+import heapq
+import math
+import re
+from Recipe import Recipe
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# term frequency multipliers, so a hit in the name outranks one in the steps
+FIELD_WEIGHTS = {"name": 3, "ingredients": 2, "steps": 1}
+
+# prefix and typo expansions score below exact matches
+PREFIX_PENALTY = 0.7
+TYPO_PENALTY = 0.5
+# terms shorter than this are not matched with typos
+MIN_TYPO_LENGTH = 4
+# terms found in more than this share of recipes are treated as near stop words
+COMMON_TERM_RATIO = 0.5
+# posting lists at least this long are also bucketed by impact, so a search
+# can stop once no unscored recipe could reach the results; a list is
+# unbucketed again when it shrinks below half of this
+IMPACT_MIN = 1000
+# impact buckets group recipe lengths by their top bits (within 1/8 of each other)
+LENGTH_BITS = 4
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def deletes(term: str) -> set[str]:
+    # every variant of term with one character removed; two terms within one
+    # edit of each other share a variant (symmetric delete)
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def length_floor(length: int) -> int:
+    # length with all but its top LENGTH_BITS bits cleared; never above length
+    shift = max(0, length.bit_length() - LENGTH_BITS)
+    return length >> shift << shift
+
+
+# ---------- SearchIndex Class ----------
+# Full-text index over recipe name, ingredients and steps with BM25 ranking.
+class SearchIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {recipe id: weighted term frequency}
+        self.postings: dict[str, dict[int, int]] = {}
+        self.doc_terms: dict[int, dict[str, int]] = {}
+        self.doc_lengths: dict[int, int] = {}
+        self.total_length = 0
+        # sorted vocabulary for prefix lookups
+        self.vocabulary: list[str] = []
+        self.delete_map: dict[str, set[str]] = {}
+        # term -> {(tf, length floor): recipe ids}, for terms with long posting lists
+        self.impacts: dict[str, dict[tuple[int, int], set[int]]] = {}
+
+    def terms_for(self, recipe: Recipe) -> dict[str, int]:
+        terms: dict[str, int] = {}
+        fields = {
+            "name": recipe.name,
+            "ingredients": " ".join(recipe.ingredient_names()),
+            "steps": " ".join(recipe.steps),
+        }
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + weight
+        return terms
+
+    def add(self, recipe_id: int, recipe: Recipe):
+        terms = self.terms_for(recipe)
+        length = sum(terms.values())
+        self.doc_terms[recipe_id] = terms
+        self.doc_lengths[recipe_id] = length
+        self.total_length += length
+        bucket_length = length_floor(length)
+        for term, tf in terms.items():
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = {}
+                self.add_term(term)
+            docs[recipe_id] = tf
+            buckets = self.impacts.get(term)
+            if buckets is not None:
+                buckets.setdefault((tf, bucket_length), set()).add(recipe_id)
+            elif len(docs) == IMPACT_MIN:
+                self.bucket(term)
+
+    def remove(self, recipe_id: int):
+        terms = self.doc_terms.pop(recipe_id, None)
+        if terms is None:
+            return
+        length = self.doc_lengths.pop(recipe_id)
+        self.total_length -= length
+        bucket_length = length_floor(length)
+        for term, tf in terms.items():
+            docs = self.postings[term]
+            del docs[recipe_id]
+            buckets = self.impacts.get(term)
+            if buckets is not None:
+                if len(docs) < IMPACT_MIN // 2:
+                    del self.impacts[term]
+                else:
+                    bucket = buckets[tf, bucket_length]
+                    bucket.discard(recipe_id)
+                    if not bucket:
+                        del buckets[tf, bucket_length]
+            if not docs:
+                del self.postings[term]
+                self.remove_term(term)
+
+    def bucket(self, term: str):
+        buckets: dict[tuple[int, int], set[int]] = {}
+        for rid, tf in self.postings[term].items():
+            buckets.setdefault((tf, length_floor(self.doc_lengths[rid])), set()).add(rid)
+        self.impacts[term] = buckets
+
+    def add_term(self, term: str):
+        bisect.insort(self.vocabulary, term)
+        if len(term) >= MIN_TYPO_LENGTH:
+            for variant in deletes(term) | {term}:
+                self.delete_map.setdefault(variant, set()).add(term)
+
+    def remove_term(self, term: str):
+        pos = bisect.bisect_left(self.vocabulary, term)
+        del self.vocabulary[pos]
+        if len(term) >= MIN_TYPO_LENGTH:
+            for variant in deletes(term) | {term}:
+                terms = self.delete_map[variant]
+                terms.discard(term)
+                if not terms:
+                    del self.delete_map[variant]
+
+    def expand(self, token: str, max_expansions: int = 20) -> dict[str, float]:
+        # index term -> score multiplier for one query token
+        matches: dict[str, float] = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        pos = bisect.bisect_left(self.vocabulary, token)
+        while pos < len(self.vocabulary) and len(matches) < max_expansions:
+            term = self.vocabulary[pos]
+            if not term.startswith(token):
+                break
+            matches.setdefault(term, PREFIX_PENALTY)
+            pos += 1
+        if not matches and len(token) >= MIN_TYPO_LENGTH:
+            for variant in deletes(token) | {token}:
+                for term in self.delete_map.get(variant, ()):
+                    matches.setdefault(term, TYPO_PENALTY)
+        return matches
+
+    def prefix_postings(self, token: str, max_terms: int = 256) -> list[dict[int, int]]:
+        # postings of every term starting with token, or None when more than
+        # max_terms terms do
+        result = []
+        pos = bisect.bisect_left(self.vocabulary, token)
+        while pos < len(self.vocabulary) and self.vocabulary[pos].startswith(token):
+            if len(result) == max_terms:
+                return None
+            result.append(self.postings[self.vocabulary[pos]])
+            pos += 1
+        return result
+
+    def term_score(self, weight: float, tf: int, length: int, avg_length: float) -> float:
+        # BM25 contribution of one term, weight being its boost times its idf;
+        # never decreases as length shrinks, so a bucket's floor bounds it
+        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+        return weight * tf * (self.k1 + 1) / (tf + norm)
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, float]]:
+        # (recipe id, score) for the best matches, highest score first
+        tokens = tokenize(query)
+        if not tokens or not self.doc_lengths or limit <= 0:
+            return []
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        expanded: dict[str, float] = {}
+        for token in tokens:
+            for term, boost in self.expand(token).items():
+                expanded[term] = max(boost, expanded.get(term, 0.0))
+        # rarest terms first; a term present in most recipes carries almost no
+        # weight, so it only re-scores recipes the rarer terms found
+        ordered = sorted(expanded, key=lambda t: len(self.postings[t]))
+        weights = {}
+        for term in ordered:
+            df = len(self.postings[term])
+            weights[term] = expanded[term] * math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        finders = [t for t in ordered if len(self.postings[t]) <= n_docs * COMMON_TERM_RATIO] or ordered[:1]
+        if not any(term in self.impacts for term in finders):
+            # only short posting lists find recipes: scoring them all is cheapest
+            scores: dict[int, float] = {}
+            for term in ordered:
+                docs = self.postings[term]
+                pairs = docs.items() if term in finders else [(rid, docs[rid]) for rid in scores if rid in docs]
+                weight = weights[term]
+                for rid, tf in pairs:
+                    # term_score, inlined
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rid] / avg_length)
+                    scores[rid] = scores.get(rid, 0.0) + weight * tf * (self.k1 + 1) / (tf + norm)
+            return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+        def score(rid: int) -> float:
+            # summed in the same order as the ceilings below
+            total = 0.0
+            for term in ordered:
+                tf = self.postings[term].get(rid)
+                if tf is not None:
+                    total += self.term_score(weights[term], tf, self.doc_lengths[rid], avg_length)
+            return total
+
+        # the best (score, -recipe id) pairs so far, worst first
+        top: list[tuple[float, int]] = []
+        seen: set[int] = set()
+
+        def offer(rids):
+            for rid in rids:
+                if rid not in seen:
+                    seen.add(rid)
+                    entry = (score(rid), -rid)
+                    if len(top) < limit:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+
+        # the most any term can still add to a recipe not yet scored; bucketed
+        # finders are walked a bucket at a time, from the highest bound down
+        ceilings: dict[str, float] = {}
+        streams: dict[str, list[tuple[float, set[int]]]] = {}
+        for term in ordered:
+            weight = weights[term]
+            buckets = self.impacts.get(term)
+            if buckets is not None:
+                bounds = sorted(((self.term_score(weight, tf, length, avg_length), rids)
+                                 for (tf, length), rids in buckets.items()),
+                                key=lambda bound: bound[0])
+                ceilings[term] = bounds[-1][0]
+                if term in finders:
+                    streams[term] = bounds
+            elif term in finders:
+                offer(self.postings[term])
+                ceilings[term] = 0.0
+            else:
+                ceilings[term] = max(self.term_score(weight, tf, self.doc_lengths[rid], avg_length)
+                                     for rid, tf in self.postings[term].items())
+        while streams:
+            if len(top) == limit:
+                ceiling = 0.0
+                for term in ordered:
+                    ceiling += ceilings[term]
+                if ceiling < top[0][0]:
+                    break
+            term = max(streams, key=ceilings.get)
+            bounds = streams[term]
+            offer(bounds.pop()[1])
+            if bounds:
+                ceilings[term] = bounds[-1][0]
+            else:
+                ceilings[term] = 0.0
+                del streams[term]
+        return [(-neg_rid, value) for value, neg_rid in sorted(top, reverse=True)]
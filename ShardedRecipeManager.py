@@ -0,0 +1,390 @@
+import hashlib
+import heapq
+import math
+import multiprocessing
+import os
+import threading
+import recipejson
+from Recipe import Recipe
+from IngredientFactory import IngredientFactory
+from RecipeManager import RecipeManager
+from RecipeCursor import RecipeCursor
+from SortedIndex import SortedIndex
+
+# records sent to each shard per message while loading or rebalancing
+SHIP_BATCH = 4096
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    # Lamping and Veach's jump consistent hash: when buckets grows from n to
+    # n + 1, only the keys that move to the new bucket change bucket
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (1 << 31) / ((key >> 33) + 1))
+    return b
+
+
+def shard_of(name: str, shards: int) -> int:
+    # stable across processes and runs, unlike hash(); names differing only
+    # in case share a shard, whose manager keeps them unique
+    key = int.from_bytes(hashlib.blake2b(name.casefold().encode("utf-8"), digest_size=8).digest(), "little")
+    return jump_hash(key, shards)
+
+
+# ---------- RecipeShard Class ----------
+# One partition of a sharded catalogue, run in a worker process: a
+# RecipeManager plus each recipe's global add sequence, which the router
+# assigns so merged listings keep the order a single manager would give.
+# Results cross the process boundary as (merge key..., recipe dict) tuples,
+# sorted by their merge key.
+class RecipeShard:
+    def __init__(self):
+        self.manager = RecipeManager()
+        self.seqs: dict[str, int] = {}
+        # (seq, name) of every recipe, for pages in global add order
+        self.order = SortedIndex()
+
+    def size(self) -> int:
+        return self.manager.size()
+
+    def add(self, seq: int, entry: dict):
+        self.manager.add_recipe(recipejson.recipe_from_dict(entry, self.manager.factory))
+        self.seqs[entry["name"]] = seq
+        self.order.add((seq, entry["name"]))
+
+    def add_many(self, entries: list[tuple[int, dict]]) -> int:
+        # (seq, recipe dict) pairs; names already present, in any case, are
+        # skipped
+        added = self.manager.import_recipes(recipejson.recipe_from_dict(e, self.manager.factory)
+                                            for _, e in entries)
+        for seq, entry in entries:
+            if entry["name"] not in self.seqs and entry["name"] in self.manager.recipes:
+                self.seqs[entry["name"]] = seq
+                self.order.add((seq, entry["name"]))
+        return added
+
+    def delete(self, name: str) -> bool:
+        if name not in self.manager.recipes:
+            return False
+        self.manager.delete_recipe(name)
+        self.order.remove((self.seqs.pop(name), name))
+        return True
+
+    def take(self, name: str) -> tuple[int, dict]:
+        # removes a recipe and returns (seq, recipe dict), to be put back
+        # with add if need be
+        entry = self.get(name)
+        seq = self.seqs[name]
+        self.delete(name)
+        return seq, entry
+
+    def contains(self, name: str) -> bool:
+        return name in self.manager.recipes
+
+    def taken(self, name: str, ignore: str) -> bool:
+        return self.manager.name_taken(name, ignore)
+
+    def get(self, name: str) -> dict:
+        return self.manager.get_recipe(name).to_dict()
+
+    def rate(self, name: str, rating: float):
+        self.manager.rate_recipe(name, rating)
+
+    def favourite(self, name: str):
+        self.manager.favourite_recipe(name)
+
+    def search(self, keyword: str, limit: int) -> list[tuple]:
+        # (-score, seq, recipe) for this shard's best matches
+        manager = self.manager
+        found = manager.read(lambda s: [(s.recipe_at(rid), score)
+                                        for rid, score in manager.search_index.search(keyword, limit)])
+        return sorted((-score, self.seqs[r.name], r.to_dict()) for r, score in found)
+
+    def by_name(self, count: int) -> list[tuple]:
+        return [(r.name, self.seqs[r.name], r.to_dict()) for r in self.manager.sort_name(0, count)]
+
+    def by_rating(self, count: int) -> list[tuple]:
+        # Recipes moved here by a rebalance have a smaller seq than their
+        # neighbours' but a larger local id, so ties are broken by seq: the
+        # page takes in every recipe sharing its last rating and is re-sorted.
+        page = self.manager.sort_rating(0, count)
+        if count is not None and len(page) == count and page:
+            by_rating = self.manager.sorter.by_rating
+            tied = self.manager.read(lambda s: by_rating.rank((-page[-1].rating, math.inf)))
+            page = self.manager.sort_rating(0, tied)
+        return sorted((-r.rating, self.seqs[r.name], r.to_dict()) for r in page)[:count]
+
+    def favourites(self, count: int = None) -> list[tuple]:
+        return sorted((self.seqs[r.name], r.to_dict()) for r in self.manager.list_favourites())[:count]
+
+    def favourite_count(self) -> int:
+        return len(self.manager.favourite_ids)
+
+    def find_by_ingredients(self, include_all: list[str], include_any: list[str], exclude: list[str]) -> list[tuple]:
+        found = self.manager.find_by_ingredients(include_all, include_any, exclude)
+        return sorted((self.seqs[r.name], r.to_dict()) for r in found)
+
+    def cook_with(self, pantry: list[str], missing: int) -> list[tuple]:
+        # (missing ingredients, seq, recipe), closest matches first
+        matches = self.manager.cook_with(pantry, missing)
+        return sorted((lacking, self.seqs[r.name], r.to_dict()) for r, lacking in matches)
+
+    def entries(self, count: int = None) -> list[tuple]:
+        # the first count recipes in global add order
+        recipes = self.manager.recipes
+        return [(seq, recipes[name].to_dict()) for seq, name in self.order.slice(0, count)]
+
+    def take_moved(self, index: int, shards: int) -> list[tuple[int, dict]]:
+        # removes and returns the recipes that belong elsewhere once there
+        # are shards shards
+        moved = [r for r in self.manager.list_all() if shard_of(r.name, shards) != index]
+        if moved:
+            self.manager.delete_many([r.name for r in moved])
+        entries = [(self.seqs.pop(r.name), r.to_dict()) for r in moved]
+        for seq, entry in entries:
+            self.order.remove((seq, entry["name"]))
+        return entries
+
+
+def serve_shard(conn):
+    # worker process: runs (method, args) requests on a RecipeShard until
+    # the router closes the pipe
+    shard = RecipeShard()
+    while True:
+        try:
+            method, args = conn.recv()
+        except EOFError:
+            break
+        try:
+            conn.send((True, getattr(shard, method)(*args)))
+        except ValueError as e:
+            conn.send((False, e))
+        except Exception as e:
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+# ---------- ShardedRecipeManager Class ----------
+# A catalogue partitioned by name hash across worker processes, each with its
+# own RecipeManager, so indexing and queries use one core and one heap per
+# shard. RecipeManager's single-recipe calls, search, favourites, the sorted
+# listings and cursors, find_by_ingredients and cook_with work the same:
+# point operations go to the shard owning the name; the rest are sent to
+# every shard at once and the sorted partial results are merged with a k-way
+# heap merge. Batches, RecipeQuery, recommendations, dedup and sync are not
+# sharded. Names are placed by jump consistent hashing, so
+# resize() only moves the recipes whose shard actually changes.
+#
+# Requests are serialized by one lock; the shards still work in parallel on
+# every scattered query. Recipes returned are copies; change them through
+# the manager. A change spanning two shards (an edit that renames a recipe
+# onto another shard) is not atomic. Not journalled: persist with
+# save_to_json.
+class ShardedRecipeManager:
+    def __init__(self, shards: int = None):
+        self.lock = threading.RLock()
+        self.context = multiprocessing.get_context("spawn")
+        self.workers: list[tuple] = []
+        # global add sequence of the next recipe
+        self.next_seq = 0
+        self.factory = IngredientFactory()
+        self.resize(shards or os.cpu_count() or 1)
+
+    def __len__(self) -> int:
+        return self.size()
+
+    # ---------- transport ----------
+
+    def call(self, shard: int, method: str, *args):
+        with self.lock:
+            conn = self.workers[shard][1]
+            conn.send((method, args))
+            return self.result(conn.recv())
+
+    def scatter(self, method: str, args: list[tuple] = None) -> list:
+        # runs method on every shard at once (with args[i] on shard i) and
+        # returns the results in shard order
+        with self.lock:
+            conns = [conn for _, conn in self.workers]
+            for i, conn in enumerate(conns):
+                conn.send((method, args[i] if args is not None else ()))
+            replies = [conn.recv() for conn in conns]
+        return [self.result(reply) for reply in replies]
+
+    @staticmethod
+    def result(reply: tuple):
+        ok, value = reply
+        if not ok:
+            raise value
+        return value
+
+    def recipe(self, entry: dict) -> Recipe:
+        return recipejson.recipe_from_dict(entry, self.factory)
+
+    def shard(self, name: str) -> int:
+        return shard_of(name, len(self.workers))
+
+    # ---------- layout ----------
+
+    def resize(self, shards: int):
+        # Changes the number of worker processes and moves every recipe whose
+        # shard changes. Growing only moves recipes onto the new shards.
+        if shards < 1:
+            raise ValueError("At least one shard is needed")
+        with self.lock:
+            old = len(self.workers)
+            while len(self.workers) < shards:
+                ours, theirs = self.context.Pipe()
+                process = self.context.Process(target=serve_shard, args=(theirs,), daemon=True)
+                process.start()
+                theirs.close()
+                self.workers.append((process, ours))
+            if old:
+                moved = [entry for entries in self.scatter("take_moved", [(i, shards) for i in range(len(self.workers))])
+                         for entry in entries]
+                surplus = self.workers[shards:]
+                self.workers = self.workers[:shards]
+                self.ship(moved)
+                for process, conn in surplus:
+                    conn.close()
+                    process.join()
+
+    def ship(self, entries: list[tuple[int, dict]]):
+        # adds (seq, recipe dict) pairs to their shards, all shards at once
+        for first in range(0, len(entries), SHIP_BATCH * len(self.workers)):
+            batches = [[] for _ in self.workers]
+            for seq, entry in entries[first:first + SHIP_BATCH * len(self.workers)]:
+                batches[self.shard(entry["name"])].append((seq, entry))
+            self.scatter("add_many", [(batch,) for batch in batches])
+
+    def shard_sizes(self) -> list[int]:
+        return self.scatter("size")
+
+    def close(self):
+        with self.lock:
+            for process, conn in self.workers:
+                conn.close()
+                process.join()
+            self.workers = []
+
+    # ---------- RecipeManager API ----------
+
+    def size(self) -> int:
+        return sum(self.shard_sizes())
+
+    def add_recipe(self, recipe: Recipe):
+        with self.lock:
+            self.call(self.shard(recipe.name), "add", self.next_seq, recipe.to_dict())
+            self.next_seq += 1
+
+    def delete_recipe(self, name: str):
+        self.call(self.shard(name), "delete", name)
+
+    def edit_recipe(self, name: str, updated_recipe: Recipe):
+        # the edited recipe moves to the end of the listing, as in
+        # RecipeManager.edit_recipe; if its shard still rejects it, the
+        # original is put back where it was
+        recipejson.validate_entry(updated_recipe.to_dict())
+        with self.lock:
+            if not self.call(self.shard(name), "contains", name):
+                raise ValueError("Recipe not found")
+            if self.call(self.shard(updated_recipe.name), "taken", updated_recipe.name, name):
+                raise ValueError(f"Recipe '{updated_recipe.name}' already exists")
+            seq, original = self.call(self.shard(name), "take", name)
+            try:
+                self.add_recipe(updated_recipe)
+            except ValueError:
+                self.call(self.shard(name), "add", seq, original)
+                raise
+
+    def get_recipe(self, name: str) -> Recipe:
+        return self.recipe(self.call(self.shard(name), "get", name))
+
+    def rate_recipe(self, name: str, rating: float):
+        self.call(self.shard(name), "rate", name, rating)
+
+    def favourite_recipe(self, name: str):
+        self.call(self.shard(name), "favourite", name)
+
+    def search(self, keyword: str, limit: int = 50) -> list[Recipe]:
+        # BM25 scores use each shard's own term statistics, which a random
+        # split keeps close to the whole catalogue's
+        parts = self.scatter("search", [(keyword, limit)] * len(self.workers))
+        return [self.recipe(entry) for *_, entry in heapq.merge(*parts)][:limit]
+
+    def list_favourites(self) -> list[Recipe]:
+        return [self.recipe(entry) for _, entry in heapq.merge(*self.scatter("favourites"))]
+
+    def sort_name(self, start: int = 0, count: int = None) -> list[Recipe]:
+        return self.merged_page("by_name", start, count)
+
+    def sort_rating(self, start: int = 0, count: int = None) -> list[Recipe]:
+        return self.merged_page("by_rating", start, count)
+
+    def top_rated(self, k: int = 20) -> list[Recipe]:
+        return self.sort_rating(0, k)
+
+    def merged_page(self, method: str, start: int, count: int) -> list[Recipe]:
+        # any shard may hold the whole page, so each returns its first
+        # start + count
+        wanted = None if count is None else start + count
+        merged = heapq.merge(*self.scatter(method, [(wanted,)] * len(self.workers)))
+        return [self.recipe(entry) for *_, entry in list(merged)[start:wanted]]
+
+    def find_by_ingredients(self, include_all: list[str] = (), include_any: list[str] = (),
+                            exclude: list[str] = ()) -> list[Recipe]:
+        args = (list(include_all), list(include_any), list(exclude))
+        parts = self.scatter("find_by_ingredients", [args] * len(self.workers))
+        return [self.recipe(entry) for _, entry in heapq.merge(*parts)]
+
+    def cook_with(self, pantry: list[str], missing: int = 0) -> list[tuple[Recipe, int]]:
+        # (recipe, missing ingredient count), closest matches first
+        parts = self.scatter("cook_with", [(list(pantry), missing)] * len(self.workers))
+        return [(self.recipe(entry), lacking) for lacking, _, entry in heapq.merge(*parts)]
+
+    def list_all(self) -> list[Recipe]:
+        return [self.recipe(entry) for _, entry in heapq.merge(*self.scatter("entries"))]
+
+    def cursor(self, order: str = "all") -> RecipeCursor:
+        # paged access to a listing, as RecipeManager.cursor; every order
+        # reads the live shards, and a page is merged from each shard's
+        # first start + count
+        methods = {"all": "entries", "name": "by_name", "rating": "by_rating", "favourites": "favourites"}
+        if order not in methods:
+            raise ValueError(f"Unknown order: {order}")
+        total = sum(self.scatter("favourite_count")) if order == "favourites" else self.size()
+        return RecipeCursor(lambda start, count: self.merged_page(methods[order], start, count), total)
+
+    def load_from_json(self, path: str) -> list:
+        # Streams path and ships valid records to their shards in batches.
+        # Bad records are reported and skipped, as in RecipeManager.
+        errors = []
+        with self.lock:
+            pending = []
+            try:
+                with open(path, "rb") as f:
+                    for index, offset, entry in recipejson.iter_json_records(f, errors):
+                        try:
+                            recipejson.validate_entry(entry)
+                        except ValueError as e:
+                            errors.append(recipejson.RecordError(index, offset, str(e)))
+                            continue
+                        pending.append((self.next_seq, entry))
+                        self.next_seq += 1
+                        if len(pending) == SHIP_BATCH * len(self.workers):
+                            self.ship(pending)
+                            pending = []
+            except OSError as e:
+                print(f"Error loading recipes from JSON: {e}")
+            self.ship(pending)
+        for error in errors:
+            print(f"Skipping malformed {error}")
+        return errors
+
+    def save_to_json(self, path: str):
+        entries = heapq.merge(*self.scatter("entries"))
+        try:
+            recipejson.dump_recipes(path, (self.recipe(entry) for _, entry in entries))
+        except OSError as e:
+            print(f"Error saving recipes to JSON: {e}")
@@ -0,0 +1,115 @@
+from bisect import bisect_left, bisect_right, insort
+
+# ---------- SortedIndex Class ----------
+# Sorted collection of unique, comparable keys kept as a list of bounded
+# buckets. Inserts and removals bisect to the right bucket and shift at most
+# one bucket, and positional slices skip whole buckets, so a listing page
+# never has to touch the whole index.
+class SortedIndex:
+    def __init__(self, load: int = 512):
+        self.load = load
+        self.buckets: list[list] = []
+        # largest key of each bucket, for bisecting to the right bucket
+        self.maxes: list = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        for bucket in self.buckets:
+            yield from bucket
+
+    def add(self, key):
+        self.size += 1
+        if not self.buckets:
+            self.buckets.append([key])
+            self.maxes.append(key)
+            return
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            i -= 1
+            self.buckets[i].append(key)
+            self.maxes[i] = key
+        else:
+            insort(self.buckets[i], key)
+        bucket = self.buckets[i]
+        if len(bucket) > 2 * self.load:
+            half = bucket[self.load:]
+            del bucket[self.load:]
+            self.buckets.insert(i + 1, half)
+            self.maxes[i] = bucket[-1]
+            self.maxes.insert(i + 1, half[-1])
+
+    def remove(self, key):
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            raise KeyError(key)
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, key)
+        if bucket[j] != key:
+            raise KeyError(key)
+        del bucket[j]
+        self.size -= 1
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+
+    def update(self, removed: list, added: list):
+        # Removes and adds many keys. A batch that is large next to the index
+        # rebuilds the buckets from one sort instead of shifting them a key at
+        # a time.
+        if len(removed) + len(added) < self.size // 8:
+            for key in removed:
+                self.remove(key)
+            for key in added:
+                self.add(key)
+            return
+        gone = set(removed)
+        keys = [key for key in self if key not in gone]
+        if len(keys) != self.size - len(gone):
+            raise KeyError("removed keys missing from the index")
+        keys += added
+        keys.sort()
+        self.buckets = [keys[i:i + self.load] for i in range(0, len(keys), self.load)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.size = len(keys)
+
+    def slice(self, start: int = 0, stop: int = None) -> list:
+        if stop is None or stop > self.size:
+            stop = self.size
+        result = []
+        pos = 0
+        for bucket in self.buckets:
+            if pos + len(bucket) <= start:
+                pos += len(bucket)
+                continue
+            if pos >= stop:
+                break
+            result += bucket[max(start - pos, 0):stop - pos]
+            pos += len(bucket)
+        return result
+
+    def scan(self, start: int = 0, stop: int = None):
+        # like slice, but yields keys one at a time so a caller can stop early
+        if stop is None or stop > self.size:
+            stop = self.size
+        pos = 0
+        for bucket in self.buckets:
+            if pos + len(bucket) <= start:
+                pos += len(bucket)
+                continue
+            if pos >= stop:
+                break
+            yield from bucket[max(start - pos, 0):stop - pos]
+            pos += len(bucket)
+
+    def rank(self, key, right: bool = False) -> int:
+        # number of keys below key (or up to and including it, if right)
+        find = bisect_right if right else bisect_left
+        i = find(self.maxes, key)
+        if i == len(self.maxes):
+            return self.size
+        return sum(len(b) for b in self.buckets[:i]) + find(self.buckets[i], key)
@@ -1,6 +1,43 @@
+import heapq
+import random
 from Recipe import Recipe
+from SortedIndex import SortedIndex
+
 # ---------- Sorter Class ----------
+# The static methods sort any list of recipes. A Sorter instance also keeps
+# name and rating orderings of a catalogue up to date as recipes are added,
+# removed and re-rated, so sorted listings are read rather than recomputed.
 class Sorter:
+    def __init__(self):
+        # (name, recipe id) and (-rating, recipe id); the id breaks ties in
+        # insertion order
+        self.by_name = SortedIndex()
+        self.by_rating = SortedIndex()
+
+    def add(self, recipe_id: int, recipe: Recipe):
+        self.by_name.add((recipe.name, recipe_id))
+        self.by_rating.add((-recipe.rating, recipe_id))
+
+    def remove(self, recipe_id: int, recipe: Recipe):
+        self.by_name.remove((recipe.name, recipe_id))
+        self.by_rating.remove((-recipe.rating, recipe_id))
+
+    def rerate(self, recipe_id: int, old_rating: float, new_rating: float):
+        self.by_rating.remove((-old_rating, recipe_id))
+        self.by_rating.add((-new_rating, recipe_id))
+
+    def rerate_many(self, changes: list[tuple[int, float, float]]):
+        # (recipe id, old rating, new rating) for a batch of recipes
+        self.by_rating.update([(-old, rid) for rid, old, _ in changes], [(-new, rid) for rid, _, new in changes])
+
+    def name_order(self, start: int = 0, count: int = None) -> list[int]:
+        stop = None if count is None else start + count
+        return [rid for _, rid in self.by_name.slice(start, stop)]
+
+    def rating_order(self, start: int = 0, count: int = None) -> list[int]:
+        stop = None if count is None else start + count
+        return [rid for _, rid in self.by_rating.slice(start, stop)]
+
     @staticmethod
     def sort_name(recipes: list[Recipe]) -> list[Recipe]:
         return sorted(recipes, key=lambda r: r.name)
@@ -10,8 +47,10 @@ class Sorter:
         return sorted(recipes, key=lambda r: r.rating, reverse=True)
 
     @staticmethod
-    def sort_random(recipes: list[Recipe]) -> list[Recipe]:
-        import random
-        random.shuffle(recipes)
-        return recipes
+    def top_rated(recipes: list[Recipe], k: int) -> list[Recipe]:
+        return heapq.nlargest(k, recipes, key=lambda r: r.rating)
 
+    @staticmethod
+    def sort_random(recipes: list[Recipe], seed: int = None) -> list[Recipe]:
+        # returns a shuffled copy; the same seed gives the same order
+        return random.Random(seed).sample(recipes, len(recipes))
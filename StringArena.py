@@ -0,0 +1,33 @@
+# ---------- StringArena Class ----------
+# Stores lists of strings as UTF-8 text packed into shared chunks. A list is
+# one run of NUL-terminated entries, referred to by its chunk plus a single
+# int packing the run's offset and byte length, instead of a list object and
+# a str object per entry. Chunks are plain bytearrays, so a chunk is freed
+# as soon as nothing refers to any run in it.
+class StringArena:
+    LENGTH_BITS = 24
+
+    def __init__(self, chunk_size: int = 1 << 16):
+        self.chunk_size = chunk_size
+        self.chunk = bytearray()
+
+    def add(self, strings: list[str]) -> tuple[bytearray, int]:
+        if not strings:
+            return None, 0
+        encoded = "".join(s + "\0" for s in strings).encode("utf-8")
+        if len(encoded) >= 1 << self.LENGTH_BITS:
+            raise ValueError("text too long for the arena")
+        if len(self.chunk) + len(encoded) > self.chunk_size:
+            self.chunk = bytearray()
+        chunk = self.chunk
+        offset = len(chunk)
+        chunk += encoded
+        return chunk, (offset << self.LENGTH_BITS) | len(encoded)
+
+    @staticmethod
+    def get(chunk: bytearray, ref: int) -> list[str]:
+        length = ref & ((1 << StringArena.LENGTH_BITS) - 1)
+        if not length:
+            return []
+        offset = ref >> StringArena.LENGTH_BITS
+        return chunk[offset:offset + length - 1].decode("utf-8").split("\0")
@@ -1,12 +1,17 @@
 from Recipe import Recipe
 from RecipeBuilder import RecipeBuilder
 from IngredientFactory import IngredientFactory
+from RecipeCursor import RecipeCursor
+import sys
+
+PAGE_SIZE = 20
 
 # ---------- TerminalUI Class ----------
 class TerminalUI:
-    def __init__(self):
-        print(list[Recipe])
-    def show_menu(self):
+    def show_menu(self, status: str = None):
+        # status, if given, is shown above the menu, e.g. loading progress
+        if status:
+            print(status)
         print("""
         1. Add Recipe
         2. View Recipe
@@ -17,6 +22,9 @@ class TerminalUI:
         7. Favourite Recipe
         8. Rate Recipe
         9. List Favourites
+        r. Recommend Recipes
+        s. Show Timing Stats
+        p. Profile Next Action
         0. Exit
         """)
 
@@ -29,24 +37,69 @@ class TerminalUI:
     def display_message(self, message: str):
         print(message)
 
-    def display_recipe_names(self, recipes: list[Recipe]):
-        if not recipes:
-            self.display_message("No recipes found.")
-            return None
+    def display_recipe_names(self, recipes, page_size: int = PAGE_SIZE):
+        # Pages through a list or RecipeCursor. Only the page on screen is
+        # fetched, and each page is printed with a single write.
+        cursor = recipes if isinstance(recipes, RecipeCursor) else RecipeCursor.from_list(recipes)
+        page = 0
+        while True:
+            items, text, has_next = self.render_page(cursor, page, page_size)
+            if not items:
+                if page == 0:
+                    self.display_message("No recipes found.")
+                    return None
+                page -= 1
+                continue
+            sys.stdout.write(text)
+            sys.stdout.flush()
 
-        for idx, recipe in enumerate(recipes):
-            print(f"{idx + 1}. {recipe.name}")
+            choice = self.get_input(
+                "Select a recipe number to view, n/p for next/previous page, "
+                "j <page> to jump, or 0 to cancel: ").strip().lower()
+            if choice == "n":
+                if has_next:
+                    page += 1
+            elif choice == "p":
+                page = max(0, page - 1)
+            elif choice.startswith("j"):
+                try:
+                    page = max(0, int(choice[1:]) - 1)
+                    if cursor.total is not None:
+                        page = min(page, max(0, (cursor.total - 1) // page_size))
+                except ValueError:
+                    self.display_message("Usage: j <page number>")
+            elif choice.isdigit():
+                number = int(choice)
+                if number == 0:
+                    return None
+                selected = cursor.fetch(number - 1, 1)
+                if selected:
+                    return selected[0]
+                self.display_message("No recipe with that number.")
+            else:
+                self.display_message("Invalid option. Please try again.")
 
-        choice = int(self.get_input("Select a recipe number to view or 0 to cancel: "))
-        if choice == 0:
-            return None
-        return recipes[choice - 1]
+    def render_page(self, cursor: RecipeCursor, page: int, page_size: int) -> tuple[list[Recipe], str, bool]:
+        # (recipes on the page, the text to print, whether a next page exists)
+        start = page * page_size
+        # one extra item tells whether a next page exists when the total is
+        # unknown
+        items = cursor.fetch(start, page_size + 1)
+        has_next = len(items) > page_size
+        items = items[:page_size]
+        lines = [f"{start + idx + 1}. {recipe.name}" for idx, recipe in enumerate(items)]
+        if cursor.total is not None:
+            pages = max(1, -(-cursor.total // page_size))
+            lines.append(f"-- Page {page + 1} of {pages} ({cursor.total} recipes) --")
+        else:
+            lines.append(f"-- Page {page + 1} --")
+        return items, "\n".join(lines) + "\n", has_next
 
     def prompt_for_recipe(self) -> Recipe:
         name = self.get_input("Enter recipe name: ")
         ing_names = self.get_input("Enter ingredients (comma-separated): ").split(',')
-        factory = IngredientFactory()
-        ingredients = [factory.get_ingredient(name.strip()) for name in ing_names]
+        # the factory shares the process-wide registry with the loaded catalogue
+        ingredients = IngredientFactory().get_many([n for n in ing_names if n.strip()])
 
         builder = RecipeBuilder()
         builder.add_name(name)
@@ -0,0 +1,53 @@
+import argparse
+import os
+import tempfile
+import time
+
+import recipecli
+from IngredientFactory import IngredientFactory
+from RecipeManager import RecipeManager
+from benchmarks.synthetic import write_json
+
+
+# Throughput of the parallel loader by worker count. "parse" only builds the
+# recipes, which is the part spread over the pool; "import" also indexes them
+# in the main process.
+def parse(path: str, workers: int, chunk_bytes: int) -> int:
+    count = 0
+    for _ in recipecli.iter_recipes(path, IngredientFactory(), [], workers, chunk_bytes):
+        count += 1
+    return count
+
+
+def load(path: str, workers: int, chunk_bytes: int) -> int:
+    manager = RecipeManager()
+    return manager.import_recipes(recipecli.iter_recipes(path, manager.factory, [], workers, chunk_bytes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel import throughput by worker count")
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--chunk-bytes", type=int, default=recipecli.CHUNK_BYTES)
+    parser.add_argument("--skip-import", action="store_true", help="only time parsing")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'phase':>7} {'workers':>8} {'seconds':>8} {'recipes/s':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recipes.json")
+        write_json(path, args.size)
+        phases = [("parse", parse)] if args.skip_import else [("parse", parse), ("import", load)]
+        for label, fn in phases:
+            baseline = None
+            for workers in args.workers:
+                start = time.perf_counter()
+                count = fn(path, workers, args.chunk_bytes)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(f"{label:>7} {workers:>8} {elapsed:>8.2f} {count / elapsed:>10.0f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
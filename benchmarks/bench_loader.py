@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import recipejson
+from IngredientFactory import IngredientFactory
+from benchmarks.synthetic import write_json
+
+
+# Compares peak traced memory of json.load against the streaming loader. The
+# streaming numbers should stay flat as the file grows.
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def load_whole(path: str) -> int:
+    with open(path) as f:
+        return len(json.load(f))
+
+
+def load_streaming(path: str) -> int:
+    count = 0
+    for _ in recipejson.iter_recipes(path, IngredientFactory()):
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of whole-file vs streaming JSON loading")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--skip-whole", action="store_true", help="only run the streaming loader")
+    args = parser.parse_args()
+
+    print(f"{'recipes':>10} {'file MB':>8} {'loader':>10} {'seconds':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"recipes_{size}.json")
+            write_json(path, size)
+            file_mb = os.path.getsize(path) / 1e6
+            loaders = [("streaming", load_streaming)]
+            if not args.skip_whole:
+                loaders.insert(0, ("json.load", load_whole))
+            for label, loader in loaders:
+                count, elapsed, peak = measure(lambda: loader(path))
+                print(f"{count:>10} {file_mb:>8.1f} {label:>10} {elapsed:>8.2f} {peak / 1e6:>8.2f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import gc
+import tracemalloc
+
+from Recipe import Recipe
+from IngredientFactory import IngredientFactory
+from benchmarks.synthetic import generate_entries
+
+
+# The layout Recipe and Ingredient had before __slots__, id arrays and the
+# step arena, kept here as the baseline.
+class LegacyIngredient:
+    def __init__(self, name: str, tags: list[str]):
+        self.name = name
+        self.tags = tags
+
+
+class LegacyRecipe:
+    def __init__(self, name, ingredients, steps, rating, is_favourite):
+        self.name = name
+        self.ingredients = ingredients
+        self.steps = steps
+        self.rating = rating
+        self.is_favourite = is_favourite
+
+
+def build_legacy(entries) -> list:
+    ingredients = {}
+    recipes = []
+    for e in entries:
+        ings = [ingredients.setdefault(n, LegacyIngredient(n, [])) for n in e["ingredients"]]
+        recipes.append(LegacyRecipe(e["name"], ings, list(e["steps"]), e["rating"], e["is_favourite"]))
+    return recipes
+
+
+def build_compact(entries) -> list:
+    factory = IngredientFactory()
+    return [Recipe(e["name"], [factory.get_ingredient(n) for n in e["ingredients"]],
+                   e["steps"], e["rating"], e["is_favourite"]) for e in entries]
+
+
+def bytes_per_recipe(build, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    # both layouts retain the same name strings, so the difference is layout
+    recipes = build(generate_entries(count))
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del recipes
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retained bytes per recipe, legacy vs compact layout")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+    legacy = bytes_per_recipe(build_legacy, args.count)
+    compact = bytes_per_recipe(build_compact, args.count)
+    print(f"{args.count} recipes")
+    print(f"  legacy  {legacy:8.1f} bytes/recipe")
+    print(f"  compact {compact:8.1f} bytes/recipe ({compact / legacy:.0%} of legacy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import random
+import statistics
+import time
+
+from IngredientFactory import IngredientFactory
+from Recipe import Recipe
+from Recommender import Recommender
+from benchmarks.synthetic import generate_entries
+
+
+# Recommendation latency on large synthetic catalogues, exact (a bincount
+# over the query's postings) against approximate (MinHash LSH candidates),
+# with the approximate top k's recall of the exact one. The Recommender is
+# fed directly, without a RecipeManager, so millions of recipes fit; steps
+# are left out as they play no part in similarity.
+#
+#   python -m benchmarks.bench_recommend --sizes 100000 1000000
+def build(size: int, seed: int) -> tuple[Recommender, list[Recipe]]:
+    recipes = [Recipe.from_ids(e["name"], IngredientFactory.get_ids(e["ingredients"]), [], e["rating"],
+                               e["is_favourite"])
+               for e in generate_entries(size, seed)]
+    recommender = Recommender()
+    recommender.add_many(enumerate(recipes))
+    return recommender, recipes
+
+
+def timed(fn) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact vs LSH recommendation latency and recall")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'recipes':>9} {'build s':>8} {'minhash s':>9} {'mode':>7} {'p50 ms':>8} {'p99 ms':>8} {'recall':>7}")
+    for size in args.sizes:
+        build_seconds, (recommender, recipes) = timed(lambda: build(size, args.seed))
+        minhash_seconds, _ = timed(lambda: recommender.build_minhash(enumerate(recipes)))
+        rnd = random.Random(args.seed)
+        queries = rnd.sample(range(size), min(args.queries, size))
+        exact_times, lsh_times, recalls = [], [], []
+        for rid in queries:
+            weights = dict.fromkeys(recipes[rid].ingredient_ids, 1.0)
+            seconds, exact = timed(lambda: recommender.recommend(weights, args.k, exclude=(rid,)))
+            exact_times.append(seconds)
+            seconds, approximate = timed(lambda: recommender.recommend(
+                weights, args.k, exclude=(rid,), approximate=True,
+                rows=lambda r: recipes[r].ingredient_ids))
+            lsh_times.append(seconds)
+            wanted = {r for r, _ in exact}
+            if wanted:
+                recalls.append(len(wanted & {r for r, _ in approximate}) / len(wanted))
+        for mode, times in (("exact", exact_times), ("lsh", lsh_times)):
+            times.sort()
+            recall = f"{statistics.mean(recalls):>7.2f}" if mode == "lsh" and recalls else f"{'':>7}"
+            print(f"{size:>9} {build_seconds:>8.1f} {minhash_seconds:>9.1f} {mode:>7} "
+                  f"{statistics.median(times) * 1e3:>8.2f} {times[int(0.99 * (len(times) - 1))] * 1e3:>8.2f} {recall}")
+
+
+if __name__ == "__main__":
+    main()
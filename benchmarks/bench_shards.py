@@ -0,0 +1,78 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from RecipeManager import RecipeManager
+from ShardedRecipeManager import ShardedRecipeManager
+from benchmarks.synthetic import write_json
+
+
+# Query throughput of the sharded catalogue by shard count, next to a single
+# in-process RecipeManager. Scattered queries (search, the sorted pages, the
+# ingredient filter) split their work across the shard processes, so they
+# should speed up with shards up to the number of CPUs; point lookups go to
+# one shard and mostly measure the pipe round trip.
+def workload(manager, queries: int, words: list[str], names: list[str], ingredients: list[str]) -> dict:
+    rng = random.Random(7)
+    timings = {}
+    kinds = [
+        ("search", lambda: manager.search(rng.choice(words), 20)),
+        ("top_rated", lambda: manager.top_rated(20)),
+        ("sort_name", lambda: manager.sort_name(rng.randrange(1000), 20)),
+        ("ingredients", lambda: manager.find_by_ingredients([rng.choice(ingredients)], [], [])),
+        ("get", lambda: manager.get_recipe(rng.choice(names))),
+    ]
+    for label, fn in kinds:
+        start = time.perf_counter()
+        for _ in range(queries):
+            fn()
+        timings[label] = queries / (time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded catalogue query throughput by shard count")
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--shards", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.size} recipes, {args.queries} queries per kind")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recipes.json")
+        write_json(path, args.size)
+
+        single = RecipeManager()
+        start = time.perf_counter()
+        single.load_from_json(path)
+        loaded = time.perf_counter() - start
+        sample = single.list_all()[::max(1, args.size // 1000)]
+        names = [r.name for r in sample]
+        words = sorted({w for name in names for w in name.lower().split()})
+        ingredients = sorted({i for r in sample for i in r.ingredient_names()})
+        rows = [("single", loaded, workload(single, args.queries, words, names, ingredients))]
+        del single
+
+        for shards in args.shards:
+            manager = ShardedRecipeManager(shards)
+            try:
+                start = time.perf_counter()
+                manager.load_from_json(path)
+                loaded = time.perf_counter() - start
+                rows.append((f"{shards} shards", loaded, workload(manager, args.queries, words, names, ingredients)))
+            finally:
+                manager.close()
+
+    kinds = list(rows[0][2])
+    print(f"{'layout':>10} {'load s':>7} " + " ".join(f"{k + ' q/s':>15}" for k in kinds))
+    baseline = next((r for r in rows if r[0] == f"{min(args.shards)} shards"), rows[0])[2]
+    for label, loaded, timings in rows:
+        print(f"{label:>10} {loaded:>7.2f} "
+              + " ".join(f"{timings[k]:>9.0f} x{timings[k] / baseline[k]:<4.2f}" for k in kinds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from CatalogueColumns import CatalogueColumns, pack_strings
+from RecipeManager import RecipeManager
+from benchmarks.synthetic import ZIPF_EXPONENT, ingredient_vocabulary, write_json
+
+TAGS = ["vegan", "vegetarian", "dairy", "gluten", "nut", "spicy", "sweet", "savoury", "seafood", "meat",
+        "herb", "grain"]
+
+
+# Report time on catalogue columns against the loop it replaces. "loop"
+# walks RecipeManager.list_all() and ingredient names for the average rating
+# per ingredient on a catalogue loaded from JSON, and "columns" builds the
+# columns of the same catalogue and groups them. The large run synthesizes
+# columns directly (building millions of Recipe objects first would dwarf
+# the report), saves them as .npz and reports on the memory mapped file.
+def synthetic_columns(size: int, seed: int = 0) -> CatalogueColumns:
+    rng = np.random.default_rng(seed)
+    vocabulary = ingredient_vocabulary()
+    weights = 1 / np.arange(1, len(vocabulary) + 1) ** ZIPF_EXPONENT
+    lengths = rng.integers(3, 11, size)
+    indptr = np.zeros(size + 1, np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    # ingredients may repeat within a recipe here, which changes nothing
+    # about the cost
+    indices = rng.choice(len(vocabulary), indptr[-1], p=weights / weights.sum()).astype(np.uint32)
+    tag_lengths = rng.integers(0, 3, len(vocabulary))
+    tag_indptr = np.zeros(len(vocabulary) + 1, np.int64)
+    np.cumsum(tag_lengths, out=tag_indptr[1:])
+    arrays = {
+        "ratings": rng.integers(0, 51, size) / 10,
+        "favourites": rng.random(size) < 0.1,
+        "indptr": indptr,
+        "indices": indices,
+        "tag_indptr": tag_indptr,
+        "tag_indices": rng.integers(0, len(TAGS), tag_indptr[-1]).astype(np.int32),
+    }
+    arrays["name_data"], arrays["name_offsets"] = pack_strings(f"recipe {i}" for i in range(size))
+    arrays["ingredient_data"], arrays["ingredient_offsets"] = pack_strings(vocabulary)
+    arrays["tag_data"], arrays["tag_offsets"] = pack_strings(TAGS)
+    return CatalogueColumns(arrays)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def loop_report(manager: RecipeManager) -> dict:
+    counts, sums = defaultdict(int), defaultdict(float)
+    for recipe in manager.list_all():
+        for ingredient in {i.get_name() for i in recipe.ingredients}:
+            counts[ingredient] += 1
+            sums[ingredient] += recipe.rating
+    return {name: sums[name] / counts[name] for name in counts}
+
+
+def reports(columns: CatalogueColumns):
+    columns.top("ingredient", "rating", "mean", 20, 100)
+    columns.top("tag", "favourite", "mean", 20)
+    columns.top("ingredient", "rating", "count", 20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized catalogue reports against a Python loop")
+    parser.add_argument("--compare", type=int, default=100000, help="recipes for the loop comparison")
+    parser.add_argument("--size", type=int, default=10000000, help="recipes in the synthesized columns")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recipes.json")
+        write_json(path, args.compare)
+        manager = RecipeManager()
+        manager.load_from_json(path)
+        expected, loop_time = timed(lambda: loop_report(manager))
+        columns, build_time = timed(manager.columns)
+        (counts, means), group_time = timed(lambda: columns.group_by("ingredient", "rating"))
+        same = all(abs(means[manager.factory.lookup_id(name)] - mean) < 1e-4 for name, mean in expected.items())
+        print(f"{args.compare} recipes, average rating per ingredient (results agree: {same})")
+        print(f"  loop over list_all      {loop_time:8.2f}s")
+        print(f"  build columns           {build_time:8.2f}s")
+        print(f"  group_by on columns     {group_time:8.2f}s")
+        del manager, columns
+
+        columns, build_time = timed(lambda: synthetic_columns(args.size))
+        npz = os.path.join(tmp, "columns.npz")
+        _, save_time = timed(lambda: columns.save(npz))
+        del columns
+        mapped, load_time = timed(lambda: CatalogueColumns.load(npz))
+        print(f"{args.size} synthesized recipes, {os.path.getsize(npz) / 2 ** 20:.0f} MiB .npz")
+        print(f"  synthesize              {build_time:8.2f}s")
+        print(f"  save                    {save_time:8.2f}s")
+        print(f"  load (memory mapped)    {load_time:8.2f}s")
+        for label, fn in [("summary", mapped.summary),
+                          ("rating by ingredient", lambda: mapped.group_by("ingredient", "rating")),
+                          ("favourites by tag", lambda: mapped.group_by("tag", "favourite")),
+                          ("three top-20 reports", lambda: reports(mapped))]:
+            _, elapsed = timed(fn)
+            print(f"  {label:<23} {elapsed:8.2f}s")
+        del mapped
+
+
+if __name__ == "__main__":
+    main()
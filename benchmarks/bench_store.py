@@ -0,0 +1,64 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from BinaryRecipeStore import BinaryRecipeStore, json_to_store
+from benchmarks.synthetic import write_json
+
+# Each measurement runs in a fresh interpreter so RSS reflects only the
+# catalogue being opened.
+PROBE = """
+import sys, time
+start = time.perf_counter()
+if sys.argv[1] == "store":
+    from BinaryRecipeStore import BinaryRecipeStore
+    catalogue = BinaryRecipeStore(sys.argv[2])
+else:
+    from RecipeManager import RecipeManager
+    catalogue = RecipeManager()
+    catalogue.load_from_json(sys.argv[2])
+opened = time.perf_counter() - start
+for name in sys.argv[3:]:
+    catalogue.get_recipe(name).display()
+with open("/proc/self/statm") as f:
+    pages = f.read().split()
+# resident pages that are not file-backed, i.e. not the mapped store itself
+rss = (int(pages[1]) - int(pages[2])) * 4096
+print(opened, rss)
+"""
+
+
+def probe(kind: str, path: str, names: list[str]) -> tuple[float, int]:
+    out = subprocess.run([sys.executable, "-c", PROBE, kind, path, *names],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open time and private RSS of JSON vs binary store")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--skip-json", action="store_true", help="only measure the binary store")
+    args = parser.parse_args()
+
+    print(f"{'recipes':>10} {'format':>7} {'open s':>8} {'anon MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            json_path = os.path.join(tmp, "recipes.json")
+            store_path = os.path.join(tmp, "recipes.rcs")
+            write_json(json_path, size)
+            json_to_store(json_path, store_path)
+            store = BinaryRecipeStore(store_path)
+            names = [store[i].name for i in random.Random(size).sample(range(size), min(size, 20))]
+            store.close()
+            kinds = [("store", store_path)] if args.skip_json else [("json", json_path), ("store", store_path)]
+            for kind, path in kinds:
+                opened, rss = probe(kind, path, names)
+                print(f"{size:>10} {kind:>7} {opened:>8.3f} {rss / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+from benchmarks.synthetic import generate_entries, ingredient_vocabulary, write_json
+
+# Drives a RecipeServer with concurrent keep-alive clients and reports
+# latency percentiles per endpoint. Without --url a server is started in a
+# separate process on a synthetic catalogue, so client and server do not share
+# an event loop.
+
+
+# ---------- HttpClient Class ----------
+# Minimal HTTP/1.1 client holding one keep-alive connection.
+class HttpClient:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, body=None) -> tuple[int, object]:
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n")
+        self.writer.write(head.encode("latin-1") + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            payload = bytearray()
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                payload += chunk[:-2]
+        else:
+            payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        return status, json.loads(payload) if payload else None
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def make_requests(names: list[str], write_ratio: float, seed: int):
+    # endless (label, method, path, body) mix of reads with some writes
+    rnd = random.Random(seed)
+    words = ["pasta", "curry", "spicy", "lemon", "soup", "olive oil", "garlic"]
+    staples = ingredient_vocabulary()[:200]
+    while True:
+        name = quote(rnd.choice(names), safe="")
+        if rnd.random() < write_ratio:
+            if rnd.random() < 0.5:
+                yield "rate", "POST", f"/recipes/{name}/rating", {"rating": round(rnd.uniform(0, 5), 1)}
+            else:
+                yield "favourite", "POST", f"/recipes/{name}/favourite", None
+            continue
+        kind = rnd.random()
+        if kind < 0.4:
+            yield "get", "GET", f"/recipes/{name}", None
+        elif kind < 0.7:
+            yield "search", "GET", f"/search?q={quote(rnd.choice(words))}&count=20", None
+        elif kind < 0.9:
+            order = rnd.choice(["all", "name", "rating"])
+            yield "list", "GET", f"/recipes?order={order}&start={rnd.randrange(len(names))}&count=50", None
+        else:
+            pantry = ",".join(rnd.sample(staples, 30))
+            yield "cook", "GET", f"/cook?pantry={quote(pantry)}&missing=2", None
+
+
+async def worker(host: str, port: int, requests, deadline: float, latencies: dict, failures: list):
+    client = HttpClient(host, port)
+    await client.connect()
+    try:
+        while time.perf_counter() < deadline:
+            label, method, path, body = next(requests)
+            start = time.perf_counter()
+            status, _ = await client.request(method, path, body)
+            latencies.setdefault(label, []).append(time.perf_counter() - start)
+            if status >= 500:
+                failures.append((label, status))
+    finally:
+        await client.close()
+
+
+async def run(host: str, port: int, names: list[str], args) -> tuple[dict, list, float]:
+    latencies: dict[str, list[float]] = {}
+    failures = []
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, make_requests(names, args.write_ratio, i), deadline,
+                                  latencies, failures)
+                           for i in range(args.connections)))
+    return latencies, failures, time.perf_counter() - start
+
+
+def start_server(tmp: str, size: int) -> tuple[subprocess.Popen, int]:
+    path = os.path.join(tmp, "recipes.json")
+    write_json(path, size)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, os.path.join(root, "RecipeServer.py"), path, "--port", "0"],
+                               stdout=subprocess.PIPE, text=True, cwd=root)
+    # "Serving N recipes on http://host:port"
+    line = process.stdout.readline()
+    return process, int(line.rsplit(":", 1)[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of the recipe API under concurrent load")
+    parser.add_argument("--url", help="host:port of a running server (default: start one)")
+    parser.add_argument("--size", type=int, default=100000, help="recipes in the started server's catalogue")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        if args.url:
+            host, port = args.url.rsplit(":", 1)
+            port = int(port)
+        else:
+            process, port = start_server(tmp, args.size)
+            host = "127.0.0.1"
+        try:
+            names = [e["name"] for e in generate_entries(args.size)]
+            latencies, failures, elapsed = asyncio.run(run(host, port, names, args))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requests over {args.connections} connections in {elapsed:.1f}s "
+          f"({total / elapsed:.0f} req/s), {len(failures)} server errors")
+    print(f"{'endpoint':>10} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = []
+    for label in sorted(latencies):
+        values = sorted(latencies[label])
+        everything += values
+        print(f"{label:>10} {len(values):>7} {percentile(values, 50) * 1e3:>8.2f} "
+              f"{percentile(values, 99) * 1e3:>8.2f} {values[-1] * 1e3:>8.2f}")
+    everything.sort()
+    print(f"{'all':>10} {len(everything):>7} {percentile(everything, 50) * 1e3:>8.2f} "
+          f"{percentile(everything, 99) * 1e3:>8.2f} {everything[-1] * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
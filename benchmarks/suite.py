@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import Recipe as recipe_module
+from RecipeManager import RecipeManager
+from Sorter import Sorter
+from benchmarks.synthetic import ingredient_vocabulary, write_json
+
+# Times the catalogue operations the app relies on at several catalogue sizes.
+# Each benchmark is timed over several runs (the median is kept) and run once
+# more under tracemalloc for peak memory; net_blocks is the change in live
+# allocated blocks across that run. Results can be written to JSON and
+# compared against a stored baseline. The startup benchmark launches the app
+# and fails the run if its first menu takes longer than STARTUP_BUDGET.
+#
+#   python -m benchmarks.suite --sizes 1000 10000 --output results.json
+#   python -m benchmarks.suite --baseline benchmarks/baseline.json
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Main.py")
+LOOKUPS = 10000
+QUERIES = 200
+RENDERS = 1000
+PAGES = 200
+# results this small are dominated by noise and are not compared
+MIN_COMPARED_SECONDS = 1e-3
+MIN_COMPARED_BYTES = 1 << 16
+# seconds from launching the app to its first menu, at any catalogue size
+STARTUP_BUDGET = 0.1
+
+
+# ---------- Context Class ----------
+# Everything a benchmark needs for one catalogue size, built once.
+class Context:
+    def __init__(self, size: int, tmp: str, seed: int = 0):
+        self.size = size
+        self.json_path = os.path.join(tmp, f"recipes_{size}.json")
+        self.out_path = os.path.join(tmp, f"saved_{size}.json")
+        write_json(self.json_path, size, seed)
+        # a working directory for the app, holding the catalogue it opens
+        self.app_dir = os.path.join(tmp, f"app_{size}")
+        os.makedirs(self.app_dir, exist_ok=True)
+        shutil.copy(self.json_path, os.path.join(self.app_dir, "sample_recipes.json"))
+        self.manager = RecipeManager()
+        self.manager.load_from_json(self.json_path)
+        self.recipes = self.manager.list_all()
+        rnd = random.Random(seed)
+        self.names = [rnd.choice(self.recipes).name for _ in range(LOOKUPS)]
+        words = ["pasta", "curry", "spicy", "lemon", "soup", "smoked", "chicken", "roasted garlic"]
+        staples = ingredient_vocabulary()[:100]
+        self.queries = [" ".join(rnd.sample(words + staples, rnd.randint(1, 3))) for _ in range(QUERIES)]
+        self.shown = [rnd.choice(self.recipes) for _ in range(RENDERS)]
+        self.starts = [rnd.randrange(size) for _ in range(PAGES)]
+
+
+# Each benchmark runs a fixed workload and returns the number of operations.
+
+def bench_load_from_json(ctx: Context) -> int:
+    RecipeManager().load_from_json(ctx.json_path)
+    return ctx.size
+
+
+def bench_save_to_json(ctx: Context) -> int:
+    ctx.manager.save_to_json(ctx.out_path)
+    return ctx.size
+
+
+def bench_get_recipe(ctx: Context) -> int:
+    get = ctx.manager.get_recipe
+    for name in ctx.names:
+        get(name)
+    return len(ctx.names)
+
+
+def bench_search(ctx: Context) -> int:
+    for query in ctx.queries:
+        ctx.manager.query_cache.clear()
+        ctx.manager.search(query, 20)
+    return len(ctx.queries)
+
+
+def bench_search_cached(ctx: Context) -> int:
+    for query in ctx.queries:
+        ctx.manager.search(query, 20)
+    return len(ctx.queries)
+
+
+def bench_sort_name(ctx: Context) -> int:
+    Sorter.sort_name(ctx.recipes)
+    return ctx.size
+
+
+def bench_sort_rating(ctx: Context) -> int:
+    Sorter.sort_rating(ctx.recipes)
+    return ctx.size
+
+
+def bench_top_rated(ctx: Context) -> int:
+    Sorter.top_rated(ctx.recipes, 20)
+    return ctx.size
+
+
+def bench_sort_random(ctx: Context) -> int:
+    Sorter.sort_random(ctx.recipes, 0)
+    return ctx.size
+
+
+def bench_name_pages(ctx: Context) -> int:
+    # the maintained name order, as the paged menu listings read it
+    for start in ctx.starts:
+        ctx.manager.query_cache.clear()
+        ctx.manager.sort_name(start, 20)
+    return len(ctx.starts)
+
+
+def bench_list_favourites(ctx: Context) -> int:
+    ctx.manager.query_cache.clear()
+    ctx.manager.list_favourites()
+    return 1
+
+
+def bench_recommend(ctx: Context) -> int:
+    for name in ctx.names[:QUERIES]:
+        ctx.manager.query_cache.clear()
+        ctx.manager.recommend(name, k=10, approximate=False)
+    return QUERIES
+
+
+def bench_rate(ctx: Context) -> int:
+    # one write per rating
+    for name in ctx.names[:QUERIES]:
+        ctx.manager.rate_recipe(name, 2.5)
+    return QUERIES
+
+
+def bench_rate_many(ctx: Context) -> int:
+    return ctx.manager.rate_many([(name, 2.5) for name in ctx.names])
+
+
+def bench_startup(ctx: Context) -> int:
+    # time to first menu: launches the app and exits as soon as it is shown
+    app = subprocess.Popen([sys.executable, MAIN], cwd=ctx.app_dir, text=True,
+                           stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    for line in app.stdout:
+        if "0. Exit" in line:
+            break
+    app.communicate("0\n")
+    return 1
+
+
+def bench_display(ctx: Context) -> int:
+    recipe_module.display_cache.clear()
+    for recipe in ctx.shown:
+        recipe.invalidate()
+        recipe.display()
+    return len(ctx.shown)
+
+
+def bench_display_cached(ctx: Context) -> int:
+    for recipe in ctx.shown:
+        recipe.display()
+    return len(ctx.shown)
+
+
+BENCHMARKS = {name[len("bench_"):]: fn for name, fn in list(globals().items()) if name.startswith("bench_")}
+
+
+def measure(fn, ctx: Context, repeat: int) -> dict:
+    fn(ctx)  # warm up
+    times = []
+    ops = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = fn(ctx)
+        times.append(time.perf_counter() - start)
+    seconds = statistics.median(times)
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    fn(ctx)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ops": ops, "seconds": seconds, "us_per_op": seconds / ops * 1e6,
+            "peak_bytes": peak, "net_blocks": sys.getallocatedblocks() - blocks}
+
+
+def run(sizes: list[int], names: list[str], repeat: int, seed: int) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            ctx = Context(size, tmp, seed)
+            for name in names:
+                result = {"benchmark": name, "size": size, **measure(BENCHMARKS[name], ctx, repeat)}
+                results.append(result)
+                print(f"{name:>16} {size:>9} {result['us_per_op']:>12.3f} {result['peak_bytes'] / 1e6:>9.2f}"
+                      f" {result['net_blocks']:>10}", flush=True)
+            os.remove(ctx.json_path)
+            shutil.rmtree(ctx.app_dir)
+    return results
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float, memory_tolerance: float) -> list[str]:
+    # returns a description of every result worse than its baseline
+    previous = {(r["benchmark"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["benchmark"], result["size"]))
+        if before is None:
+            continue
+        label = f"{result['benchmark']} @ {result['size']}"
+        if (max(result["seconds"], before["seconds"]) >= MIN_COMPARED_SECONDS
+                and result["us_per_op"] > before["us_per_op"] * (1 + tolerance)):
+            regressions.append(f"{label}: {before['us_per_op']:.3f} -> {result['us_per_op']:.3f} us/op"
+                               f" ({result['us_per_op'] / before['us_per_op']:.2f}x)")
+        if (max(result["peak_bytes"], before["peak_bytes"]) >= MIN_COMPARED_BYTES
+                and result["peak_bytes"] > before["peak_bytes"] * (1 + memory_tolerance)):
+            regressions.append(f"{label}: peak {before['peak_bytes']} -> {result['peak_bytes']} bytes"
+                               f" ({result['peak_bytes'] / max(before['peak_bytes'], 1):.2f}x)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Catalogue benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE, help="compare against a results file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results as {BASELINE}")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown, 0.3 = 30%%")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="allowed peak memory growth")
+    args = parser.parse_args()
+
+    print(f"{'benchmark':>16} {'recipes':>9} {'us/op':>12} {'peak MB':>9} {'net blocks':>10}")
+    results = run(args.sizes, args.only or list(BENCHMARKS), args.repeat, args.seed)
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": args.seed, "repeat": args.repeat},
+        "results": results
+    }
+    for path in [args.output] + ([BASELINE] if args.save_baseline else []):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=4)
+    slow = [r for r in results if r["benchmark"] == "startup" and r["seconds"] > STARTUP_BUDGET]
+    for result in slow:
+        print(f"OVER BUDGET startup @ {result['size']}: {result['seconds'] * 1e3:.1f} ms"
+              f" > {STARTUP_BUDGET * 1e3:.0f} ms")
+    if slow:
+        return 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        # results the baseline has nothing to compare with; --save-baseline
+        # after adding a benchmark fills them in
+        known = {(r["benchmark"], r["size"]) for r in baseline["results"]}
+        for result in results:
+            if (result["benchmark"], result["size"]) not in known:
+                print(f"NOT IN BASELINE {result['benchmark']} @ {result['size']}")
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import argparse
+import itertools
+import json
+import random
+
+WORDS = ["golden", "spicy", "roasted", "creamy", "garlic", "lemon", "smoky", "crispy",
+         "herb", "honey", "ginger", "rustic", "summer", "winter", "classic", "quick"]
+DISHES = ["pasta", "curry", "soup", "salad", "stew", "pie", "risotto", "tacos",
+          "pancakes", "bake", "noodles", "omelette", "chowder", "skewers"]
+VERBS = ["chop", "boil", "fry", "mix", "whisk", "simmer", "bake", "stir", "season", "serve"]
+# roughly in order of how often real recipes use them
+COMMON = ["salt", "olive oil", "garlic", "onion", "butter", "black pepper", "egg", "flour",
+          "sugar", "water", "milk", "lemon", "tomato", "parsley", "carrot", "chicken stock",
+          "cream", "parmesan", "rice", "potato", "basil", "thyme", "honey", "ginger",
+          "soy sauce", "chicken breast", "bell pepper", "cumin", "paprika", "cinnamon",
+          "vanilla extract", "baking powder", "celery", "mushroom", "spinach", "lime",
+          "coriander", "chili flakes", "oregano", "rosemary", "cheddar", "yogurt", "bacon",
+          "beef mince", "pasta", "bread", "vinegar", "mustard", "cabbage", "courgette"]
+MODIFIERS = ["fresh", "dried", "smoked", "ground", "chopped", "toasted", "pickled", "frozen"]
+
+VOCABULARY_SIZE = 5000
+# exponent of the Zipf law ingredient popularity follows; higher means a few
+# staples dominate more strongly
+ZIPF_EXPONENT = 1.1
+
+
+def ingredient_vocabulary(size: int = VOCABULARY_SIZE) -> list[str]:
+    # Ingredient names from most to least used: the staples, then modified
+    # staples, then a long tail of rarer ones.
+    names = list(COMMON)
+    names += [f"{m} {c}" for m, c in itertools.product(MODIFIERS, COMMON)]
+    names += [f"specialty ingredient {i}" for i in range(max(0, size - len(names)))]
+    return names[:size]
+
+
+def generate_entries(count: int, seed: int = 0, vocabulary_size: int = VOCABULARY_SIZE):
+    # Yields recipe dicts in the Recipe.to_dict schema. Output depends only on
+    # count, seed and vocabulary_size, and recipe i is the same whatever the
+    # count. Ingredients are drawn by Zipf-distributed popularity.
+    rnd = random.Random(seed)
+    ingredients = ingredient_vocabulary(vocabulary_size)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** ZIPF_EXPONENT
+                                            for rank in range(len(ingredients))))
+    for i in range(count):
+        name = f"{rnd.choice(WORDS)} {rnd.choice(DISHES)} {i}"
+        wanted = rnd.randint(3, 10)
+        chosen = []
+        while len(chosen) < wanted:
+            for ingredient in rnd.choices(ingredients, cum_weights=cum_weights, k=wanted - len(chosen)):
+                if ingredient not in chosen:
+                    chosen.append(ingredient)
+        steps = [f"{rnd.choice(VERBS)} the {rnd.choice(chosen)}" for _ in range(rnd.randint(2, 8))]
+        yield {
+            "name": name,
+            "ingredients": chosen,
+            "steps": steps,
+            "rating": round(rnd.uniform(0, 5), 1),
+            "is_favourite": rnd.random() < 0.1
+        }
+
+
+def write_json(path: str, count: int, seed: int = 0):
+    # Writes a top-level JSON array one record at a time, so catalogues far
+    # larger than memory can be produced.
+    with open(path, "w") as f:
+        f.write("[\n")
+        for i, entry in enumerate(generate_entries(count, seed)):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(entry))
+        f.write("\n]\n")
+
+
+def write_jsonl(path: str, count: int, seed: int = 0):
+    with open(path, "w") as f:
+        for entry in generate_entries(count, seed):
+            f.write(json.dumps(entry))
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic recipe catalogue")
+    parser.add_argument("count", type=int, help="number of recipes, e.g. 1000 to 10000000")
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jsonl", action="store_true", help="write JSON Lines instead of an array")
+    args = parser.parse_args()
+    (write_jsonl if args.jsonl else write_json)(args.output, args.count, args.seed)
@@ -0,0 +1,256 @@
+import functools
+import io
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Opt-in timing of the app's hot paths. enable() swaps the listed methods for
+# timed wrappers and disable() puts the originals back, so nothing is paid
+# while instrumentation is off. Every call records its latency in a
+# histogram, and the number of items it produced or handled.
+#
+#   RECIPE_METRICS=metrics.prom python Main.py
+#   python -c "import instrumentation; print(instrumentation.metrics.summary())"
+#
+# The profilers, and the modules being timed, are only imported once they
+# are asked for, so importing this module costs next to nothing.
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# public RecipeManager methods left untimed: plumbing under the timed ones,
+# and calls too cheap to be worth a histogram; every other one is timed
+UNTIMED = ("writing", "publish", "read", "cached", "log", "size", "sort_recipes", "cache_stats", "name_taken",
+           "recommender_index", "apply_record", "ingest_summary", "disable_dedup", "close", "close_journal")
+
+
+# ---------- OperationStats Class ----------
+class OperationStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.items = 0
+        # counts per bucket; the last one is +Inf
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds: float, items: int, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.items += items
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        # upper bound of the bucket holding the q-th call
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+# ---------- Metrics Class ----------
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations: dict[str, OperationStats] = {}
+
+    def observe(self, name: str, seconds: float, items: int = 0, failed: bool = False):
+        with self.lock:
+            stats = self.operations.get(name)
+            if stats is None:
+                stats = self.operations[name] = OperationStats()
+            stats.observe(seconds, items, failed)
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+
+    def summary(self) -> str:
+        lines = [f"{'operation':<36} {'calls':>7} {'mean ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'items':>9}"]
+        with self.lock:
+            for name, s in sorted(self.operations.items(), key=lambda item: -item[1].seconds):
+                lines.append(f"{name:<36} {s.calls:>7} {s.seconds / s.calls * 1e3:>9.3f}"
+                             f" {s.quantile(0.5) * 1e3:>8.2f} {s.quantile(0.99) * 1e3:>8.2f} {s.items:>9}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        # Prometheus text exposition format, version 0.0.4
+        out = ["# HELP recipe_operation_seconds Latency of instrumented operations.",
+               "# TYPE recipe_operation_seconds histogram"]
+        with self.lock:
+            operations = sorted(self.operations.items())
+            for name, s in operations:
+                label = f'op="{name}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, s.buckets):
+                    cumulative += count
+                    out.append(f'recipe_operation_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                out.append(f'recipe_operation_seconds_bucket{{{label},le="+Inf"}} {s.calls}')
+                out.append(f"recipe_operation_seconds_sum{{{label}}} {s.seconds!r}")
+                out.append(f"recipe_operation_seconds_count{{{label}}} {s.calls}")
+            for metric, help_text, field in (("recipe_operation_items_total", "Items returned or handled.", "items"),
+                                             ("recipe_operation_errors_total", "Calls that raised.", "errors")):
+                out.append(f"# HELP {metric} {help_text}")
+                out.append(f"# TYPE {metric} counter")
+                for name, s in operations:
+                    out.append(f'{metric}{{op="{name}"}} {getattr(s, field)}')
+        return "\n".join(out) + "\n"
+
+    def dump(self, path: str):
+        # replaces path atomically, so a scraper never reads half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
+# (owner, attribute) -> the attribute as it was before enable()
+originals: dict = {}
+
+
+def count_items(args: tuple, result) -> int:
+    if result is None or isinstance(result, (str, bool)):
+        return int(isinstance(result, str))
+    # a number returned is how many were added, applied and so on
+    if isinstance(result, int):
+        return result
+    total = getattr(result, "total", None)
+    if isinstance(total, int):
+        return total
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def catalogue_size(args: tuple, result) -> int:
+    # a load inside a larger change has not been published yet
+    return args[0].size()
+
+
+def page_size(args: tuple, result) -> int:
+    return len(result[0])
+
+
+def manager_ops() -> list[str]:
+    # RecipeManager's public methods but UNTIMED, so a new one is timed too
+    import inspect
+    from RecipeManager import RecipeManager
+    return sorted(name for name, value in vars(RecipeManager).items()
+                  if not name.startswith("_") and inspect.isfunction(value) and name not in UNTIMED)
+
+
+def targets() -> list[tuple]:
+    # (owner, attribute, items) for every instrumented callable
+    import recipejson
+    from RecipeManager import RecipeManager
+    from Recipe import Recipe
+    from Sorter import Sorter
+    from TerminalUI import TerminalUI
+    sizes = ("load_from_json", "save_to_json")
+    result = [(RecipeManager, name, catalogue_size if name in sizes else count_items) for name in manager_ops()]
+    result += [(Sorter, name, count_items) for name in
+               ("sort_name", "sort_rating", "top_rated", "sort_random", "name_order", "rating_order")]
+    result += [(recipejson, "dump_recipes", count_items), (recipejson, "dump_jsonl", count_items)]
+    result += [(Recipe, "display", count_items), (TerminalUI, "display_recipe", count_items),
+               (TerminalUI, "render_page", page_size)]
+    return result
+
+
+def timed(fn, name: str, items):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            metrics.observe(name, time.perf_counter() - start, 0, True)
+            raise
+        metrics.observe(name, time.perf_counter() - start, items(args, result))
+        return result
+    return wrapper
+
+
+def enabled() -> bool:
+    return bool(originals)
+
+
+def enable():
+    import inspect
+    if originals:
+        return
+    for owner, attribute, items in targets():
+        original = inspect.getattr_static(owner, attribute)
+        owner_name = getattr(owner, "__name__", str(owner))
+        name = f"{owner_name}.{attribute}"
+        if isinstance(original, staticmethod):
+            wrapped = staticmethod(timed(original.__func__, name, items))
+        else:
+            wrapped = timed(original, name, items)
+        originals[(owner, attribute)] = original
+        setattr(owner, attribute, wrapped)
+
+
+def disable():
+    for (owner, attribute), original in originals.items():
+        setattr(owner, attribute, original)
+    originals.clear()
+
+
+def enable_from_env() -> str:
+    # turns instrumentation on when RECIPE_METRICS names a metrics file;
+    # returns that path, or None
+    path = os.environ.get("RECIPE_METRICS")
+    if path:
+        enable()
+    return path
+
+
+@contextmanager
+def profile(path: str):
+    # cProfile over the block; the stats file opens with pstats or snakeviz
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def profile_report(path: str, top: int = 20) -> str:
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+@contextmanager
+def trace_memory(path: str, top: int = 25):
+    # tracemalloc over the block; writes the lines that allocated the most
+    # memory still held at the end, and the peak, to path
+    import tracemalloc
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(10)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    try:
+        yield
+    finally:
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if started:
+            tracemalloc.stop()
+        lines = [f"peak traced memory: {peak / 1e6:.2f} MB", f"top {top} allocation sites by net size:"]
+        lines += [str(stat) for stat in after.compare_to(before, "lineno")[:top]]
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
@@ -0,0 +1,491 @@
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+
+import recipejson
+from Recipe import Recipe
+from RecipeManager import RecipeManager
+from RecipeQuery import RecipeQuery
+from RecipeJournal import RecipeJournal
+from BinaryRecipeStore import BinaryRecipeStore
+from IngredientFactory import IngredientFactory, normalize
+
+# Non-interactive batch commands. Large JSON and JSON Lines files are cut into
+# byte ranges that are parsed and validated in a process pool; the main
+# process only interns ingredient names and builds the recipes.
+#
+#   python recipecli.py import  <input> --into <catalogue.json>
+#   python recipecli.py apply   <changes.jsonl> --to <catalogue.json>
+#   python recipecli.py export  <catalogue.json> <output>
+#   python recipecli.py convert <input> <output>
+#   python recipecli.py stats   <input>
+#   python recipecli.py dedupe  <input> [--threshold 0.7] [--output clusters.jsonl]
+#   python recipecli.py query   <catalogue.json> "pasta rating>=4 order:rating limit:10" [--explain]
+#   python recipecli.py columns <input> <columns.npz>
+#   python recipecli.py report  <columns.npz or input> [--by tag] [--column favourite] [--sort mean]
+
+CHUNK_BYTES = 1 << 23
+# A record starts on a new line with its opening brace, both in JSON Lines and
+# in the indented layout dump_recipes writes. Raw newlines cannot occur inside
+# JSON strings and recipes hold no nested objects, so a match is always the
+# start of a record.
+RECORD_START = re.compile(rb"\n[ \t\r]*\{")
+
+
+def next_record_start(f, pos: int) -> int:
+    # byte offset of the first record starting after pos, or -1
+    f.seek(pos)
+    buf = b""
+    base = pos
+    while True:
+        data = f.read(1 << 16)
+        if not data:
+            return -1
+        buf += data
+        match = RECORD_START.search(buf)
+        if match:
+            return base + match.start() + 1
+        # keep the last line, which may be the start of a match
+        cut = buf.rfind(b"\n")
+        if cut < 0:
+            cut = len(buf)
+        base += cut
+        buf = buf[cut:]
+
+
+def split_file(path: str, chunk_bytes: int = CHUNK_BYTES) -> list[tuple[int, int]]:
+    # Cuts path into (start, end) byte ranges of about chunk_bytes, each
+    # holding whole records. The opening "[" of an array is left out, so every
+    # range parses as a comma separated run of records.
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(4096)
+        start = len(head) - len(head.lstrip())
+        if head[start:start + 1] == b"[":
+            start += 1
+        bounds = [start]
+        while bounds[-1] + chunk_bytes < size:
+            found = next_record_start(f, bounds[-1] + chunk_bytes)
+            if found < 0:
+                break
+            bounds.append(found)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def read_chunk(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    errors = []
+    return recipejson.iter_json_records(io.BytesIO(data), errors, offset=start), errors
+
+
+def parse_chunk(task: tuple) -> tuple:
+    # Worker: parses and validates one byte range. Ingredient names are
+    # replaced by indexes into a per-chunk vocabulary, so the main process
+    # interns each distinct name once per chunk. Record indexes are relative
+    # to the chunk; seen is the number of records it held.
+    path, start, end = task
+    records_iter, errors = read_chunk(path, start, end)
+    vocab: dict[str, int] = {}
+    records = []
+    seen = 0
+    for index, offset, entry in records_iter:
+        seen = index + 1
+        try:
+            name, ingredients, steps, rating, is_favourite = recipejson.validate_entry(entry)
+        except ValueError as e:
+            errors.append(recipejson.RecordError(index, offset, str(e)))
+            continue
+        refs = [vocab.setdefault(i, len(vocab)) for i in ingredients]
+        records.append((name, refs, steps, rating, is_favourite))
+    seen = max([seen] + [e.index + 1 for e in errors])
+    return list(vocab), records, errors, seen
+
+
+def map_chunks(fn, path: str, workers: int, chunk_bytes: int):
+    # fn applied to every chunk of path, results in file order
+    tasks = [(path, start, end) for start, end in split_file(path, chunk_bytes)]
+    if workers == 1:
+        yield from map(fn, tasks)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap(fn, tasks)
+
+
+def iter_recipes(path: str, factory: IngredientFactory = None, errors: list = None,
+                 workers: int = None, chunk_bytes: int = CHUNK_BYTES):
+    # Parallel counterpart of recipejson.iter_recipes: the same recipes in
+    # the same order, with the same errors.
+    factory = factory or IngredientFactory()
+    workers = workers or os.cpu_count()
+    base = 0
+    for vocab, records, chunk_errors, seen in map_chunks(parse_chunk, path, workers, chunk_bytes):
+        ids = factory.get_ids(vocab)
+        for name, refs, steps, rating, is_favourite in records:
+            yield Recipe.from_ids(name, [ids[i] for i in refs], steps, rating, is_favourite)
+        if errors is not None:
+            for error in chunk_errors:
+                error.index += base
+                errors.append(error)
+        base += seen
+
+
+def unique(recipes, ingested: Counter):
+    # first occurrence of a name, ignoring case, wins, as in the loaders;
+    # counts the recipes "added" and "skipped" into ingested
+    seen = set()
+    for recipe in recipes:
+        key = recipe.name.casefold()
+        if key in seen:
+            ingested["skipped"] += 1
+            continue
+        seen.add(key)
+        ingested["added"] += 1
+        yield recipe
+
+
+def report_ingested(ingested: Counter):
+    summary = recipejson.ingest_summary(ingested)
+    if summary:
+        print(summary)
+
+
+def load_catalogue(path: str, workers: int = None) -> RecipeManager:
+    # Reads a journalled catalogue without writing to it: the snapshot is
+    # parsed in parallel and the journals left beside it are replayed.
+    manager = RecipeManager()
+    errors = []
+    if os.path.exists(path):
+        manager.import_recipes(iter_recipes(path, manager.factory, errors, workers))
+    for journal_path in (f"{path}.journal.compacting", f"{path}.journal"):
+        for record in RecipeJournal.read(journal_path):
+            manager.apply_record(record)
+    report(errors)
+    report_ingested(manager.ingested)
+    return manager
+
+
+def write_recipes(path: str, recipes, fmt: str = None):
+    fmt = fmt or output_format(path)
+    if fmt == "jsonl":
+        recipejson.dump_jsonl(path, recipes)
+    elif fmt == "store":
+        BinaryRecipeStore.write(path, recipes)
+    else:
+        recipejson.dump_recipes(path, recipes)
+
+
+def output_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        return "jsonl"
+    if ext in (".rcs", ".store"):
+        return "store"
+    return "json"
+
+
+def report(errors: list):
+    for error in errors:
+        print(f"Skipping malformed {error}")
+
+
+def chunk_stats(task: tuple) -> tuple:
+    # Worker: per-chunk totals for the stats command
+    path, start, end = task
+    records_iter, errors = read_chunk(path, start, end)
+    totals = Counter()
+    ingredients = Counter()
+    for index, offset, entry in records_iter:
+        try:
+            _, names, steps, rating, is_favourite = recipejson.validate_entry(entry)
+        except ValueError:
+            totals["malformed"] += 1
+            continue
+        totals["recipes"] += 1
+        totals["favourites"] += is_favourite
+        totals["rating"] += rating
+        totals["ingredients"] += len(names)
+        totals["steps"] += len(steps)
+        ingredients.update({normalize(name) for name in names})
+    totals["malformed"] += len(errors)
+    return totals, ingredients
+
+
+def cmd_import(args) -> int:
+    manager = RecipeManager()
+    manager.open_journal(args.into)
+    errors = []
+    start = time.perf_counter()
+    try:
+        added = manager.import_recipes(iter_recipes(args.input, manager.factory, errors,
+                                                    args.workers, args.chunk_bytes))
+    finally:
+        manager.close()
+    report(errors)
+    report_ingested(manager.ingested)
+    print(f"Imported {added} recipes into {args.into} in {time.perf_counter() - start:.2f}s"
+          f" ({len(errors)} malformed)")
+    return 0
+
+
+def cmd_apply(args) -> int:
+    # a file of apply_batch operations, e.g. a nightly feed of ratings,
+    # applied all or nothing and journalled as one record
+    errors = []
+    with open(args.input, "rb") as f:
+        operations = [value for _, _, value in recipejson.iter_json_records(f, errors)]
+    if errors:
+        report(errors)
+        print("Nothing applied: the change file is malformed")
+        return 1
+    manager = RecipeManager()
+    manager.open_journal(args.to)
+    start = time.perf_counter()
+    try:
+        applied = manager.apply_batch(operations)
+    except ValueError as e:
+        print(f"Nothing applied: {e}")
+        return 1
+    finally:
+        manager.close()
+    print(f"Applied {applied} changes to {args.to} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_export(args) -> int:
+    manager = load_catalogue(args.catalogue, args.workers)
+    write_recipes(args.output, manager.recipes.values(), args.format)
+    print(f"Exported {len(manager.recipes)} recipes to {args.output}")
+    return 0
+
+
+def cmd_convert(args) -> int:
+    errors = []
+    written = 0
+
+    def counted(recipes):
+        nonlocal written
+        for recipe in recipes:
+            written += 1
+            yield recipe
+
+    recipes = iter_recipes(args.input, errors=errors, workers=args.workers, chunk_bytes=args.chunk_bytes)
+    ingested = Counter()
+    write_recipes(args.output, counted(unique(recipes, ingested)), args.format)
+    report(errors)
+    report_ingested(ingested)
+    print(f"Converted {written} recipes to {args.output} ({len(errors)} malformed)")
+    return 0
+
+
+def cmd_stats(args) -> int:
+    totals = Counter()
+    ingredients = Counter()
+    workers = args.workers or os.cpu_count()
+    for chunk_totals, chunk_ingredients in map_chunks(chunk_stats, args.input, workers, args.chunk_bytes):
+        totals.update(chunk_totals)
+        ingredients.update(chunk_ingredients)
+    count = totals["recipes"]
+    print(f"Recipes:              {count}")
+    print(f"Malformed records:    {totals['malformed']}")
+    print(f"Favourites:           {totals['favourites']}")
+    print(f"Distinct ingredients: {len(ingredients)}")
+    if count:
+        print(f"Average rating:       {totals['rating'] / count:.2f}")
+        print(f"Ingredients/recipe:   {totals['ingredients'] / count:.1f}")
+        print(f"Steps/recipe:         {totals['steps'] / count:.1f}")
+        print("Most used ingredients:")
+        for name, uses in ingredients.most_common(args.top):
+            print(f"  {uses:>8}  {name}")
+    return 0
+
+
+def cmd_dedupe(args) -> int:
+    # Clusters near-duplicate recipes in a file (see DuplicateDetector).
+    # Recipes are signed a batch at a time and only names and signatures are
+    # kept, so millions fit in memory; --output writes one cluster per line.
+    from DuplicateDetector import DuplicateDetector, BATCH
+    import numpy as np
+    try:
+        detector = DuplicateDetector(args.threshold)
+    except ValueError as e:
+        print(e)
+        return 1
+    errors = []
+    names, signatures = [], []
+    start = time.perf_counter()
+    ingested = Counter()
+    recipes = unique(iter_recipes(args.input, errors=errors, workers=args.workers, chunk_bytes=args.chunk_bytes),
+                     ingested)
+    while batch := list(islice(recipes, BATCH)):
+        names += [recipe.name for recipe in batch]
+        signatures.append(detector.signatures(batch))
+    report(errors)
+    report_ingested(ingested)
+    signed = time.perf_counter()
+    clusters = detector.clusters(np.concatenate(signatures) if signatures else np.zeros((0, 0), np.uint32))
+    done = time.perf_counter()
+    print(f"Recipes:            {len(names)}")
+    print(f"Clusters:           {len(clusters)}")
+    print(f"Near-duplicates:    {sum(len(c) - 1 for c in clusters)}")
+    print(f"Time:               {done - start:.2f}s ({signed - start:.2f}s reading and signing)")
+    if clusters:
+        print("Largest clusters:")
+        for cluster in sorted(clusters, key=len, reverse=True)[:args.top]:
+            shown = ", ".join(names[i] for i in cluster[:5])
+            print(f"  {len(cluster):>6}  {shown}{', ...' if len(cluster) > 5 else ''}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for cluster in clusters:
+                f.write(json.dumps({"keep": names[cluster[0]], "duplicates": [names[i] for i in cluster[1:]]}) + "\n")
+        print(f"Wrote {len(clusters)} clusters to {args.output}")
+    return 0
+
+
+def cmd_query(args) -> int:
+    # see RecipeQuery.parse for the syntax
+    try:
+        query = RecipeQuery.parse(args.query)
+    except ValueError as e:
+        print(e)
+        return 1
+    manager = load_catalogue(args.catalogue, args.workers)
+    if args.explain:
+        print(manager.explain(query))
+        return 0
+    for recipe in manager.query(query):
+        print(f"{recipe.rating:>4.1f} {'*' if recipe.is_favourite else ' '} {recipe.name}")
+    return 0
+
+
+def read_columns(path: str, workers: int, chunk_bytes: int):
+    # a .npz written by the columns command, memory mapped, or the columns
+    # of a recipe file
+    from CatalogueColumns import CatalogueColumns
+    if path.lower().endswith(".npz"):
+        return CatalogueColumns.load(path)
+    errors = []
+    ingested = Counter()
+    columns = CatalogueColumns.from_recipes(unique(iter_recipes(path, errors=errors, workers=workers,
+                                                                chunk_bytes=chunk_bytes), ingested))
+    report(errors)
+    report_ingested(ingested)
+    return columns
+
+
+def cmd_columns(args) -> int:
+    # NumPy columns of a recipe file for repeated reports (see
+    # CatalogueColumns)
+    start = time.perf_counter()
+    columns = read_columns(args.input, args.workers, args.chunk_bytes)
+    columns.save(args.output)
+    print(f"Wrote columns of {len(columns)} recipes to {args.output} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_report(args) -> int:
+    # recipes and the mean rating or favourite ratio per ingredient or tag
+    try:
+        columns = read_columns(args.input, args.workers, args.chunk_bytes)
+    except ValueError as e:
+        print(e)
+        return 1
+    start = time.perf_counter()
+    summary = columns.summary()
+    rows = columns.top(args.by, args.column, args.sort, args.top, args.min_count)
+    elapsed = time.perf_counter() - start
+    print(f"Recipes:              {summary['recipes']}")
+    print(f"Favourites:           {summary['favourites']}")
+    print(f"Distinct ingredients: {summary['distinct_ingredients']}")
+    if summary["recipes"]:
+        print(f"Average rating:       {summary['average_rating']:.2f}")
+        print(f"Ingredients/recipe:   {summary['ingredients_per_recipe']:.1f}")
+    mean = "average rating" if args.column == "rating" else "favourite ratio"
+    print(f"By {args.by}, {'most recipes' if args.sort == 'count' else f'highest {mean}'} first:")
+    print(f"  {'recipes':>8}  {mean:>15}  {args.by}")
+    for label, count, value in rows:
+        print(f"  {count:>8}  {value:>15.3f}  {label}")
+    print(f"Computed in {elapsed:.2f}s")
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="recipecli", description="Batch recipe import, export and statistics")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: one per CPU)")
+    parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES, help="bytes of input per parse task")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", help="add the recipes in a JSON or JSONL file to a catalogue")
+    p.add_argument("input")
+    p.add_argument("--into", required=True, help="catalogue snapshot, e.g. sample_recipes.json")
+    p.set_defaults(run=cmd_import)
+
+    p = commands.add_parser("apply", help="apply a JSON or JSONL file of changes to a catalogue as one batch")
+    p.add_argument("input")
+    p.add_argument("--to", required=True, help="catalogue snapshot, e.g. sample_recipes.json")
+    p.set_defaults(run=cmd_apply)
+
+    p = commands.add_parser("export", help="write a catalogue, including its journal, to a file")
+    p.add_argument("catalogue")
+    p.add_argument("output")
+    p.add_argument("--format", choices=("json", "jsonl", "store"), help="default: from the output extension")
+    p.set_defaults(run=cmd_export)
+
+    p = commands.add_parser("convert", help="rewrite a recipe file as JSON, JSONL or a binary store")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--format", choices=("json", "jsonl", "store"), help="default: from the output extension")
+    p.set_defaults(run=cmd_convert)
+
+    p = commands.add_parser("stats", help="summarise a recipe file")
+    p.add_argument("input")
+    p.add_argument("--top", type=int, default=10, help="number of ingredients to list")
+    p.set_defaults(run=cmd_stats)
+
+    p = commands.add_parser("dedupe", help="report clusters of near-duplicate recipes in a recipe file")
+    p.add_argument("input")
+    p.add_argument("--threshold", type=float, default=0.7, help="estimated similarity from 0 to 1")
+    p.add_argument("--top", type=int, default=10, help="number of clusters to list")
+    p.add_argument("--output", help="write every cluster to this JSON Lines file")
+    p.set_defaults(run=cmd_dedupe)
+
+    p = commands.add_parser("query", help="list the recipes of a catalogue matching a query")
+    p.add_argument("catalogue")
+    p.add_argument("query", help='e.g. "pasta rating>=4 with:garlic -fav order:rating limit:10"')
+    p.add_argument("--explain", action="store_true", help="show the query plan and what running it took")
+    p.set_defaults(run=cmd_query)
+
+    p = commands.add_parser("columns", help="write the NumPy columns of a recipe file for reports")
+    p.add_argument("input")
+    p.add_argument("output", help="e.g. catalogue.npz")
+    p.set_defaults(run=cmd_columns)
+
+    p = commands.add_parser("report", help="group recipes by ingredient or tag")
+    p.add_argument("input", help="a .npz from the columns command, or a recipe file")
+    p.add_argument("--by", choices=("ingredient", "tag"), default="ingredient")
+    p.add_argument("--column", choices=("rating", "favourite"), default="rating",
+                   help="averaged per group; the favourite average is the favourite ratio")
+    p.add_argument("--sort", choices=("count", "mean"), default="count")
+    p.add_argument("--min-count", type=int, default=1, help="leave out groups with fewer recipes")
+    p.add_argument("--top", type=int, default=10, help="number of groups to list")
+    p.set_defaults(run=cmd_report)
+
+    args = parser.parse_args(argv)
+    path = args.catalogue if args.command in ("export", "query") else args.input
+    if not os.path.exists(path):
+        print(f"No such file: {path}")
+        return 1
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+import codecs
+import json
+import os
+from Recipe import Recipe, MAX_RATING, valid_rating
+from IngredientFactory import IngredientFactory
+
+CHUNK_SIZE = 1 << 16
+# a single record larger than this is reported as malformed instead of being
+# buffered forever
+MAX_RECORD_SIZE = 1 << 24
+
+WHITESPACE = " \t\r\n"
+OPENING = {"]": "[", "}": "{"}
+
+
+# ---------- RecordError Class ----------
+class RecordError:
+    def __init__(self, index: int, offset: int, message: str):
+        self.index = index
+        self.offset = offset
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"record {self.index} at byte {self.offset}: {self.message}"
+
+
+# ---------- JsonStream Class ----------
+# Reads a file incrementally and decodes one JSON value at a time. Keeps only
+# the unconsumed tail of the file in memory and tracks the byte offset of the
+# read position for error reports.
+class JsonStream:
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            try:
+                self.buf += self.decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                # the file ends inside a multi-byte character
+                self.buf += "\ufffd"
+            return False
+        self.buf += self.decoder.decode(data)
+        return True
+
+    def advance(self, end: int):
+        consumed = self.buf[self.pos:end]
+        self.offset += len(consumed) if consumed.isascii() else len(consumed.encode("utf-8"))
+        self.pos = end
+
+    def peek(self) -> str:
+        # next non-whitespace character, or "" at end of file
+        while True:
+            end = self.pos
+            while end < len(self.buf) and self.buf[end] in WHITESPACE:
+                end += 1
+            self.advance(end)
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def skip(self):
+        self.advance(self.pos + 1)
+
+    def decode(self):
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # errors at the very end of the buffer, or an open string,
+                # mean the value continues in the next chunk; filling moves
+                # the buffer even at the end of the file, so decode again
+                truncated = e.pos >= len(self.buf) - 6 or e.msg.startswith("Unterminated string")
+                if truncated and len(self.buf) - self.pos <= MAX_RECORD_SIZE and not self.eof:
+                    self.fill()
+                    continue
+                raise
+            # a number cut at a chunk boundary decodes "successfully"
+            if end == len(self.buf) and not self.eof:
+                self.fill()
+                continue
+            self.advance(end)
+            return value
+
+    def resync(self, error_at: int):
+        # Skips a malformed value that starts at pos and failed to decode at
+        # buffer position error_at. The strings and brackets the decoder
+        # accepted before error_at are replayed, then the scan goes on to the
+        # end of the value: past its closing bracket, or up to a "{", "," or
+        # "]" outside it. If the brackets stop pairing up, a string runs into
+        # a raw newline (which JSON strings cannot hold), or the error is a
+        # "{" where a key belongs (a record missing its "}"), it stops at the
+        # next "{" outside a string instead.
+        stack = []
+        in_string = escaped = False
+        for ch in self.buf[self.pos:error_at]:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "[{":
+                stack.append(ch)
+            elif ch in "]}":
+                stack.pop()
+        broken = self.buf[error_at:error_at + 1] == "{" and bool(stack)
+        end = error_at
+        while True:
+            if end == len(self.buf):
+                self.advance(end)
+                if not self.fill():
+                    return
+                end = self.pos
+            ch = self.buf[end]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                elif ch == "\n":
+                    in_string = False
+                    broken = True
+            elif ch == '"':
+                in_string = True
+            elif ch == "{" and (broken or not stack):
+                break
+            elif ch in "[{":
+                stack.append(ch)
+            elif ch in "]}":
+                if not stack:
+                    break
+                if not broken and stack[-1] == OPENING[ch]:
+                    stack.pop()
+                    if not stack:
+                        end += 1
+                        break
+                else:
+                    broken = True
+            elif ch == "," and not stack:
+                break
+            end += 1
+        self.advance(end)
+
+
+def iter_json_records(f, errors: list = None, chunk_size: int = CHUNK_SIZE, offset: int = 0):
+    # Yields (index, byte offset, value) for each element of a top-level JSON
+    # array, or each value of a JSON Lines file. A slice of an array's
+    # elements (comma separated, possibly ending in "]") reads like JSON
+    # Lines; offset is then the slice's position in the file. Malformed
+    # elements are appended to errors and skipped, and so is an element not
+    # separated from the one before by a comma (in a slice, once the first
+    # comma shows the elements are comma separated).
+    stream = JsonStream(f, chunk_size)
+    stream.offset = offset
+    first = stream.peek()
+    in_array = first == "["
+    if in_array:
+        stream.skip()
+    separated = in_array
+    # whether the last element decoded and no comma has followed it yet
+    after_value = False
+    # whether the last element failed to decode; the end of file it ran
+    # into is not reported again
+    failed = False
+    index = 0
+    while True:
+        ch = stream.peek()
+        if ch == "":
+            if in_array and not failed and errors is not None:
+                errors.append(RecordError(index, stream.offset, "unexpected end of file"))
+            return
+        if ch == "]":
+            return
+        if ch == ",":
+            stream.skip()
+            separated = True
+            after_value = False
+            continue
+        offset = stream.offset
+        missing_comma = separated and after_value
+        try:
+            value = stream.decode()
+        except json.JSONDecodeError as e:
+            if errors is not None:
+                errors.append(RecordError(index, offset, e.msg))
+            index += 1
+            stream.resync(e.pos)
+            after_value = False
+            failed = True
+            continue
+        after_value = True
+        failed = False
+        if missing_comma:
+            if errors is not None:
+                errors.append(RecordError(index, offset, "missing ',' before this element"))
+        else:
+            yield index, offset, value
+        index += 1
+
+
+def ingest_summary(ingested) -> str:
+    # one line on what became of the recipes of a load, from a Counter of
+    # "added", "skipped", "flagged" and "merged" (see RecipeManager._admit),
+    # or None if every recipe went in as it was
+    notes = [f"{ingested[outcome]} {text}" for outcome, text in (
+        ("skipped", "skipped as duplicate names"), ("flagged", "flagged as near-duplicates"),
+        ("merged", "merged into near-duplicates")) if ingested[outcome]]
+    if not notes:
+        return None
+    return f"{ingested['added']} recipes added; " + ", ".join(notes)
+
+
+def recipe_from_dict(entry, factory: IngredientFactory) -> Recipe:
+    name, ingredients, steps, rating, is_favourite = validate_entry(entry)
+    return Recipe.from_ids(name, factory.get_ids(ingredients), steps, rating, is_favourite)
+
+
+def validate_entry(entry) -> tuple:
+    # checks one decoded record against the Recipe.to_dict schema and returns
+    # (name, ingredients, steps, rating, is_favourite)
+    if not isinstance(entry, dict):
+        raise ValueError("expected an object")
+    name = entry.get("name")
+    if not isinstance(name, str) or not name:
+        raise ValueError("missing or invalid 'name'")
+    ingredients = entry.get("ingredients")
+    if not isinstance(ingredients, list) or not all(isinstance(i, str) for i in ingredients):
+        raise ValueError(f"'{name}': 'ingredients' must be a list of strings")
+    steps = entry.get("steps")
+    if not isinstance(steps, list) or not all(isinstance(s, str) for s in steps):
+        raise ValueError(f"'{name}': 'steps' must be a list of strings")
+    rating = entry.get("rating")
+    if not valid_rating(rating):
+        raise ValueError(f"'{name}': 'rating' must be a number from 0 to {MAX_RATING:g}")
+    is_favourite = entry.get("is_favourite", False)
+    if not isinstance(is_favourite, bool):
+        raise ValueError(f"'{name}': 'is_favourite' must be true or false")
+    return name, ingredients, steps, rating, is_favourite
+
+
+def iter_recipes(path: str, factory: IngredientFactory = None, errors: list = None):
+    # Lazily builds a Recipe for each valid record in path. Records that are
+    # malformed or fail validation are reported through errors and skipped.
+    factory = factory or IngredientFactory()
+    with open(path, "rb") as f:
+        for index, offset, entry in iter_json_records(f, errors):
+            try:
+                yield recipe_from_dict(entry, factory)
+            except ValueError as e:
+                if errors is not None:
+                    errors.append(RecordError(index, offset, str(e)))
+
+
+def dump_recipes(path: str, recipes):
+    # Writes recipes in the same layout as json.dump(..., indent=4), one
+    # record at a time, to a temporary file that atomically replaces path
+    # once it is safely on disk. A crash leaves either the old or the new
+    # file, never a partial one.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        first = True
+        for recipe in recipes:
+            f.write("\n    " if first else ",\n    ")
+            f.write(json.dumps(recipe.to_dict(), indent=4).replace("\n", "\n    "))
+            first = False
+        f.write("]" if first else "\n]")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+def dump_json(path: str, value):
+    # json.dump to a temporary file that atomically replaces path, as in
+    # dump_recipes
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+def dump_jsonl(path: str, recipes):
+    # JSON Lines counterpart of dump_recipes: one compact record per line
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for recipe in recipes:
+            f.write(json.dumps(recipe.to_dict(), separators=(",", ":")))
+            f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+def fsync_dir(path: str):
+    # make a rename or unlink in path's directory durable
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
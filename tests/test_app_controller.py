@@ -0,0 +1,112 @@
+import pytest
+
+import recipejson
+from AppController import AppController
+from RecipeManager import RecipeManager
+from SQLiteRecipeManager import SQLiteRecipeManager
+from TerminalUI import TerminalUI
+
+
+# ---------- ScriptedUI Class ----------
+# TerminalUI answering prompts from a list and keeping what it shows.
+class ScriptedUI(TerminalUI):
+    def __init__(self, answers: list[str]):
+        self.answers = list(answers)
+        self.messages = []
+        self.shown = []
+
+    def get_input(self, prompt: str) -> str:
+        return self.answers.pop(0)
+
+    def display_message(self, message: str):
+        self.messages.append(message)
+
+    def display_recipe(self, recipe):
+        self.shown.append(recipe.name)
+
+
+def catalogue(manager):
+    for name, ingredients, rating in [("Pancakes", ["flour", "milk", "egg"], 4),
+                                      ("Crepes", ["flour", "milk", "egg", "butter"], 5),
+                                      ("Omelette", ["egg", "cheese"], 3)]:
+        manager.add_recipe(recipejson.recipe_from_dict(
+            {"name": name, "ingredients": ingredients, "steps": ["Cook"], "rating": rating,
+             "is_favourite": False}, manager.factory))
+    return manager
+
+
+@pytest.fixture(params=[RecipeManager, SQLiteRecipeManager])
+def controller(request):
+    manager = catalogue(request.param())
+    app = AppController(manager)
+    yield app
+    manager.close()
+
+
+def test_recommend_like_a_recipe(controller):
+    controller.ui = ScriptedUI(["Pancakes", "1"])
+    controller.handle_input("r")
+    assert controller.ui.shown == ["Crepes"]
+
+
+def test_recommend_unknown_recipe(controller):
+    controller.ui = ScriptedUI(["Waffles"])
+    controller.handle_input("r")
+    assert controller.ui.messages == ["Recipe not found"]
+
+
+def test_recommend_from_favourites(controller):
+    controller.manager.favourite_recipe("Omelette")
+    controller.ui = ScriptedUI(["", "1"])
+    controller.handle_input("r")
+    assert controller.ui.shown == ["Pancakes"]
+
+
+def test_manager_without_menu_calls():
+    partial = catalogue(RecipeManager())
+    partial.recommend = None
+    with pytest.raises(TypeError, match="lacks recommend"):
+        AppController(partial)
+
+
+@pytest.mark.parametrize("answers, message", [
+    (["Pancakes", "7"], "'rating' must be a number from 0 to 5"),
+    (["Pancakes", "nan"], "'rating' must be a number from 0 to 5"),
+    (["Pancakes", "high"], "could not convert string to float: 'high'"),
+    (["Waffles", "3"], "Recipe not found"),
+])
+def test_bad_rating_is_reported(controller, answers, message):
+    controller.ui = ScriptedUI(answers)
+    controller.handle_input("8")
+    assert controller.ui.messages == [message]
+    assert controller.manager.get_recipe("Pancakes").rating == 4
+
+
+def test_favourite_unknown_recipe(controller):
+    controller.ui = ScriptedUI(["Waffles"])
+    controller.handle_input("7")
+    assert controller.ui.messages == ["Recipe not found"]
+
+
+def test_new_recipe_with_bad_rating(controller):
+    controller.ui = ScriptedUI(["Waffles", "flour, egg", "Cook", "done", "lots"])
+    controller.handle_input("1")
+    assert controller.ui.messages == ["could not convert string to float: 'lots'"]
+    with pytest.raises(ValueError):
+        controller.manager.get_recipe("Waffles")
+
+
+def test_failed_load_goes_on_with_an_empty_catalogue(tmp_path):
+    path = tmp_path / "recipes.json"
+    path.write_text("[]")
+    (tmp_path / "recipes.json.journal").write_text('{"op": "delete", "name": "a"}\n{not json\n')
+    app = AppController(recipe_file=str(path))
+    app.loaded.wait(10)
+    app.ui = ScriptedUI(["Pancakes", "Pancakes"])
+    app.handle_input("2")
+    assert app.ui.messages[0].startswith(f"Could not load {path}: Corrupt journal")
+    assert app.ui.messages[1:] == ["Recipe not found"]
+    # said once
+    app.handle_input("2")
+    assert app.ui.messages[2:] == ["Recipe not found"]
+    assert app.manager.size() == 0
@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+import recipejson
+from BinaryRecipeStore import HEADER, BinaryRecipeStore, json_to_store, store_to_json
+from IngredientFactory import IngredientFactory
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_recipes.json")
+
+UNICODE_NAMES = ["Crème Brûlée", "Smørrebrød", "Борщ", "寿司", "Pho 🍜", "Zucchini", "apple pie", "Ærter"]
+
+
+def recipes(names: list[str]):
+    factory = IngredientFactory()
+    return [recipejson.recipe_from_dict({"name": name, "ingredients": ["sel de Guérande", "egg"],
+                                         "steps": [f"Make {name}", "Serve — warm"], "rating": 4.3,
+                                         "is_favourite": i % 2 == 0}, factory)
+            for i, name in enumerate(names)]
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / "recipes.store")
+    BinaryRecipeStore.write(path, recipes(UNICODE_NAMES))
+    return path
+
+
+def test_sample_round_trip(tmp_path):
+    store_path = str(tmp_path / "sample.store")
+    json_path = str(tmp_path / "sample.json")
+    assert json_to_store(SAMPLE, store_path) == []
+    store_to_json(store_path, json_path)
+    with open(SAMPLE, encoding="utf-8") as f:
+        original = json.load(f)
+    with open(json_path, encoding="utf-8") as f:
+        assert json.load(f) == original
+    store = BinaryRecipeStore(store_path)
+    try:
+        assert len(store) == len(original)
+        for entry in original:
+            assert store.get_recipe(entry["name"]).to_dict() == entry
+    finally:
+        store.close()
+
+
+def test_missing_recipe(store_path):
+    store = BinaryRecipeStore(store_path)
+    try:
+        for name in ("Pancakes", "", "borщ", "Zucchini ", "zzz", "\x00"):
+            assert store.find(name) == -1
+            with pytest.raises(ValueError, match="Recipe not found"):
+                store.get_recipe(name)
+        with pytest.raises(IndexError):
+            store[len(store)]
+    finally:
+        store.close()
+
+
+def test_unicode_names(store_path):
+    store = BinaryRecipeStore(store_path)
+    try:
+        assert [r.name for r in store] == UNICODE_NAMES
+        assert list(store.names_sorted()) == sorted(UNICODE_NAMES)
+        for expected in recipes(UNICODE_NAMES):
+            assert store.get_recipe(expected.name).to_dict() == expected.to_dict()
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("names", [["Pancakes", "PANCAKES"], ["Straße", "STRASSE"], ["Æble", "æble"]])
+def test_duplicate_names_ignoring_case(tmp_path, names):
+    path = str(tmp_path / "recipes.store")
+    with pytest.raises(ValueError, match="Duplicate recipe name"):
+        BinaryRecipeStore.write(path, recipes(["Omelette"] + names))
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("cut", [0, 1, HEADER.size - 1, HEADER.size, HEADER.size + 10, -1, -20])
+def test_truncated_file(store_path, cut):
+    with open(store_path, "rb") as f:
+        data = f.read()
+    with open(store_path, "wb") as f:
+        f.write(data[:cut])
+    with pytest.raises(ValueError):
+        BinaryRecipeStore(store_path)
+
+
+def test_corrupt_file(store_path, tmp_path):
+    with open(store_path, "r+b") as f:
+        f.write(b"JSON")
+    with pytest.raises(ValueError, match="not a version"):
+        BinaryRecipeStore(store_path)
+    # a header whose section offsets disagree with each other
+    path = str(tmp_path / "other.store")
+    BinaryRecipeStore.write(path, recipes(UNICODE_NAMES))
+    with open(path, "r+b") as f:
+        f.seek(8)
+        f.write((len(UNICODE_NAMES) + 1).to_bytes(4, "little"))
+    with pytest.raises(ValueError, match="truncated or corrupt"):
+        BinaryRecipeStore(path)
+    with open(SAMPLE, "rb") as src, open(path, "wb") as dst:
+        dst.write(src.read())
+    with pytest.raises(ValueError):
+        BinaryRecipeStore(path)
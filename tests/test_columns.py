@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import CatalogueColumns as columns_module
+from CatalogueColumns import CatalogueColumns
+from IngredientFactory import IngredientFactory
+from RecipeManager import RecipeManager
+
+# ingredient names unique to this file, since tags are process-wide
+INGREDIENTS = [f"cc {name}" for name in ("tomato", "basil", "tofu", "beef", "rice", "chili", "lime", "oats",
+                                         "crème fraîche", "miso")]
+TAGS = {"cc tomato": ["Vegan", "red"], "cc tofu": ["vegan", "protein"], "cc beef": ["meat", "protein"],
+        "cc chili": ["red", "spicy"], "cc crème fraîche": ["dairy"]}
+
+
+@pytest.fixture
+def recipes():
+    for name, tags in TAGS.items():
+        IngredientFactory.set_tags(name, tags)
+    rnd = random.Random(3)
+    manager = RecipeManager()
+    entries = []
+    for i in range(300):
+        ingredients = rnd.sample(INGREDIENTS, rnd.randint(0, 4))
+        if ingredients and rnd.random() < 0.2:
+            # another spelling of an ingredient already used: one ingredient id
+            ingredients.append(ingredients[0].upper() + "S")
+        entries.append({"name": f"Recipé {i}", "ingredients": ingredients, "steps": ["Cook"],
+                        "rating": rnd.choice([0.0, 0.1, 1.3, 2.7, 3.3, 4.1, 4.9, 5.0]),
+                        "is_favourite": rnd.random() < 0.3})
+    manager.apply_batch([{"op": "add", "recipe": e} for e in entries])
+    yield manager.list_all()
+    for name in TAGS:
+        IngredientFactory.set_tags(name, ())
+
+
+def plain_groups(recipes, by: str, column: str) -> dict[str, tuple[int, float]]:
+    # label -> (recipes, mean of column), by a loop over the recipes
+    groups: dict[str, list[float]] = {}
+    for recipe in recipes:
+        ids = set(recipe.ingredient_ids)
+        if by == "ingredient":
+            labels = {IngredientFactory.name_of(i) for i in ids}
+        else:
+            labels = {t.lower() for i in ids for t in IngredientFactory.tags_of(i)}
+        value = recipe.rating if column == "rating" else float(recipe.is_favourite)
+        for label in labels:
+            groups.setdefault(label, []).append(value)
+    return {label: (len(values), sum(values) / len(values)) for label, values in groups.items()}
+
+
+def check_groups(columns: CatalogueColumns, recipes, by: str, column: str):
+    expected = plain_groups(recipes, by, column)
+    counts, means = columns.group_by(by, column)
+    groups = columns.ingredient_count() if by == "ingredient" else columns.tag_count()
+    found = {}
+    for key in range(groups):
+        if counts[key]:
+            found[columns.label(by, key)] = (int(counts[key]), float(means[key]))
+        else:
+            assert np.isnan(means[key])
+    assert found.keys() == expected.keys()
+    for label, (count, mean) in expected.items():
+        assert found[label][0] == count
+        assert found[label][1] == pytest.approx(mean, rel=1e-12)
+
+
+def check_top(columns: CatalogueColumns, recipes, by: str, column: str):
+    expected = plain_groups(recipes, by, column)
+    for min_count in (1, 40):
+        for k in (1, 3, 100):
+            rows = columns.top(by, column, "count", k, min_count)
+            wanted = sorted((c for c in expected.values() if c[0] >= min_count), key=lambda c: -c[0])
+            assert [count for _, count, _ in rows] == [count for count, _ in wanted[:k]]
+            rows = columns.top(by, column, "mean", k, min_count)
+            wanted = sorted((c for c in expected.values() if c[0] >= min_count), key=lambda c: -c[1])
+            assert [mean for _, _, mean in rows] == pytest.approx([mean for _, mean in wanted[:k]], rel=1e-12)
+            for label, count, mean in rows:
+                assert (count, mean) == (expected[label][0], pytest.approx(expected[label][1], rel=1e-12))
+
+
+def check_columns(columns: CatalogueColumns, recipes):
+    assert len(columns) == len(recipes)
+    # ratings read back exactly as rated
+    assert columns.ratings.dtype == np.float64
+    assert columns.ratings.tolist() == [r.rating for r in recipes]
+    assert columns.favourites.tolist() == [r.is_favourite for r in recipes]
+    assert [columns.name(i) for i in range(len(recipes))] == [r.name for r in recipes]
+    for i, recipe in enumerate(recipes):
+        row = columns.indices[columns.indptr[i]:columns.indptr[i + 1]].tolist()
+        assert sorted(row) == sorted(set(recipe.ingredient_ids))
+    for by in ("ingredient", "tag"):
+        for column in ("rating", "favourite"):
+            check_groups(columns, recipes, by, column)
+            check_top(columns, recipes, by, column)
+    summary = columns.summary()
+    assert summary["recipes"] == len(recipes)
+    assert summary["favourites"] == sum(r.is_favourite for r in recipes)
+    assert summary["average_rating"] == pytest.approx(sum(r.rating for r in recipes) / len(recipes), rel=1e-12)
+    assert summary["distinct_ingredients"] == len({i for r in recipes for i in r.ingredient_ids})
+
+
+@pytest.mark.parametrize("chunk", [columns_module.CHUNK, 7])
+def test_columns_match_a_plain_loop(monkeypatch, recipes, chunk):
+    # small chunks and flag blocks take the multi-pass paths
+    monkeypatch.setattr(columns_module, "CHUNK", chunk)
+    if chunk != columns_module.CHUNK:
+        monkeypatch.setattr(columns_module, "FLAG_CELLS", 50)
+    check_columns(CatalogueColumns.from_recipes(recipes), recipes)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load(tmp_path, recipes, mmap):
+    columns = CatalogueColumns.from_recipes(recipes)
+    path = str(tmp_path / "columns.npz")
+    columns.save(path)
+    loaded = CatalogueColumns.load(path, mmap=mmap)
+    for field in columns_module.FIELDS:
+        assert isinstance(getattr(loaded, field), np.memmap) == (mmap and len(getattr(columns, field)) > 0)
+        assert np.array_equal(getattr(loaded, field), getattr(columns, field))
+    check_columns(loaded, recipes)
+
+
+def test_empty_catalogue(tmp_path):
+    columns = CatalogueColumns.from_recipes([])
+    path = str(tmp_path / "empty.npz")
+    columns.save(path)
+    for loaded in (columns, CatalogueColumns.load(path)):
+        assert len(loaded) == 0
+        assert loaded.top("ingredient") == [] and loaded.top("tag", "favourite", "mean") == []
+        assert loaded.summary()["average_rating"] is None
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "recipes.npz"
+    path.write_text("[]")
+    with pytest.raises(ValueError):
+        CatalogueColumns.load(str(path))
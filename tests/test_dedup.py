@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import recipejson
+from AppController import AppController
+from RecipeManager import RecipeManager
+from test_app_controller import ScriptedUI
+
+STEPS = ["Whisk the eggs with the milk", "Pour into a hot buttered pan", "Fold and serve"]
+
+
+def entry(name: str, rating: float = 3.0, is_favourite: bool = False) -> dict:
+    return {"name": name, "ingredients": ["egg", "milk", "butter", "salt", "chives"], "steps": STEPS,
+            "rating": rating, "is_favourite": is_favourite}
+
+
+def recipe(manager: RecipeManager, name: str, **fields):
+    return recipejson.recipe_from_dict(entry(name, **fields), manager.factory)
+
+
+@pytest.fixture
+def manager():
+    manager = RecipeManager()
+    manager.add_recipe(recipe(manager, "Chive Omelette"))
+    manager.add_recipe(recipejson.recipe_from_dict(
+        {"name": "Tomato Soup", "ingredients": ["tomato", "onion", "stock"], "steps": ["Simmer", "Blend"],
+         "rating": 4}, manager.factory))
+    return manager
+
+
+def test_merge_is_reported_not_printed(manager, capsys):
+    manager.enable_dedup(mode="merge")
+    assert manager.add_recipe(recipe(manager, "Chive Omelette!", rating=5.0, is_favourite=True)) == "Chive Omelette"
+    assert manager.add_recipe(recipe(manager, "Pancakes")) is None
+    kept = manager.get_recipe("Chive Omelette")
+    assert (kept.rating, kept.is_favourite) == (5.0, True)
+    assert manager.merged == {"Chive Omelette!": "Chive Omelette"}
+    assert capsys.readouterr().out == ""
+
+
+def test_flagged_are_recorded(manager, capsys):
+    manager.enable_dedup(mode="flag")
+    assert manager.add_recipe(recipe(manager, "Chive Omelette!")) is None
+    assert manager.duplicates == {"Chive Omelette!": "Chive Omelette"}
+    assert capsys.readouterr().out == ""
+
+
+def test_load_counts_outcomes(manager, tmp_path, capsys):
+    manager.enable_dedup(mode="merge")
+    path = tmp_path / "recipes.json"
+    path.write_text(json.dumps([entry("Chive Omelette!"), entry("TOMATO SOUP"), entry("Chive omelette (2)"),
+                                {"name": "Porridge", "ingredients": ["oats"], "steps": ["Boil"], "rating": 3}]))
+    assert manager.load_from_json(str(path)) == []
+    assert capsys.readouterr().out == ""
+    assert manager.ingested == {"added": 1, "skipped": 1, "merged": 2}
+    assert manager.ingest_summary() == "1 recipes added; 1 skipped as duplicate names, 2 merged into near-duplicates"
+    assert manager.import_recipes([recipe(manager, "Rice")]) == 1
+    assert manager.ingest_summary() is None
+
+
+def test_app_says_when_a_recipe_was_merged(manager):
+    manager.enable_dedup(mode="merge")
+    app = AppController(manager)
+    app.ui = ScriptedUI([])
+    app.ui.prompt_for_recipe = lambda: recipe(manager, "Chive Omelette!")
+    app.handle_input("1")
+    assert app.ui.messages == ["Recipe merged into its near-duplicate 'Chive Omelette'."]
@@ -0,0 +1,47 @@
+import pytest
+
+from IngredientFactory import normalize
+
+CASES = [
+    ("Cherry Tomatoes", "cherry tomato"),
+    ("  cherry   TOMATO ", "cherry tomato"),
+    ("berries", "berry"),
+    ("potatoes", "potato"),
+    ("peaches", "peach"),
+    ("dishes", "dish"),
+    ("glasses", "glass"),
+    ("boxes", "box"),
+    ("lentils", "lentil"),
+    ("eggs", "egg"),
+    ("cheeses", "cheese"),
+    ("pies", "pie"),
+    ("peas", "pea"),
+    # too short to strip
+    ("gas", "gas"),
+    # not plurals
+    ("molasses", "molasses"),
+    ("blackstrap molasses", "blackstrap molasses"),
+    ("hummus", "hummus"),
+    ("couscous", "couscous"),
+    ("asparagus", "asparagus"),
+    ("swiss", "swiss"),
+    ("sea bass", "sea bass"),
+    ("tahini", "tahini"),
+    ("peach schnapps", "peach schnapps"),
+    # irregular plurals
+    ("chocolate chip cookies", "chocolate chip cookie"),
+    ("bay leaves", "bay leaf"),
+    # only the last word is reduced
+    ("Peas and Carrots", "peas and carrot"),
+]
+
+
+@pytest.mark.parametrize("name, key", CASES)
+def test_normalize(name, key):
+    assert normalize(name) == key
+
+
+@pytest.mark.parametrize("key", sorted({key for _, key in CASES}))
+def test_a_key_is_its_own_key(key):
+    # so the singular spelling finds the same ingredient as the plural
+    assert normalize(key) == key
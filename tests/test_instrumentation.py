@@ -0,0 +1,48 @@
+import pytest
+
+import instrumentation
+from RecipeManager import RecipeManager
+from RecipeQuery import RecipeQuery
+
+
+@pytest.fixture
+def manager():
+    instrumentation.enable()
+    instrumentation.metrics.reset()
+    manager = RecipeManager()
+    yield manager
+    instrumentation.disable()
+    instrumentation.metrics.reset()
+
+
+def test_batch_query_recommend_and_sync_are_timed(manager):
+    manager.apply_batch([
+        {"op": "add", "recipe": {"name": "Pancakes", "ingredients": ["flour", "egg"], "steps": ["Fry"], "rating": 4}},
+        {"op": "add", "recipe": {"name": "Omelette", "ingredients": ["egg"], "steps": ["Fry"], "rating": 3}},
+    ])
+    manager.rate_many([("Pancakes", 5), ("Omelette", 2)])
+    manager.query(RecipeQuery().using("egg"))
+    manager.explain(RecipeQuery().using("egg"))
+    manager.recommend("Pancakes")
+    manager.changes(0)
+    operations = instrumentation.metrics.operations
+    for name in ("apply_batch", "validate_batch", "rate_many", "query", "explain", "recommend", "changes"):
+        assert operations[f"RecipeManager.{name}"].calls == 1, name
+    assert operations["RecipeManager.apply_batch"].items == 2
+    assert operations["RecipeManager.changes"].items == 2
+
+
+def test_public_methods_are_timed_unless_listed():
+    timed = {attribute for owner, attribute, _ in instrumentation.targets() if owner is RecipeManager}
+    public = {name for name in vars(RecipeManager) if not name.startswith("_") and callable(vars(RecipeManager)[name])}
+    assert public - timed <= set(instrumentation.UNTIMED)
+    assert {"apply_batch", "rate_many", "query", "explain", "recommend", "changes"} <= timed
+
+
+def test_disable_restores_the_originals():
+    original = vars(RecipeManager)["rate_many"]
+    instrumentation.enable()
+    assert vars(RecipeManager)["rate_many"] is not original
+    instrumentation.disable()
+    assert vars(RecipeManager)["rate_many"] is original
+    assert not instrumentation.enabled()
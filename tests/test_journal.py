@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import recipejson
+from RecipeJournal import RecipeJournal
+from RecipeManager import RecipeManager
+
+RECORDS = [
+    {"op": "add", "recipe": {"name": "Crème brûlée", "ingredients": ["cream"], "steps": ["Bake"], "rating": 4}},
+    {"op": "rate", "name": "Crème brûlée", "rating": 5},
+    {"op": "favourite", "name": "Crème brûlée", "is_favourite": True},
+]
+
+
+def write(path, data: bytes):
+    path.write_bytes(b"".join(json.dumps(r).encode() + b"\n" for r in RECORDS) + data)
+
+
+def test_reads_every_record(tmp_path):
+    path = tmp_path / "recipes.json.journal"
+    write(path, b"")
+    assert list(RecipeJournal.read(str(path))) == RECORDS
+    assert list(RecipeJournal.read(str(tmp_path / "missing"))) == []
+
+
+@pytest.mark.parametrize("tail", [b'{"op": "rate", "na', '{"op": "add", "name": "Crè'.encode()[:-1]])
+def test_torn_last_line_is_ignored(tmp_path, tail):
+    path = tmp_path / "recipes.json.journal"
+    write(path, tail)
+    assert list(RecipeJournal.read(str(path))) == RECORDS
+
+
+@pytest.mark.parametrize("line", [b'{"op": "rate", "na\n', b"\xff\xfe\n", b"\n"])
+def test_corrupt_line_raises(tmp_path, line):
+    path = tmp_path / "recipes.json.journal"
+    path.write_bytes(json.dumps(RECORDS[0]).encode() + b"\n" + line + json.dumps(RECORDS[1]).encode() + b"\n")
+    with pytest.raises(ValueError, match="line 2"):
+        list(RecipeJournal.read(str(path)))
+
+
+def test_open_journal_recovers_from_a_torn_write(tmp_path):
+    snapshot = str(tmp_path / "recipes.json")
+    manager = RecipeManager()
+    manager.open_journal(snapshot)
+    manager.add_recipe(recipejson.recipe_from_dict(
+        {"name": "Porridge", "ingredients": ["oats"], "steps": ["Boil"], "rating": 3}, manager.factory))
+    manager.rate_recipe("Porridge", 2.0)
+    manager.close()
+    with open(f"{snapshot}.journal", "ab") as f:
+        f.write(b'{"op": "rate", "name": "Porr')
+    reopened = RecipeManager()
+    reopened.open_journal(snapshot)
+    reopened.rate_recipe("Porridge", 4.0)
+    reopened.close()
+    # the torn record is gone, and the one after it is read back
+    again = RecipeManager()
+    again.open_journal(snapshot)
+    assert again.get_recipe("Porridge").rating == 4.0
+    again.close()
+
+
+def test_replayed_records_count_towards_compaction(tmp_path):
+    # short sessions each adding a few records still get the journal
+    # compacted, instead of it and startup replay growing for ever
+    snapshot = str(tmp_path / "recipes.json")
+    lines = []
+    for session in range(6):
+        manager = RecipeManager()
+        manager.open_journal(snapshot)
+        manager.journal.compact_after = 10
+        if session == 0:
+            manager.add_recipe(recipejson.recipe_from_dict(
+                {"name": "Porridge", "ingredients": ["oats"], "steps": ["Boil"], "rating": 3}, manager.factory))
+        for i in range(8):
+            manager.rate_recipe("Porridge", i % 5)
+        manager.close()
+        with open(f"{snapshot}.journal", "rb") as f:
+            lines.append(len(f.readlines()))
+    assert max(lines) < 18
+    reopened = RecipeManager()
+    reopened.open_journal(snapshot)
+    assert reopened.journal.records == lines[-1]
+    assert reopened.get_recipe("Porridge").rating == 2
+    reopened.close()
@@ -0,0 +1,225 @@
+import json
+
+import pytest
+
+import recipejson
+from AppController import MANAGER_API
+from RecipeManager import RecipeManager
+from SQLiteRecipeManager import SQLiteRecipeManager
+
+# The calls both managers share, checked against each other: same inputs,
+# same recipes out.
+RECIPES = [
+    ("Pancakes", ["flour", "milk", "egg", "sugar"], ["Mix the batter", "Fry"], 4.0),
+    ("Omelette", ["egg", "cheese", "butter"], ["Whisk eggs", "Fry"], 3.5),
+    ("Tomato Soup", ["tomatoes", "onion", "stock"], ["Simmer", "Blend"], 4.5),
+    ("Cheese Toast", ["bread", "cheese"], ["Toast"], 2.0),
+    ("French Toast", ["bread", "egg", "milk"], ["Soak bread", "Fry"], 4.0),
+]
+
+
+def recipe(manager, name: str, ingredients: list[str], steps: list[str] = ("Cook",), rating: float = 3.0,
+           is_favourite: bool = False):
+    return recipejson.recipe_from_dict({"name": name, "ingredients": ingredients, "steps": list(steps),
+                                        "rating": rating, "is_favourite": is_favourite}, manager.factory)
+
+
+def names(recipes) -> list[str]:
+    return [r.name for r in recipes]
+
+
+@pytest.fixture(params=[RecipeManager, SQLiteRecipeManager], ids=["memory", "sqlite"])
+def manager(request):
+    manager = request.param()
+    for name, ingredients, steps, rating in RECIPES:
+        manager.add_recipe(recipe(manager, name, ingredients, steps, rating))
+    yield manager
+    manager.close()
+
+
+def test_app_controller_calls_exist(manager):
+    assert all(callable(getattr(manager, call, None)) for call in MANAGER_API)
+
+
+def test_add_and_get(manager):
+    manager.add_recipe(recipe(manager, "Porridge", ["oats", "milk"], rating=3.0))
+    found = manager.get_recipe("Porridge")
+    assert (found.name, found.ingredient_names(), found.rating) == ("Porridge", ["oats", "milk"], 3.0)
+    assert names(manager.list_all())[-1] == "Porridge"
+
+
+def test_add_existing_name(manager):
+    with pytest.raises(ValueError, match="already exists"):
+        manager.add_recipe(recipe(manager, "Omelette", ["egg"]))
+    assert len(manager.list_all()) == len(RECIPES)
+
+
+def test_names_are_unique_ignoring_case(manager):
+    with pytest.raises(ValueError, match="already exists"):
+        manager.add_recipe(recipe(manager, "OMELETTE", ["egg"]))
+    with pytest.raises(ValueError, match="already exists"):
+        manager.edit_recipe("Pancakes", recipe(manager, "french toast", ["bread"]))
+    assert names(manager.list_all()) == [name for name, *_ in RECIPES]
+    # a recipe can change the case of its own name
+    manager.edit_recipe("Omelette", recipe(manager, "OMELETTE", ["egg"]))
+    assert names(manager.list_all())[-1] == "OMELETTE"
+
+
+def test_load_keeps_first_of_duplicate_names(manager, tmp_path, capsys):
+    path = tmp_path / "recipes.json"
+    path.write_text(json.dumps([
+        {"name": "Porridge", "ingredients": ["oats"], "steps": ["Boil"], "rating": 3},
+        {"name": "Scones", "ingredients": ["flour"], "steps": ["Bake"], "rating": 4},
+        {"name": "Porridge", "ingredients": ["rice"], "steps": ["Stir"], "rating": 5},
+        {"name": "PORRIDGE", "ingredients": ["milk"], "steps": ["Heat"], "rating": 1},
+        {"name": "pancakes", "ingredients": ["flour"], "steps": ["Fry"], "rating": 1},
+    ]))
+    assert manager.load_from_json(str(path)) == []
+    assert names(manager.list_all()) == [name for name, *_ in RECIPES] + ["Porridge", "Scones"]
+    porridge = manager.get_recipe("Porridge")
+    assert (porridge.ingredient_names(), porridge.rating) == (["oats"], 3.0)
+    assert manager.get_recipe("Pancakes").rating == 4.0
+    # counted, not printed one by one
+    assert capsys.readouterr().out == ""
+    assert manager.ingest_summary() == "2 recipes added; 3 skipped as duplicate names"
+
+
+def test_list_all_keeps_insertion_order(manager):
+    manager.add_recipe(recipe(manager, "Apple Pie", ["apples"]))
+    manager.rate_recipe("Pancakes", 1.0)
+    manager.favourite_recipe("Omelette")
+    manager.delete_recipe("Tomato Soup")
+    assert names(manager.list_all()) == ["Pancakes", "Omelette", "Cheese Toast", "French Toast", "Apple Pie"]
+
+
+def test_get_missing(manager):
+    with pytest.raises(ValueError, match="Recipe not found"):
+        manager.get_recipe("Waffles")
+
+
+def test_edit_moves_to_end(manager):
+    manager.edit_recipe("Omelette", recipe(manager, "Cheese Omelette", ["egg", "cheese"], rating=5.0))
+    assert names(manager.list_all()) == ["Pancakes", "Tomato Soup", "Cheese Toast", "French Toast",
+                                         "Cheese Omelette"]
+    with pytest.raises(ValueError):
+        manager.get_recipe("Omelette")
+    with pytest.raises(ValueError, match="Recipe not found"):
+        manager.edit_recipe("Waffles", recipe(manager, "Waffles", ["flour"]))
+    with pytest.raises(ValueError, match="already exists"):
+        manager.edit_recipe("Pancakes", recipe(manager, "French Toast", ["bread"]))
+
+
+def test_delete(manager):
+    manager.delete_recipe("Omelette")
+    manager.delete_recipe("Waffles")
+    assert "Omelette" not in names(manager.list_all())
+    assert "Omelette" not in names(manager.find_by_ingredients(["cheese"]))
+    assert "Omelette" not in names(manager.search("omelette"))
+
+
+def test_rate(manager):
+    manager.rate_recipe("Cheese Toast", 5.0)
+    assert manager.get_recipe("Cheese Toast").rating == 5.0
+    assert names(manager.top_rated(1)) == ["Cheese Toast"]
+    with pytest.raises(ValueError, match="Recipe not found"):
+        manager.rate_recipe("Waffles", 3.0)
+
+
+@pytest.mark.parametrize("rating", [float("nan"), float("inf"), -1, 6])
+def test_bad_ratings_are_rejected(manager, rating):
+    with pytest.raises(ValueError, match="'rating' must be a number from 0 to 5"):
+        manager.rate_recipe("Cheese Toast", rating)
+    bad = recipe(manager, "Porridge", ["oats"])
+    bad.rating = rating
+    with pytest.raises(ValueError, match="'rating' must be a number from 0 to 5"):
+        manager.add_recipe(bad)
+    with pytest.raises(ValueError, match="'rating' must be a number from 0 to 5"):
+        manager.edit_recipe("Omelette", bad)
+    with pytest.raises(ValueError, match="'rating' must be a number from 0 to 5"):
+        recipe(manager, "Porridge", ["oats"], rating=rating)
+    assert names(manager.list_all()) == [name for name, *_ in RECIPES]
+    assert manager.get_recipe("Cheese Toast").rating == 2.0
+
+
+def test_favourite_toggles(manager):
+    manager.favourite_recipe("French Toast")
+    manager.favourite_recipe("Pancakes")
+    assert names(manager.list_favourites()) == ["Pancakes", "French Toast"]
+    manager.favourite_recipe("Pancakes")
+    assert names(manager.list_favourites()) == ["French Toast"]
+    assert manager.get_recipe("French Toast").is_favourite
+    with pytest.raises(ValueError, match="Recipe not found"):
+        manager.favourite_recipe("Waffles")
+
+
+def test_search(manager):
+    assert set(names(manager.search("toast"))) == {"Cheese Toast", "French Toast"}
+    # ingredients and steps are searched too, by prefix
+    assert set(names(manager.search("chee"))) == {"Omelette", "Cheese Toast"}
+    assert names(manager.search("blend")) == ["Tomato Soup"]
+    assert manager.search("waffles") == []
+    assert len(manager.search("fry", limit=2)) == 2
+
+
+def test_sorts(manager):
+    assert names(manager.sort_name()) == ["Cheese Toast", "French Toast", "Omelette", "Pancakes", "Tomato Soup"]
+    assert names(manager.sort_name(1, 2)) == ["French Toast", "Omelette"]
+    # equal ratings keep listing order
+    assert names(manager.sort_rating()) == ["Tomato Soup", "Pancakes", "French Toast", "Omelette",
+                                            "Cheese Toast"]
+    assert names(manager.top_rated(2)) == ["Tomato Soup", "Pancakes"]
+
+
+@pytest.mark.parametrize("order, expected", [
+    ("all", ["Pancakes", "Omelette", "Tomato Soup", "Cheese Toast", "French Toast"]),
+    ("name", ["Cheese Toast", "French Toast", "Omelette", "Pancakes", "Tomato Soup"]),
+    ("rating", ["Tomato Soup", "Pancakes", "French Toast", "Omelette", "Cheese Toast"]),
+])
+def test_cursor(manager, order, expected):
+    cursor = manager.cursor(order)
+    assert cursor.total == len(expected)
+    assert names(cursor.fetch(0, 2)) == expected[:2]
+    assert names(cursor.fetch(2, 10)) == expected[2:]
+    assert cursor.fetch(10, 2) == []
+
+
+def test_cursor_favourites(manager):
+    manager.favourite_recipe("Omelette")
+    manager.favourite_recipe("Pancakes")
+    cursor = manager.cursor("favourites")
+    assert cursor.total == 2
+    assert names(cursor.fetch(0, 5)) == ["Pancakes", "Omelette"]
+    with pytest.raises(ValueError, match="Unknown order"):
+        manager.cursor("colour")
+
+
+def test_find_by_ingredients(manager):
+    assert names(manager.find_by_ingredients(["egg", "milk"])) == ["Pancakes", "French Toast"]
+    assert names(manager.find_by_ingredients([], ["cheese", "stock"])) == ["Omelette", "Tomato Soup",
+                                                                           "Cheese Toast"]
+    assert names(manager.find_by_ingredients(["bread"], [], ["egg"])) == ["Cheese Toast"]
+    # plurals and case are ignored
+    assert names(manager.find_by_ingredients(["Tomato"])) == ["Tomato Soup"]
+
+
+def test_cook_with(manager):
+    matches = [(r.name, lacking) for r, lacking in manager.cook_with(["bread", "cheese", "egg"], missing=1)]
+    assert matches == [("Cheese Toast", 0), ("Omelette", 1), ("French Toast", 1)]
+    assert [(r.name, lacking) for r, lacking in manager.cook_with(["bread", "cheese"])] == [("Cheese Toast", 0)]
+
+
+def test_recommend(manager):
+    assert names(r for r, _ in manager.recommend("Pancakes", k=2)) == ["French Toast", "Omelette"]
+    assert names(r for r, _ in manager.recommend(pantry=["bread"], k=5)) == ["Cheese Toast", "French Toast"]
+    with pytest.raises(ValueError):
+        manager.recommend("Pancakes", pantry=["egg"])
+
+
+def test_json_round_trip(manager, tmp_path):
+    path = str(tmp_path / "recipes.json")
+    manager.save_to_json(path)
+    copy = type(manager)()
+    assert copy.load_from_json(path) == []
+    assert [(r.name, r.ingredient_names(), r.steps, r.rating) for r in copy.list_all()] == \
+        [(r.name, r.ingredient_names(), r.steps, r.rating) for r in manager.list_all()]
+    copy.close()
@@ -0,0 +1,151 @@
+import random
+
+import pytest
+
+from IngredientFactory import IngredientFactory, normalize
+from RecipeManager import RecipeManager
+from RecipeQuery import RecipeQuery
+from SearchIndex import tokenize
+
+# ingredient names unique to this file, since tags are process-wide
+INGREDIENTS = [f"qp {name}" for name in ("basil", "tofu", "lentils", "paneer", "chili", "lime", "rice",
+                                         "beef", "oats", "kale", "miso", "cod")]
+TAGS = {"qp tofu": ["Vegan", "protein"], "qp lentils": ["vegan", "protein"], "qp paneer": ["vegetarian"],
+        "qp beef": ["meat", "protein"], "qp cod": ["fish", "protein"], "qp chili": ["spicy"]}
+WORDS = ["green", "quick", "red", "hot", "slow", "curry", "bowl", "salad", "stew", "soup"]
+
+
+@pytest.fixture
+def tagged():
+    for name, tags in TAGS.items():
+        IngredientFactory.set_tags(name, tags)
+    yield
+    for name in TAGS:
+        IngredientFactory.set_tags(name, ())
+
+
+@pytest.fixture
+def manager(tagged):
+    rnd = random.Random(7)
+    manager = RecipeManager()
+    manager.apply_batch([{"op": "add", "recipe": {
+        "name": f"{' '.join(rnd.sample(WORDS, rnd.randint(1, 3)))} {i}",
+        "ingredients": rnd.sample(INGREDIENTS, rnd.randint(1, 5)),
+        "steps": ["Cook"],
+        "rating": rnd.choice([0.0, 1.5, 2.0, 3.0, 3.5, 4.0, 4.5, 5.0]),
+        "is_favourite": rnd.random() < 0.15}} for i in range(400)])
+    # edits move recipes to the end of the listing and re-rating reorders them
+    for recipe in rnd.sample(manager.list_all(), 40):
+        manager.rate_recipe(recipe.name, rnd.choice([1.0, 2.5, 4.5]))
+    return manager
+
+
+def brute_force(manager: RecipeManager, query: RecipeQuery) -> list[str]:
+    # every recipe checked against every predicate, then ordered and cut
+    def has(recipe, name):
+        return normalize(name) in {normalize(n) for n in recipe.ingredient_names()}
+
+    def tags_of(recipe):
+        return {t.lower() for ingredient in recipe.ingredients for t in ingredient.tags}
+
+    listing = list(manager.list_all())
+    matches = []
+    for position, recipe in enumerate(listing):
+        words = tokenize(recipe.name)
+        if not all(any(w.startswith(t) for w in words) for t in query.text):
+            continue
+        if query.min_rating is not None and recipe.rating < query.min_rating:
+            continue
+        if query.max_rating is not None and recipe.rating > query.max_rating:
+            continue
+        if query.favourite is not None and recipe.is_favourite != query.favourite:
+            continue
+        if not all(has(recipe, n) for n in query.includes) or any(has(recipe, n) for n in query.excludes):
+            continue
+        if not all(tag in tags_of(recipe) for tag in query.tags):
+            continue
+        matches.append((position, recipe))
+    if query.order == "name":
+        matches.sort(key=lambda m: (m[1].name, m[0]))
+    elif query.order == "rating":
+        matches.sort(key=lambda m: (-m[1].rating, m[0]))
+    return [recipe.name for _, recipe in matches][:query.count]
+
+
+def random_query(rnd: random.Random) -> RecipeQuery:
+    query = RecipeQuery()
+    if rnd.random() < 0.3:
+        query.named(" ".join(w[:rnd.randint(1, len(w))] for w in rnd.sample(WORDS, rnd.randint(1, 2))))
+    if rnd.random() < 0.4:
+        query.rating(low=rnd.choice([None, 0, 1.5, 2.2, 3.5]), high=rnd.choice([None, 2.2, 3.5, 4.5, 5]))
+    if rnd.random() < 0.3:
+        query.favourites(rnd.random() < 0.5)
+    if rnd.random() < 0.5:
+        query.using(*rnd.sample(INGREDIENTS + ["qp unknown"], rnd.randint(1, 2)))
+    if rnd.random() < 0.3:
+        query.without(*rnd.sample(INGREDIENTS + ["qp unknown"], rnd.randint(1, 2)))
+    if rnd.random() < 0.3:
+        query.tagged(rnd.choice(["vegan", "PROTEIN", "spicy", "fish", "none"]))
+    query.order_by(rnd.choice(["listing", "name", "rating"]))
+    if rnd.random() < 0.6:
+        query.limit(rnd.choice([0, 1, 3, 10, 50]))
+    return query
+
+
+def test_queries_match_brute_force(manager):
+    rnd = random.Random(1)
+    modes = set()
+    for _ in range(400):
+        query = random_query(rnd)
+        expected = brute_force(manager, query)
+        assert [r.name for r in manager.query(query)] == expected, str(query)
+        # the same query written out and parsed back
+        parsed = RecipeQuery.parse(str(query))
+        assert parsed.key() == query.key()
+        assert [r.name for r in manager.query(parsed)] == expected, str(query)
+        plan = manager.planner.plan(query, manager.snapshot)
+        assert plan.execute(manager.snapshot) == [manager.snapshot.rid_of(n) for n in expected]
+        modes.add(plan.mode)
+    assert modes == {"scan", "candidates"}
+
+
+@pytest.mark.parametrize("text, mode, driver", [
+    # a rare ingredient: collect its recipes rather than scan
+    ("with:'qp cod' order:rating", "candidates", "ingredient index qp cod"),
+    # the best few by rating: walk the rating order and stop early
+    ("order:rating limit:3", "scan", "rating index"),
+    ("fav", "scan", "favourites index"),
+    ("rating>=1 rating<=4.5 limit:2", "scan", "listing order"),
+    ("tag:fish -fav", "candidates", "tag fish"),
+    ("order:name limit:5", "scan", "name order"),
+])
+def test_plan_selection(manager, text, mode, driver):
+    plan = manager.planner.plan(RecipeQuery.parse(text), manager.snapshot)
+    assert plan.mode == mode
+    assert plan.driver.label.startswith(driver)
+    assert [manager.snapshot.rid_of(r.name) for r in manager.query(RecipeQuery.parse(text))] == \
+        plan.execute(manager.snapshot)
+
+
+def test_parse():
+    query = RecipeQuery.parse('Green curry rating>=2 rating<=4.5 rating>=3 -fav with:"qp chili" '
+                              'without:qp\\ beef tag:Vegan order:name limit:5')
+    assert query.text == ["green", "curry"]
+    assert (query.min_rating, query.max_rating, query.favourite) == (3.0, 4.5, False)
+    assert (query.includes, query.excludes, query.tags) == (["qp chili"], ["qp beef"], ["vegan"])
+    assert (query.order, query.count) == ("name", 5)
+    assert RecipeQuery.parse("").key() == RecipeQuery().key()
+    for bad in ("rating>=x", "limit:-1", "limit:", "order:price", "colour:red", 'with:"qp', "with:"):
+        with pytest.raises(ValueError):
+            RecipeQuery.parse(bad)
+
+
+def test_tags_can_be_set_on_loaded_ingredients(manager):
+    query = RecipeQuery().tagged("spicy")
+    spicy = brute_force(manager, query)
+    assert spicy and [r.name for r in manager.query(query)] == spicy
+    # a tag change reaches cached results
+    IngredientFactory.set_tags("qp chili", ())
+    assert manager.query(query) == []
+    IngredientFactory.set_tags("QP  Chili", ["spicy"])
+    assert [r.name for r in manager.query(query)] == spicy
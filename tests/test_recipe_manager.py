@@ -0,0 +1,196 @@
+import sys
+import threading
+
+import pytest
+
+import recipejson
+from RecipeManager import RecipeManager
+from RecipeQuery import RecipeQuery
+
+
+def recipe(manager, name: str, rating: float = 3.0):
+    return recipejson.recipe_from_dict({"name": name, "ingredients": ["egg"], "steps": ["Cook"],
+                                        "rating": rating}, manager.factory)
+
+
+@pytest.fixture
+def manager():
+    manager = RecipeManager()
+    for name in ("Pancakes", "Omelette", "Soup"):
+        manager.add_recipe(recipe(manager, name))
+    return manager
+
+
+def test_lookups_use_the_exact_name(manager):
+    with pytest.raises(ValueError, match="Recipe not found"):
+        manager.get_recipe("pancakes")
+    assert manager.name_taken("pancakes")
+    assert not manager.name_taken("PANCAKES", "Pancakes")
+    assert manager.name_taken("omelette", "Pancakes")
+
+
+def test_batch_names_are_unique_ignoring_case(manager):
+    with pytest.raises(ValueError, match="Operation 1: Recipe 'SOUP' already exists"):
+        manager.apply_batch([{"op": "add", "recipe": recipe(manager, "Stew")},
+                             {"op": "add", "recipe": recipe(manager, "SOUP")}])
+    with pytest.raises(ValueError, match="Operation 1: Recipe 'stew' already exists"):
+        manager.apply_batch([{"op": "add", "recipe": recipe(manager, "Stew")},
+                             {"op": "edit", "name": "Soup", "recipe": recipe(manager, "stew")}])
+    # a name freed earlier in the batch can be taken again
+    manager.apply_batch([{"op": "delete", "name": "Soup"},
+                         {"op": "edit", "name": "Omelette", "recipe": recipe(manager, "soup")},
+                         {"op": "add", "recipe": recipe(manager, "OMELETTE")}])
+    assert [r.name for r in manager.list_all()] == ["Pancakes", "soup", "OMELETTE"]
+
+
+def test_import_skips_names_taken_in_any_case(manager):
+    assert manager.import_recipes([recipe(manager, "SOUP"), recipe(manager, "Stew"), recipe(manager, "stew")]) == 1
+    assert [r.name for r in manager.list_all()] == ["Pancakes", "Omelette", "Soup", "Stew"]
+
+
+def test_delete_frees_the_name(manager):
+    manager.delete_recipe("Soup")
+    manager.add_recipe(recipe(manager, "SOUP", 5.0))
+    assert manager.get_recipe("SOUP").rating == 5.0
+
+
+BAD_RATINGS = [float("nan"), float("inf"), -1, 6, "4", True]
+
+
+@pytest.mark.parametrize("rating", BAD_RATINGS)
+def test_batches_reject_bad_ratings(manager, rating):
+    with pytest.raises(ValueError, match="Operation 1: 'rating' must be a number from 0 to 5"):
+        manager.rate_many([("Pancakes", 5), ("Soup", rating)])
+    with pytest.raises(ValueError, match="Operation 1: 'rating' must be a number from 0 to 5"):
+        manager.apply_batch([{"op": "rate", "name": "Pancakes", "rating": 5},
+                             {"op": "rate", "name": "Soup", "rating": rating}])
+    stew = recipe(manager, "Stew")
+    stew.rating = rating
+    with pytest.raises(ValueError, match="Operation 0: 'rating' must be a number from 0 to 5"):
+        manager.apply_batch([{"op": "add", "recipe": stew}])
+    # nothing was applied, and the rating order still holds every recipe
+    assert [r.rating for r in manager.list_all()] == [3.0, 3.0, 3.0]
+    assert [r.name for r in manager.sort_rating()] == ["Pancakes", "Omelette", "Soup"]
+
+
+def test_ratings_from_0_to_5_are_accepted(manager):
+    manager.rate_many({"Pancakes": 0, "Omelette": 5, "Soup": 2.5})
+    assert [r.name for r in manager.sort_rating()] == ["Omelette", "Soup", "Pancakes"]
+
+
+def test_readers_see_whole_writes_while_a_writer_runs():
+    # Every write rates all recipes alike and swaps the one "Temp" recipe for
+    # the next, so any state a reader sees halfway through a write would
+    # show mixed ratings or no or two Temps.
+    manager = RecipeManager()
+    dishes = [f"Dish {i}" for i in range(100)]
+
+    def entry(name: str, rating: float) -> dict:
+        return {"name": name, "ingredients": ["egg"], "steps": ["Cook"], "rating": rating}
+
+    manager.apply_batch([{"op": "add", "recipe": entry(name, 0.0)} for name in dishes + ["Temp 0"]])
+    writes = 150
+    done = threading.Event()
+    failures = []
+    seen = set()
+
+    def check(recipes, where: str):
+        ratings = {r.rating for r in recipes}
+        temps = [r.name for r in recipes if r.name.startswith("Temp")]
+        if len(recipes) != len(dishes) + 1 or len(ratings) != 1 or len(temps) != 1:
+            failures.append(f"{where}: {len(recipes)} recipes, ratings {sorted(ratings)}, {temps}")
+        seen.update(ratings)
+
+    def writer():
+        try:
+            for step in range(1, writes + 1):
+                rating = step % 11 / 2
+                manager.apply_batch([{"op": "rate", "name": name, "rating": rating} for name in dishes]
+                                    + [{"op": "delete", "name": f"Temp {step - 1}"},
+                                       {"op": "add", "recipe": entry(f"Temp {step}", rating)}])
+        finally:
+            done.set()
+
+    def reader(read):
+        def run():
+            try:
+                while not done.is_set():
+                    read()
+            except Exception as e:
+                failures.append(repr(e))
+        return run
+
+    def read_snapshot():
+        snapshot = manager.snapshot
+        before = [(r.name, r.rating) for r in snapshot.values()]
+        check(list(snapshot.values()), "snapshot")
+        # a snapshot held across later writes does not change
+        if [(r.name, r.rating) for r in snapshot.values()] != before:
+            failures.append("snapshot changed under its reader")
+
+    def read_indexes():
+        check(manager.query(RecipeQuery().order_by("rating")), "rating order")
+        check(manager.query(RecipeQuery().order_by("name")), "name order")
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [threading.Thread(target=target) for target in
+                   (writer, reader(read_snapshot), reader(read_snapshot), reader(read_indexes), reader(read_indexes))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert failures == []
+    # the readers ran alongside the writes, not just before or after them
+    assert len(seen) > 2
+    check(manager.list_all(), "end")
+    assert manager.get_recipe(f"Temp {writes}").rating == writes % 11 / 2
+
+
+def cache_hit(manager, read) -> tuple[bool, list[str]]:
+    # whether read() was answered from the query cache, and the names it gave
+    hits = manager.cache_stats()["queries"]["hits"]
+    names = [r.name for r in read()]
+    return manager.cache_stats()["queries"]["hits"] > hits, names
+
+
+@pytest.mark.parametrize("query, write, after", [
+    (RecipeQuery().rating(low=3.5), lambda m: m.rate_recipe("Soup", 4.0), ["Soup"]),
+    (RecipeQuery().order_by("rating").limit(1), lambda m: m.rate_recipe("Soup", 4.0), ["Soup"]),
+    (RecipeQuery().favourites(), lambda m: m.favourite_recipe("Omelette"), ["Omelette"]),
+    (RecipeQuery().named("ome"), lambda m: m.edit_recipe("Omelette", recipe(m, "Frittata")), []),
+    (RecipeQuery().order_by("name"), lambda m: m.edit_recipe("Soup", recipe(m, "Broth")),
+     ["Broth", "Omelette", "Pancakes"]),
+    (RecipeQuery().order_by("name"), lambda m: m.delete_recipe("Pancakes"), ["Omelette", "Soup"]),
+    (RecipeQuery().using("egg").order_by("name"), lambda m: m.apply_batch([{"op": "delete", "name": "Soup"}]),
+     ["Omelette", "Pancakes"]),
+])
+def test_writes_invalidate_cached_queries(manager, query, write, after):
+    assert cache_hit(manager, lambda: manager.query(query))[0] is False
+    assert cache_hit(manager, lambda: manager.query(query))[0] is True
+    write(manager)
+    assert cache_hit(manager, lambda: manager.query(query)) == (False, after)
+    assert cache_hit(manager, lambda: manager.query(query)) == (True, after)
+
+
+@pytest.mark.parametrize("read, write", [
+    # content only: neither ratings nor favourites change what they return
+    (lambda m: m.query(RecipeQuery().named("pan")), lambda m: m.rate_recipe("Pancakes", 5.0)),
+    (lambda m: m.query(RecipeQuery().using("egg").order_by("name")), lambda m: m.favourite_recipe("Soup")),
+    (lambda m: m.search("omelette"), lambda m: m.rate_many({"Omelette": 1.0, "Soup": 2.0})),
+    (lambda m: m.sort_name(), lambda m: m.favourite_recipe("Pancakes")),
+    (lambda m: m.list_favourites(), lambda m: m.rate_recipe("Soup", 0.5)),
+    (lambda m: m.query(RecipeQuery().favourites(False)), lambda m: m.rate_recipe("Soup", 0.5)),
+    (lambda m: m.sort_rating(), lambda m: m.favourite_recipe("Pancakes")),
+])
+def test_unrelated_writes_leave_queries_cached(manager, read, write):
+    assert cache_hit(manager, lambda: read(manager))[0] is False
+    write(manager)
+    hit, names = cache_hit(manager, lambda: read(manager))
+    assert hit
+    # the cached ids resolve to the recipes as they are now
+    manager.query_cache.clear()
+    assert cache_hit(manager, lambda: read(manager)) == (False, names)
@@ -0,0 +1,16 @@
+import json
+
+import recipecli
+
+
+def test_convert_skips_names_taken_in_any_case(tmp_path, capsys):
+    source, target = tmp_path / "in.json", tmp_path / "out.jsonl"
+    source.write_text(json.dumps([
+        {"name": name, "ingredients": ["oats"], "steps": ["Boil"], "rating": 3}
+        for name in ("Porridge", "Scones", "PORRIDGE", "porridge")
+    ]))
+    assert recipecli.main(["--workers", "1", "convert", str(source), str(target)]) == 0
+    assert [json.loads(line)["name"] for line in target.read_text().splitlines()] == ["Porridge", "Scones"]
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "2 recipes added; 2 skipped as duplicate names"
+    assert out[1].startswith("Converted 2 recipes")
@@ -0,0 +1,114 @@
+import io
+import json
+
+import pytest
+
+from recipejson import iter_json_records
+
+RECORDS = [{"name": "Crème Brûlée", "steps": ["Heat {slowly}", "Chill, then \"torch\""]},
+           {"name": "寿司", "rating": 4.5},
+           {"op": "add", "recipe": {"name": "Soup [v2]", "ingredients": ["leek"]}},
+           {"name": "Toast\\", "rating": 3}]
+
+
+def read(text: str, chunk_size: int = 7, offset: int = 0):
+    errors = []
+    records = list(iter_json_records(io.BytesIO(text.encode("utf-8")), errors, chunk_size, offset))
+    return records, [(e.index, e.offset, e.message) for e in errors]
+
+
+def byte_offset(text: str, fragment: str) -> int:
+    return len(text[:text.index(fragment)].encode("utf-8"))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+@pytest.mark.parametrize("layout", ["array", "indented", "lines"])
+def test_offsets(chunk_size, layout):
+    if layout == "array":
+        text = "[" + ", ".join(json.dumps(r, ensure_ascii=False) for r in RECORDS) + "]"
+    elif layout == "indented":
+        text = json.dumps(RECORDS, indent=4, ensure_ascii=False)
+    else:
+        text = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in RECORDS)
+    records, errors = read(text, chunk_size)
+    assert errors == []
+    assert [value for _, _, value in records] == RECORDS
+    data = text.encode("utf-8")
+    for index, offset, value in records:
+        # each offset is where its record starts
+        assert json.JSONDecoder().raw_decode(data[offset:].decode("utf-8"))[0] == value
+        assert index == RECORDS.index(value)
+
+
+def test_slice_offsets():
+    # the records after the "[" of an array, read from where they start
+    text = '[{"name": "é"},\n {"name": "b"},\n {"name": "c"}]'
+    start = byte_offset(text, '{"name": "b"}')
+    records, errors = read(text.encode("utf-8")[start:].decode("utf-8"), offset=start)
+    assert errors == []
+    assert [(i, o) for i, o, _ in records] == [(0, start), (1, byte_offset(text, '{"name": "c"}'))]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+@pytest.mark.parametrize("bad", [
+    '{"name": "x", "rating": 4,5}',
+    '{"name": "x", "rating": }',
+    # a malformed record holding braces and brackets in strings and nested objects
+    '{"name": "half {open", "steps": ["[", "a\\"{"], "rating": nope}',
+    '{"op": add, "recipe": {"name": "{inner}", "steps": []}}',
+    '{"op": "add", "recipe": {"name": "x", "rating": 4.}}',
+    # brackets that do not pair up
+    '{"name": "x", "steps": ["a"}',
+    '{"name": "x", "steps": ["a"]',
+    '{"name": "x}',
+    'nonsense',
+])
+def test_recovery_after_a_bad_record(chunk_size, bad):
+    for layout in ("array", "lines"):
+        good = [json.dumps(r, ensure_ascii=False) for r in RECORDS]
+        if layout == "array":
+            text = "[\n" + ",\n".join(good[:2] + [bad] + good[2:]) + "\n]"
+        else:
+            text = "\n".join(good[:2] + [bad] + good[2:]) + "\n"
+        records, errors = read(text, chunk_size)
+        assert [(i, v) for i, _, v in records] == [(0, RECORDS[0]), (1, RECORDS[1]), (3, RECORDS[2]),
+                                                   (4, RECORDS[3])], (layout, bad)
+        assert [(i, o) for i, o, _ in errors] == [(2, byte_offset(text, bad))], (layout, bad)
+        assert [o for _, o, _ in records][2:] == [byte_offset(text, g) for g in good[2:]]
+
+
+def test_missing_comma():
+    text = '[{"name": "a"}, {"name": "b"}\n {"name": "c"}, {"name": "d"}{"name": "e"}]'
+    records, errors = read(text)
+    assert [(i, v["name"]) for i, _, v in records] == [(0, "a"), (1, "b"), (3, "d")]
+    assert errors == [(2, byte_offset(text, '{"name": "c"}'), "missing ',' before this element"),
+                      (4, byte_offset(text, '{"name": "e"}'), "missing ',' before this element")]
+    # in a slice, once a comma shows the elements are comma separated
+    records, errors = read('{"name": "a"}, {"name": "b"} {"name": "c"}')
+    assert [i for i, _, _ in records] == [0, 1]
+    assert [i for i, _, _ in errors] == [2]
+    # JSON Lines need none
+    records, errors = read('{"name": "a"}\n{"name": "b"}\n')
+    assert len(records) == 2 and errors == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_truncated_file(chunk_size):
+    text = json.dumps(RECORDS, indent=4, ensure_ascii=False)
+    # cut inside the last record: one error for it, no more
+    cut = text[:text.index('"Toast') + 3]
+    records, errors = read(cut, chunk_size)
+    assert [v for _, _, v in records] == RECORDS[:3]
+    assert [(i, o) for i, o, _ in errors] == [(3, byte_offset(text, '{\n        "name": "Toast'))]
+    # cut after a whole record: the array is not closed
+    cut = text[:text.rindex("}") + 1]
+    records, errors = read(cut, chunk_size)
+    assert [v for _, _, v in records] == RECORDS
+    assert errors == [(4, len(cut.encode("utf-8")), "unexpected end of file")]
+    # cut in the middle of a multi-byte character
+    data = text.encode("utf-8")
+    cut = data[:data.index("寿".encode("utf-8")) + 1]
+    errors = []
+    records = list(iter_json_records(io.BytesIO(cut), errors, chunk_size))
+    assert [v for _, _, v in records] == RECORDS[:1]
+    assert [e.index for e in errors] == [1]
@@ -0,0 +1,76 @@
+import heapq
+import math
+import random
+
+import pytest
+
+import SearchIndex
+from RecipeManager import RecipeManager
+
+WORDS = ["salt", "salmon", "salad", "pepper", "peppers", "egg", "eggplant", "flour", "fry", "bake",
+         "garlic", "lemon", "soup", "stew", "toast", "cheese", "chees", "onion", "rice", "sage"]
+
+
+def exhaustive(index: SearchIndex.SearchIndex, query: str, limit: int) -> list[tuple[int, float]]:
+    # scores every posting of every term, as search did before it stopped early
+    tokens = SearchIndex.tokenize(query)
+    if not tokens or not index.doc_lengths:
+        return []
+    n_docs = len(index.doc_lengths)
+    avg_length = index.total_length / n_docs
+    expanded: dict[str, float] = {}
+    for token in tokens:
+        for term, boost in index.expand(token).items():
+            expanded[term] = max(boost, expanded.get(term, 0.0))
+    scores: dict[int, float] = {}
+    for term in sorted(expanded, key=lambda t: len(index.postings[t])):
+        docs = index.postings[term]
+        idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        if scores and len(docs) > n_docs * SearchIndex.COMMON_TERM_RATIO:
+            pairs = [(rid, docs[rid]) for rid in scores if rid in docs]
+        else:
+            pairs = docs.items()
+        for rid, tf in pairs:
+            norm = index.k1 * (1 - index.b + index.b * index.doc_lengths[rid] / avg_length)
+            scores[rid] = scores.get(rid, 0.0) + expanded[term] * idf * tf * (index.k1 + 1) / (tf + norm)
+    return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def entry(rnd: random.Random, i: int) -> dict:
+    # a few staples in most recipes, so some terms are common and most are bucketed
+    ingredients = rnd.sample(WORDS[:8], rnd.randint(1, 4)) + rnd.sample(WORDS, rnd.randint(0, 3))
+    return {"name": f"{' '.join(rnd.sample(WORDS, rnd.randint(1, 3)))} {i}",
+            "ingredients": list(dict.fromkeys(ingredients)),
+            "steps": [" ".join(rnd.choices(WORDS, k=rnd.randint(1, 6))) for _ in range(rnd.randint(1, 4))],
+            "rating": 3.0, "is_favourite": False}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_search_matches_exhaustive_scoring(monkeypatch, seed):
+    monkeypatch.setattr(SearchIndex, "IMPACT_MIN", 150)
+    rnd = random.Random(seed)
+    manager = RecipeManager()
+    manager.apply_batch([{"op": "add", "recipe": entry(rnd, i)} for i in range(600)])
+    queries = ["salt", "sal", "pepper egg", "salt pepper egg flour", "chese", "garlic 7", "sage",
+               "soup stew toast", "nothing", "s"]
+    for round_ in range(4):
+        index = manager.search_index
+        assert index.impacts
+        for term, buckets in index.impacts.items():
+            assert {rid for rids in buckets.values() for rid in rids} == set(index.postings[term])
+        for query in queries:
+            for limit in (1, 5, 20, 1000):
+                assert index.search(query, limit) == exhaustive(index, query, limit), (query, limit)
+        # shrink some lists below the bucketing threshold and grow others past it
+        names = [r.name for r in manager.list_all()]
+        manager.delete_many(rnd.sample(names, len(names) // 2))
+        manager.apply_batch([{"op": "add", "recipe": entry(rnd, 1000 * (round_ + 1) + i)} for i in range(100)])
+
+
+def test_empty_and_zero_limit_searches():
+    index = SearchIndex.SearchIndex()
+    assert index.search("salt") == []
+    manager = RecipeManager()
+    manager.apply_batch([{"op": "add", "recipe": entry(random.Random(0), 0)}])
+    assert manager.search_index.search("salt", 0) == []
+    assert manager.search_index.search("!!", 5) == []
@@ -0,0 +1,124 @@
+import asyncio
+import http.client
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+import recipejson
+from RecipeManager import RecipeManager
+from RecipeServer import RecipeServer
+
+
+@pytest.fixture
+def server():
+    # a RecipeServer on an ephemeral port, its event loop on a thread of its
+    # own; yields (port, manager)
+    manager = RecipeManager()
+    for i in range(7):
+        manager.add_recipe(recipejson.recipe_from_dict(
+            {"name": f"Recipe {i}", "ingredients": ["egg", "flour" if i % 2 else "milk"], "steps": ["Cook"],
+             "rating": i % 5, "is_favourite": False}, manager.factory))
+    loop = asyncio.new_event_loop()
+    recipe_server = RecipeServer(manager, threads=2)
+    port = loop.run_until_complete(recipe_server.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield port, manager
+    asyncio.run_coroutine_threadsafe(recipe_server.close(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+    loop.close()
+
+
+@pytest.fixture
+def client(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server[0], timeout=10)
+    yield conn
+    conn.close()
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, body=None) -> tuple:
+    # (status, decoded JSON, response); a dict body is sent as JSON, bytes
+    # as they are
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body)
+    conn.request(method, path, body, {"Content-Type": "application/json"} if body is not None else {})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read()), response
+
+
+def test_statuses(client):
+    status, payload, _ = request(client, "GET", "/recipes/Recipe%201")
+    assert (status, payload["name"]) == (200, "Recipe 1")
+    assert request(client, "GET", "/recipes/Nothing")[0] == 404
+    assert request(client, "GET", "/nowhere")[0] == 404
+    assert request(client, "GET", "/recipes?count=lots")[0] == 400
+    assert request(client, "POST", "/recipes", b"{not json")[0] == 400
+    assert request(client, "POST", "/recipes/Recipe%201/rating", {"rating": "high"})[0] == 400
+    assert request(client, "POST", "/recipes/Recipe%201/rating", {"rating": 6})[0] == 400
+    status, payload, _ = request(client, "DELETE", "/search")
+    assert status == 405 and "not allowed" in payload["error"]
+    recipe = {"name": "Recipe 2", "ingredients": ["egg"], "steps": ["Cook"], "rating": 3}
+    assert request(client, "POST", "/recipes", recipe)[0] == 409
+    assert request(client, "POST", "/recipes", dict(recipe, name="Recipe 9"))[0] == 201
+
+
+def test_connection_is_kept_alive(client):
+    request(client, "GET", "/recipes/Recipe%200")
+    sock = client.sock
+    for path in ("/recipes?count=3", "/search?q=egg", "/nowhere", "/cook?pantry=egg,milk"):
+        _, _, response = request(client, "GET", path)
+        assert response.getheader("Connection") == "keep-alive"
+        assert client.sock is sock
+    # an error response keeps the connection too
+    request(client, "POST", "/recipes", b"{not json")
+    assert client.sock is sock
+
+
+def test_listing_pages_are_chunked(client, server):
+    manager = server[1]
+    names = []
+    start = 0
+    while start is not None:
+        status, page, response = request(client, "GET", f"/recipes?start={start}&count=3")
+        assert status == 200
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        assert (page["start"], page["total"]) == (start, len(manager.list_all()))
+        names += [r["name"] for r in page["recipes"]]
+        start = page["next"]
+    assert names == [r.name for r in manager.list_all()]
+    _, page, _ = request(client, "GET", "/recipes?order=rating&count=2")
+    assert [r["name"] for r in page["recipes"]] == [r.name for r in manager.sort_rating(0, 2)]
+
+
+def test_writes_are_visible_to_the_next_read(client):
+    path = f"/recipes/{quote('Recipe 3')}"
+    request(client, "POST", f"{path}/rating", {"rating": 4.5})
+    assert request(client, "GET", path)[1]["rating"] == 4.5
+    request(client, "POST", f"{path}/favourite", {"is_favourite": True})
+    _, page, _ = request(client, "GET", "/recipes?order=favourites")
+    assert [r["name"] for r in page["recipes"]] == ["Recipe 3"]
+    edited = {"name": "Recipe 3", "ingredients": ["rice"], "steps": ["Steam"], "rating": 2}
+    request(client, "PUT", path, edited)
+    assert request(client, "GET", path)[1]["ingredients"] == ["rice"]
+    assert request(client, "DELETE", path)[0] == 200
+    assert request(client, "GET", path)[0] == 404
+    _, page, _ = request(client, "GET", "/search?q=steam")
+    assert page["recipes"] == []
+
+
+def test_clients_on_separate_connections_see_each_other(server):
+    writer = http.client.HTTPConnection("127.0.0.1", server[0], timeout=10)
+    reader = http.client.HTTPConnection("127.0.0.1", server[0], timeout=10)
+    try:
+        recipe = {"name": "Soup", "ingredients": ["leek"], "steps": ["Simmer"], "rating": 4}
+        assert request(writer, "POST", "/recipes", recipe)[0] == 201
+        status, page, _ = request(reader, "GET", "/search?q=leek")
+        assert [r["name"] for r in page["recipes"]] == ["Soup"]
+        _, changes, _ = request(reader, "GET", "/changes?since=7")
+        assert [c["name"] for c in changes["changes"]] == ["Soup"]
+    finally:
+        writer.close()
+        reader.close()
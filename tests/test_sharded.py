@@ -0,0 +1,105 @@
+import pytest
+
+import recipejson
+from RecipeManager import RecipeManager
+from ShardedRecipeManager import ShardedRecipeManager
+
+PANTRY = ["egg", "milk", "flour"]
+
+
+def names(recipes) -> list[str]:
+    return [r.name for r in recipes]
+
+
+@pytest.fixture(scope="module")
+def pair():
+    # a sharded catalogue and a single manager holding the same recipes
+    sharded = ShardedRecipeManager(3)
+    single = RecipeManager()
+    vocabulary = ["egg", "milk", "flour", "sugar", "butter", "salt", "rice", "oil"]
+    for i in range(120):
+        entry = {"name": f"recipe {i:03d}", "ingredients": [vocabulary[(i * k) % 8] for k in (1, 3, 5)],
+                 "steps": ["Cook"], "rating": i % 6, "is_favourite": i % 7 == 0}
+        for manager in (sharded, single):
+            manager.add_recipe(recipejson.recipe_from_dict(entry, manager.factory))
+    for i in range(0, 120, 11):
+        for manager in (sharded, single):
+            manager.rate_recipe(f"recipe {i:03d}", 2.5)
+    for manager in (sharded, single):
+        manager.edit_recipe("recipe 004", recipejson.recipe_from_dict(
+            {"name": "recipe 004", "ingredients": ["egg"], "steps": ["Boil"], "rating": 3}, manager.factory))
+    yield sharded, single
+    sharded.close()
+
+
+@pytest.mark.parametrize("order", ["all", "name", "rating", "favourites"])
+def test_cursor_matches_single_manager(pair, order):
+    sharded, single = pair
+    ours, theirs = sharded.cursor(order), single.cursor(order)
+    assert ours.total == theirs.total
+    for start in (0, 7, 50, ours.total - 3, ours.total + 5):
+        assert names(ours.fetch(start, 10)) == names(theirs.fetch(start, 10))
+
+
+@pytest.mark.parametrize("missing", [0, 1, 2])
+def test_cook_with_matches_single_manager(pair, missing):
+    sharded, single = pair
+    ours = [(r.name, lacking) for r, lacking in sharded.cook_with(PANTRY, missing)]
+    assert ours == [(r.name, lacking) for r, lacking in single.cook_with(PANTRY, missing)]
+    assert ours
+
+
+def test_cursor_after_resize(pair):
+    sharded, single = pair
+    sharded.resize(2)
+    try:
+        for order in ("all", "rating", "favourites"):
+            assert names(sharded.cursor(order).fetch(0, 200)) == names(single.cursor(order).fetch(0, 200))
+        assert names(r for r, _ in sharded.cook_with(PANTRY, 1)) == names(r for r, _ in single.cook_with(PANTRY, 1))
+    finally:
+        sharded.resize(3)
+
+
+def test_unknown_order(pair):
+    with pytest.raises(ValueError, match="Unknown order"):
+        pair[0].cursor("colour")
+
+
+def test_names_are_unique_ignoring_case(pair):
+    sharded = pair[0]
+
+    def recipe(name: str):
+        return recipejson.recipe_from_dict({"name": name, "ingredients": ["egg"], "steps": ["Cook"], "rating": 3},
+                                           sharded.factory)
+    with pytest.raises(ValueError, match="already exists"):
+        sharded.add_recipe(recipe("RECIPE 001"))
+    with pytest.raises(ValueError, match="already exists"):
+        sharded.edit_recipe("recipe 002", recipe("Recipe 003"))
+    assert sharded.get_recipe("recipe 002").name == "recipe 002"
+
+
+@pytest.mark.parametrize("rename", [False, True])
+def test_failed_edit_keeps_the_original(pair, rename):
+    sharded, single = pair
+    updated = recipejson.recipe_from_dict({"name": "recipe 010 (edited)" if rename else "recipe 010",
+                                           "ingredients": ["rice"], "steps": ["Steam"], "rating": 3},
+                                          sharded.factory)
+    updated.rating = 7
+    with pytest.raises(ValueError, match="'rating' must be a number from 0 to 5"):
+        sharded.edit_recipe("recipe 010", updated)
+    assert sharded.get_recipe("recipe 010").ingredient_names() == single.get_recipe("recipe 010").ingredient_names()
+    assert names(sharded.list_all()) == names(single.list_all())
+
+
+def test_edit_rejected_by_its_shard_puts_the_original_back(pair, monkeypatch):
+    sharded, single = pair
+    updated = recipejson.recipe_from_dict({"name": "recipe 020", "ingredients": ["rice"], "steps": ["Steam"],
+                                           "rating": 3}, sharded.factory)
+    updated.rating = 7
+    with monkeypatch.context() as patched:
+        # let the bad recipe past the router's own check
+        patched.setattr(recipejson, "validate_entry", lambda entry: None)
+        with pytest.raises(ValueError, match="'rating' must be a number from 0 to 5"):
+            sharded.edit_recipe("recipe 020", updated)
+    assert sharded.get_recipe("recipe 020").ingredient_names() == single.get_recipe("recipe 020").ingredient_names()
+    assert names(sharded.list_all()) == names(single.list_all())
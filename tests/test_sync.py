@@ -0,0 +1,182 @@
+import random
+
+import pytest
+
+import recipejson
+from RecipeManager import RecipeManager
+
+INGREDIENTS = ["egg", "milk", "flour", "salt", "oil", "rice"]
+
+
+def make(manager: RecipeManager, name: str, rng: random.Random):
+    return recipejson.recipe_from_dict({
+        "name": name,
+        "ingredients": rng.sample(INGREDIENTS, 3),
+        "steps": [f"step {rng.randrange(5)}"],
+        "rating": rng.randrange(6),
+        "is_favourite": False,
+    }, manager.factory)
+
+
+def state(manager: RecipeManager) -> list:
+    return sorted((r.name, r.rating, r.is_favourite, tuple(r.ingredient_names()), tuple(r.steps), r.version,
+                   manager._versions(r)) for r in manager.list_all())
+
+
+def mutate(manager: RecipeManager, rng: random.Random, count: int):
+    for _ in range(count):
+        names = [r.name for r in manager.list_all()]
+        op = rng.random()
+        if op < 0.3 or not names:
+            name = f"r{rng.randrange(40)}"
+            if name not in manager.recipes:
+                manager.add_recipe(make(manager, name, rng))
+        elif op < 0.55:
+            manager.rate_recipe(rng.choice(names), rng.randrange(6))
+        elif op < 0.75:
+            manager.favourite_recipe(rng.choice(names))
+        elif op < 0.85:
+            manager.delete_recipe(rng.choice(names))
+        else:
+            name = rng.choice(names)
+            manager.edit_recipe(name, make(manager, name, rng))
+
+
+@pytest.mark.parametrize("trial", range(25))
+def test_instances_converge(trial, tmp_path):
+    # three instances change the catalogue concurrently and exchange changes
+    # in a random order, partly through files; once everyone has pulled from
+    # everyone they hold the same recipes, field versions included
+    rng = random.Random(trial)
+    managers = [RecipeManager() for _ in range(3)]
+    since = {(a, b): 0 for a in range(3) for b in range(3) if a != b}
+
+    def sync(a: int, b: int):
+        if rng.random() < 0.5:
+            path = str(tmp_path / f"{a}-{b}.jsonl")
+            since[a, b] = managers[a].export_changes(path, since[a, b])
+            managers[b].import_changes(path)
+        else:
+            # paged, as RecipeServer serves it
+            while page := managers[a].changes(since[a, b], 7):
+                managers[b].apply_changes(page)
+                since[a, b] = page[-1]["seq"]
+
+    for i in range(15):
+        managers[0].add_recipe(make(managers[0], f"r{i}", rng))
+    sync(0, 1)
+    sync(0, 2)
+    for _ in range(4):
+        for manager in managers:
+            mutate(manager, rng, rng.randrange(1, 8))
+        pairs = list(since)
+        rng.shuffle(pairs)
+        for a, b in pairs[:rng.randrange(1, 7)]:
+            sync(a, b)
+    for _ in range(3):
+        for a, b in sorted(since):
+            sync(a, b)
+    assert state(managers[0]) == state(managers[1]) == state(managers[2])
+
+
+def test_concurrent_field_changes_both_survive():
+    rng = random.Random(1)
+    a, b = RecipeManager(), RecipeManager()
+    a.add_recipe(make(a, "soup", rng))
+    b.apply_changes(a.changes())
+    a.rate_recipe("soup", 5)
+    b.favourite_recipe("soup")
+    a.apply_changes(b.changes())
+    b.apply_changes(a.changes())
+    for manager in (a, b):
+        recipe = manager.get_recipe("soup")
+        assert (recipe.rating, recipe.is_favourite) == (5, True)
+
+
+def test_deletion_beats_older_recipe():
+    rng = random.Random(2)
+    a, b = RecipeManager(), RecipeManager()
+    a.add_recipe(make(a, "soup", rng))
+    b.apply_changes(a.changes())
+    a.delete_recipe("soup")
+    b.apply_changes(a.changes())
+    assert "soup" not in b.recipes
+    # the same stale add replayed later stays deleted
+    a2 = RecipeManager()
+    a2.add_recipe(make(a2, "soup", rng))
+    b.apply_changes(a2.changes())
+    assert "soup" not in b.recipes
+
+
+def test_changes_pages_from_since():
+    rng = random.Random(3)
+    manager = RecipeManager()
+    manager.import_recipes(make(manager, f"r{i}", rng) for i in range(100))
+    assert [c["seq"] for c in manager.changes(0, 3)] == [1, 2, 3]
+    assert [c["seq"] for c in manager.changes(40, 2)] == [41, 42]
+    assert manager.changes(100) == []
+    assert manager.changes(0, 0) == []
+    clock = manager.clock
+    manager.rate_recipe("r5", 1)
+    manager.delete_recipe("r7")
+    manager.rate_recipe("r5", 2)
+    changes = manager.changes(clock)
+    # a recipe changed twice appears once, at its last change
+    assert [(c["name"], c.get("deleted", False)) for c in changes] == [("r7", True), ("r5", False)]
+    assert [c["seq"] for c in changes] == [clock + 2, clock + 3]
+    assert changes[1]["recipe"]["rating"] == 2
+    assert [c["name"] for c in manager.changes(4, 2)] == ["r4", "r6"]
+
+
+def test_bad_change_rejects_its_batch():
+    manager = RecipeManager()
+    with pytest.raises(ValueError, match="Change 1"):
+        manager.apply_changes([{"name": "a", "version": 1, "deleted": True}, {"name": "b", "version": 0}])
+    assert manager.changes() == []
+
+
+def feed(manager: RecipeManager) -> tuple:
+    return manager.clock, manager.changes(0), state(manager)
+
+
+@pytest.mark.parametrize("trial", range(10))
+def test_restart_keeps_versions_and_seqs(trial, tmp_path):
+    # a journalled instance reopened, after a compaction or not, has the
+    # versions and feed it had, so a peer's since still holds and its
+    # next change outranks what the peer already has
+    rng = random.Random(trial)
+    path = str(tmp_path / "recipes.json")
+    local, peer = RecipeManager(), RecipeManager()
+    local.open_journal(path)
+    since = {"local": 0, "peer": 0}
+
+    def sync():
+        for source, target, key in ((local, peer, "local"), (peer, local, "peer")):
+            if page := source.changes(since[key]):
+                target.apply_changes(page)
+                since[key] = page[-1]["seq"]
+
+    for i in range(10):
+        local.add_recipe(make(local, f"r{i}", rng))
+    for _ in range(6):
+        mutate(local, rng, rng.randrange(1, 6))
+        mutate(peer, rng, rng.randrange(0, 4))
+        names = [r.name for r in local.list_all()]
+        local.rate_many({name: rng.randrange(6) for name in rng.sample(names, min(3, len(names)))})
+        local.apply_batch([{"op": "add", "recipe": make(local, "passing", rng)},
+                           {"op": "delete", "name": "passing"}])
+        sync()
+        if rng.random() < 0.5:
+            local.compact(background=False)
+        before = feed(local)
+        local.close()
+        local = RecipeManager()
+        local.open_journal(path)
+        assert feed(local) == before
+    name = local.list_all()[0].name
+    local.rate_recipe(name, 5 - local.get_recipe(name).rating)
+    sync()
+    sync()
+    assert state(local) == state(peer)
+    assert peer.get_recipe(name).rating == local.get_recipe(name).rating
+    local.close()
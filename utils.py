@@ -4,4 +4,3 @@ def SlowWrite(text):
         print(i, end="", flush=True)
         time.sleep(1/50)
     print("")
-SlowWrite("hey you suck basll cock in the asshole what the fuck is the ass hole doing like shit cuh")